@@ -0,0 +1,46 @@
+"""add job_state
+
+Revision ID: 3c1f9a7d2b4e
+Revises: e75d5798c6bf
+Create Date: 2026-10-18 09:12:31.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9a7d2b4e'
+down_revision: Union[str, None] = 'e75d5798c6bf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('job_state',
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('has_start', sa.Boolean(), server_default=sa.false(), nullable=False),
+    sa.Column('has_end', sa.Boolean(), server_default=sa.false(), nullable=False),
+    sa.Column('analytics_enqueued', sa.Boolean(), server_default=sa.false(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    # Backfill from existing logs; complete jobs were already triggered on ingest
+    op.execute("""
+        INSERT INTO job_state (job_id, has_start, has_end, analytics_enqueued)
+        SELECT job_id,
+               bool_or(event = 'SPARK_LISTENER_JOB_START'),
+               bool_or(event = 'SPARK_LISTENER_JOB_END'),
+               bool_or(event = 'SPARK_LISTENER_JOB_START') AND bool_or(event = 'SPARK_LISTENER_JOB_END')
+        FROM raw_logs
+        WHERE event IN ('SPARK_LISTENER_JOB_START', 'SPARK_LISTENER_JOB_END')
+        GROUP BY job_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('job_state')
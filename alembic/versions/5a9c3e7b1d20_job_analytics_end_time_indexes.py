@@ -0,0 +1,34 @@
+"""job_analytics end_time keyset indexes
+
+Revision ID: 5a9c3e7b1d20
+Revises: d41a8e2c7f05
+Create Date: 2026-10-18 15:42:18.406217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a9c3e7b1d20'
+down_revision: Union[str, None] = 'd41a8e2c7f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built without blocking writes, which needs to run outside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_job_analytics_end_time_job_id', 'job_analytics', ['end_time', 'job_id'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_job_analytics_user_end_time_job_id', 'job_analytics', ['user', 'end_time', 'job_id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_job_analytics_user_end_time_job_id', table_name='job_analytics', postgresql_concurrently=True)
+        op.drop_index('ix_job_analytics_end_time_job_id', table_name='job_analytics', postgresql_concurrently=True)
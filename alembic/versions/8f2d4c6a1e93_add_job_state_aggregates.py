@@ -0,0 +1,65 @@
+"""add job_state aggregates
+
+Revision ID: 8f2d4c6a1e93
+Revises: 3c1f9a7d2b4e
+Create Date: 2026-10-18 10:02:47.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2d4c6a1e93'
+down_revision: Union[str, None] = '3c1f9a7d2b4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('job_state', sa.Column('user', sa.String(), nullable=True))
+    op.add_column('job_state', sa.Column('start_time', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('job_state', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('job_state', sa.Column('task_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('job_state', sa.Column('failed_tasks', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('job_state', sa.Column('task_duration_ms_sum', sa.BigInteger(), server_default='0', nullable=False))
+    # Backfill the running aggregates for every job already in raw_logs
+    op.execute("""
+        INSERT INTO job_state (job_id, has_start, has_end, analytics_enqueued, "user", start_time, end_time,
+                               task_count, failed_tasks, task_duration_ms_sum)
+        SELECT job_id,
+               bool_or(event = 'SPARK_LISTENER_JOB_START'),
+               bool_or(event = 'SPARK_LISTENER_JOB_END'),
+               bool_or(event = 'SPARK_LISTENER_JOB_START') AND bool_or(event = 'SPARK_LISTENER_JOB_END'),
+               max(log->>'user') FILTER (WHERE event = 'SPARK_LISTENER_JOB_START'),
+               max(timestamp) FILTER (WHERE event = 'SPARK_LISTENER_JOB_START'),
+               max((log->>'completion_time')::timestamptz) FILTER (WHERE event = 'SPARK_LISTENER_JOB_END'),
+               count(*) FILTER (WHERE event = 'SPARK_LISTENER_TASK_END'),
+               count(*) FILTER (WHERE event = 'SPARK_LISTENER_TASK_END'
+                                  AND (log->>'successful' = 'false' OR (log->'successful')::text = 'null')),
+               coalesce(sum((log->>'duration_ms')::numeric)
+                        FILTER (WHERE event = 'SPARK_LISTENER_TASK_END'
+                                  AND json_typeof(log->'duration_ms') = 'number'), 0)::bigint
+        FROM raw_logs
+        GROUP BY job_id
+        ON CONFLICT (job_id) DO UPDATE SET
+            "user" = EXCLUDED."user",
+            start_time = EXCLUDED.start_time,
+            end_time = EXCLUDED.end_time,
+            task_count = EXCLUDED.task_count,
+            failed_tasks = EXCLUDED.failed_tasks,
+            task_duration_ms_sum = EXCLUDED.task_duration_ms_sum
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('job_state', 'task_duration_ms_sum')
+    op.drop_column('job_state', 'failed_tasks')
+    op.drop_column('job_state', 'task_count')
+    op.drop_column('job_state', 'end_time')
+    op.drop_column('job_state', 'start_time')
+    op.drop_column('job_state', 'user')
@@ -0,0 +1,59 @@
+"""add job_rollups
+
+Revision ID: 9e4b2d7c6a31
+Revises: 5a9c3e7b1d20
+Create Date: 2026-10-18 16:27:53.911640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b2d7c6a31'
+down_revision: Union[str, None] = '5a9c3e7b1d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of app.rollups.DURATION_BUCKETS at the time of this revision
+DURATION_BUCKETS = [1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600, 86400]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('job_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user', sa.String(), nullable=False),
+    sa.Column('job_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('duration_seconds_sum', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('task_count', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('failed_tasks', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('duration_histogram', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'user')
+    )
+    # Backfill from existing analytics; width_bucket gives 0 below the first bound
+    buckets = ", ".join(
+        f"count(*) FILTER (WHERE width_bucket(duration_seconds, ARRAY{DURATION_BUCKETS}) = {index})::int"
+        for index in range(len(DURATION_BUCKETS) + 1)
+    )
+    op.execute(f"""
+        INSERT INTO job_rollups (day, "user", job_count, duration_seconds_sum, task_count, failed_tasks, duration_histogram)
+        SELECT (end_time AT TIME ZONE 'UTC')::date,
+               "user",
+               count(*),
+               sum(duration_seconds),
+               sum(task_count),
+               sum(failed_tasks),
+               ARRAY[{buckets}]
+        FROM job_analytics
+        GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('job_rollups')
@@ -0,0 +1,43 @@
+"""pending_jobs ready-set for the analytics scheduler
+
+Revision ID: a2d7e5c9b314
+Revises: f6b1d9c4a870
+Create Date: 2026-10-18 18:41:52.906113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2d7e5c9b314'
+down_revision: Union[str, None] = 'f6b1d9c4a870'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pending_jobs',
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('ready_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index(op.f('ix_pending_jobs_ready_at'), 'pending_jobs', ['ready_at'], unique=False)
+    # Seed with what the old reconciliation scan would have found, without its lookback window
+    op.execute("""
+        INSERT INTO pending_jobs (job_id)
+        SELECT DISTINCT r.job_id
+        FROM raw_logs r
+        JOIN job_state s ON s.job_id = r.job_id
+        WHERE r.status = 'PENDING' AND s.has_start AND s.has_end
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_pending_jobs_ready_at'), table_name='pending_jobs')
+    op.drop_table('pending_jobs')
@@ -0,0 +1,44 @@
+"""job_rollups shortest and longest job duration
+
+Revision ID: b5f2c8d3e917
+Revises: e8c4a1f7b2d6
+Create Date: 2026-10-18 19:51:08.274396
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5f2c8d3e917'
+down_revision: Union[str, None] = 'e8c4a1f7b2d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('job_rollups', sa.Column('duration_seconds_min', sa.Integer(), nullable=True))
+    op.add_column('job_rollups', sa.Column('duration_seconds_max', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE job_rollups r
+        SET duration_seconds_min = a.duration_seconds_min,
+            duration_seconds_max = a.duration_seconds_max
+        FROM (
+            SELECT (end_time AT TIME ZONE 'UTC')::date AS day,
+                   "user",
+                   min(duration_seconds) AS duration_seconds_min,
+                   max(duration_seconds) AS duration_seconds_max
+            FROM job_analytics
+            GROUP BY 1, 2
+        ) a
+        WHERE r.day = a.day AND r."user" = a."user"
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('job_rollups', 'duration_seconds_max')
+    op.drop_column('job_rollups', 'duration_seconds_min')
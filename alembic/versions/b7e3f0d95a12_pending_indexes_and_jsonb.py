@@ -0,0 +1,54 @@
+"""pending partial indexes, brin on timestamp, jsonb log
+
+Revision ID: b7e3f0d95a12
+Revises: 8f2d4c6a1e93
+Create Date: 2026-10-18 11:20:05.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3f0d95a12'
+down_revision: Union[str, None] = '8f2d4c6a1e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rewrites the table; run during a quiet window on large installs
+    op.alter_column('raw_logs', 'log',
+                    type_=postgresql.JSONB(),
+                    existing_type=sa.JSON(),
+                    existing_nullable=False,
+                    postgresql_using='log::jsonb')
+
+    # Built without blocking writes, which needs to run outside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_raw_logs_pending_job_id', 'raw_logs', ['job_id'], unique=False,
+                        postgresql_where=sa.text("status = 'PENDING'"),
+                        postgresql_concurrently=True)
+        op.create_index('ix_raw_logs_pending_timestamp_job_id', 'raw_logs', ['timestamp', 'job_id'], unique=False,
+                        postgresql_where=sa.text("status = 'PENDING'"),
+                        postgresql_concurrently=True)
+        op.create_index('ix_raw_logs_timestamp_brin', 'raw_logs', ['timestamp'], unique=False,
+                        postgresql_using='brin',
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_raw_logs_timestamp_brin', table_name='raw_logs', postgresql_concurrently=True)
+        op.drop_index('ix_raw_logs_pending_timestamp_job_id', table_name='raw_logs', postgresql_concurrently=True)
+        op.drop_index('ix_raw_logs_pending_job_id', table_name='raw_logs', postgresql_concurrently=True)
+    op.alter_column('raw_logs', 'log',
+                    type_=sa.JSON(),
+                    existing_type=postgresql.JSONB(),
+                    existing_nullable=False,
+                    postgresql_using='log::json')
@@ -0,0 +1,94 @@
+"""task duration stats on job_analytics, duration sketch on job_state
+
+Revision ID: c3f8a1e6d492
+Revises: 9e4b2d7c6a31
+Create Date: 2026-10-18 17:08:36.552817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a1e6d492'
+down_revision: Union[str, None] = '9e4b2d7c6a31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copies of app.task_stats / STRAGGLER_MAX_TASKS at the time of this revision
+BUCKETS_PER_DOUBLING = 4
+HISTOGRAM_SIZE = 27 * BUCKETS_PER_DOUBLING + 1
+TOP_TASKS = 20
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('job_analytics', sa.Column('task_duration_p50_ms', sa.Float(), nullable=True))
+    op.add_column('job_analytics', sa.Column('task_duration_p90_ms', sa.Float(), nullable=True))
+    op.add_column('job_analytics', sa.Column('task_duration_p99_ms', sa.Float(), nullable=True))
+    op.add_column('job_analytics', sa.Column('task_duration_max_ms', sa.BigInteger(), nullable=True))
+    op.add_column('job_analytics', sa.Column('total_task_time_ms', sa.BigInteger(), nullable=True))
+    op.add_column('job_analytics', sa.Column('task_duration_skew', sa.Float(), nullable=True))
+    op.add_column('job_analytics', sa.Column('straggler_task_ids', postgresql.ARRAY(sa.String()), nullable=True))
+    op.add_column('job_state', sa.Column('task_duration_histogram', postgresql.ARRAY(sa.Integer()), nullable=True))
+    op.add_column('job_state', sa.Column('top_tasks', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+    # Build the sketch for jobs still waiting on analytics, so their stats
+    # cover tasks ingested before this revision; computed jobs get stats
+    # when they are next recomputed
+    op.execute(f"""
+        WITH tasks AS (
+            SELECT r.job_id, r.task_id, (r.log->>'duration_ms')::numeric::bigint AS duration_ms
+            FROM raw_logs r
+            JOIN job_state s ON s.job_id = r.job_id
+            WHERE r.event = 'SPARK_LISTENER_TASK_END'
+              AND jsonb_typeof(r.log->'duration_ms') = 'number'
+              AND NOT EXISTS (SELECT 1 FROM job_analytics a WHERE a.job_id = r.job_id)
+        ),
+        buckets AS (
+            SELECT job_id,
+                   CASE WHEN duration_ms <= 1 THEN 0
+                        ELSE least(floor({BUCKETS_PER_DOUBLING} * log(2, duration_ms::numeric))::int, {HISTOGRAM_SIZE - 1})
+                   END AS bucket,
+                   count(*)::int AS tasks
+            FROM tasks
+            GROUP BY 1, 2
+        ),
+        histograms AS (
+            SELECT j.job_id, array_agg(coalesce(b.tasks, 0) ORDER BY g.bucket) AS histogram
+            FROM (SELECT DISTINCT job_id FROM tasks) j
+            CROSS JOIN generate_series(0, {HISTOGRAM_SIZE - 1}) AS g(bucket)
+            LEFT JOIN buckets b ON b.job_id = j.job_id AND b.bucket = g.bucket
+            GROUP BY j.job_id
+        ),
+        top AS (
+            SELECT job_id, jsonb_agg(jsonb_build_array(task_id, duration_ms) ORDER BY duration_ms DESC) AS top_tasks
+            FROM (
+                SELECT job_id, task_id, duration_ms,
+                       row_number() OVER (PARTITION BY job_id ORDER BY duration_ms DESC) AS rank
+                FROM tasks
+            ) ranked
+            WHERE rank <= {TOP_TASKS}
+            GROUP BY job_id
+        )
+        UPDATE job_state s
+        SET task_duration_histogram = h.histogram, top_tasks = t.top_tasks
+        FROM histograms h JOIN top t USING (job_id)
+        WHERE s.job_id = h.job_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('job_state', 'top_tasks')
+    op.drop_column('job_state', 'task_duration_histogram')
+    op.drop_column('job_analytics', 'straggler_task_ids')
+    op.drop_column('job_analytics', 'task_duration_skew')
+    op.drop_column('job_analytics', 'total_task_time_ms')
+    op.drop_column('job_analytics', 'task_duration_p99_ms')
+    op.drop_column('job_analytics', 'task_duration_p90_ms')
+    op.drop_column('job_analytics', 'task_duration_p50_ms')
+    op.drop_column('job_analytics', 'task_duration_max_ms')
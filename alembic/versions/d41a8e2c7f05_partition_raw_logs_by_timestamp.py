@@ -0,0 +1,124 @@
+"""partition raw_logs by timestamp
+
+Revision ID: d41a8e2c7f05
+Revises: b7e3f0d95a12
+Create Date: 2026-10-18 12:41:19.027365
+
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from app.utils.config import RAW_LOG_PARTITION_DAYS, RAW_LOG_PARTITION_PREMAKE
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a8e2c7f05'
+down_revision: Union[str, None] = 'b7e3f0d95a12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RAW_LOG_INDEXES = [
+    'ix_raw_logs_job_id',
+    'ix_raw_logs_user',
+    'ix_raw_logs_task_id',
+    'ix_raw_logs_pending_job_id',
+    'ix_raw_logs_pending_timestamp_job_id',
+    'ix_raw_logs_timestamp_brin',
+]
+COLUMNS = 'id, event, job_id, "user", timestamp, task_id, log, insertion_time, status'
+
+
+def _create_raw_logs(*args, **kw) -> None:
+    op.create_table('raw_logs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('event', postgresql.ENUM(name='eventtypeenum', create_type=False), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('user', sa.String(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('task_id', sa.String(), nullable=True),
+    sa.Column('log', postgresql.JSONB(), nullable=False),
+    sa.Column('insertion_time', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('status', postgresql.ENUM(name='logstatusenum', create_type=False), nullable=False),
+    *args,
+    **kw
+    )
+
+
+def _create_raw_log_indexes() -> None:
+    op.create_index('ix_raw_logs_job_id', 'raw_logs', ['job_id'], unique=False)
+    op.create_index('ix_raw_logs_user', 'raw_logs', ['user'], unique=False)
+    op.create_index('ix_raw_logs_task_id', 'raw_logs', ['task_id'], unique=False)
+    op.create_index('ix_raw_logs_pending_job_id', 'raw_logs', ['job_id'], unique=False,
+                    postgresql_where=sa.text("status = 'PENDING'"))
+    op.create_index('ix_raw_logs_pending_timestamp_job_id', 'raw_logs', ['timestamp', 'job_id'], unique=False,
+                    postgresql_where=sa.text("status = 'PENDING'"))
+    op.create_index('ix_raw_logs_timestamp_brin', 'raw_logs', ['timestamp'], unique=False,
+                    postgresql_using='brin')
+
+
+def _strip_legacy_table() -> None:
+    """Free the index and constraint names held by raw_logs_legacy."""
+    for index in RAW_LOG_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {index}')
+    op.execute('ALTER TABLE raw_logs_legacy DROP CONSTRAINT IF EXISTS uq_job_event_task')
+    op.execute('ALTER TABLE raw_logs_legacy DROP CONSTRAINT IF EXISTS raw_logs_id_key')
+    op.execute('ALTER TABLE raw_logs_legacy DROP CONSTRAINT IF EXISTS raw_logs_pkey')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('job_state', sa.Column('first_event_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("""
+        UPDATE job_state SET first_event_at = f.first_event_at
+        FROM (SELECT job_id, min(timestamp) AS first_event_at FROM raw_logs GROUP BY job_id) AS f
+        WHERE job_state.job_id = f.job_id
+    """)
+
+    # Rebuild raw_logs as a partitioned table and copy the existing rows over
+    op.execute('ALTER TABLE raw_logs RENAME TO raw_logs_legacy')
+    _strip_legacy_table()
+    _create_raw_logs(
+        sa.PrimaryKeyConstraint('id', 'timestamp'),
+        sa.UniqueConstraint('job_id', 'event', 'task_id', 'timestamp', name='uq_job_event_task'),
+        postgresql_partition_by='RANGE (timestamp)',
+    )
+    _create_raw_log_indexes()
+
+    # Catches rows outside every range partition (very old or far-future events)
+    op.execute('CREATE TABLE raw_logs_default PARTITION OF raw_logs DEFAULT')
+
+    oldest = op.get_bind().execute(sa.text('SELECT min(timestamp) FROM raw_logs_legacy')).scalar()
+    today = datetime.now(timezone.utc).date()
+    first_day = min(oldest.astimezone(timezone.utc).date(), today) if oldest else today
+    offset = (first_day - date(1970, 1, 1)).days
+    start = first_day - timedelta(days=offset % RAW_LOG_PARTITION_DAYS)
+    last = today + timedelta(days=RAW_LOG_PARTITION_DAYS * RAW_LOG_PARTITION_PREMAKE)
+    while start <= last:
+        end = start + timedelta(days=RAW_LOG_PARTITION_DAYS)
+        op.execute(
+            f"CREATE TABLE raw_logs_p{start:%Y%m%d} PARTITION OF raw_logs "
+            f"FOR VALUES FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+        )
+        start = end
+
+    op.execute(f'INSERT INTO raw_logs ({COLUMNS}) SELECT {COLUMNS} FROM raw_logs_legacy')
+    op.execute('DROP TABLE raw_logs_legacy')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('ALTER TABLE raw_logs RENAME TO raw_logs_legacy')
+    _strip_legacy_table()
+    _create_raw_logs(
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        sa.UniqueConstraint('job_id', 'event', 'task_id', name='uq_job_event_task'),
+    )
+    _create_raw_log_indexes()
+    # Rows that only differ by timestamp collapse back onto the old unique key
+    op.execute(f'INSERT INTO raw_logs ({COLUMNS}) SELECT {COLUMNS} FROM raw_logs_legacy ON CONFLICT DO NOTHING')
+    op.execute('DROP TABLE raw_logs_legacy CASCADE')
+    op.drop_column('job_state', 'first_event_at')
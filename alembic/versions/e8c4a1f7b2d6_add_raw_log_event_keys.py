@@ -0,0 +1,47 @@
+"""raw_log_event_keys: deduplicate events independently of their timestamp
+
+Revision ID: e8c4a1f7b2d6
+Revises: a2d7e5c9b314
+Create Date: 2026-10-18 19:24:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c4a1f7b2d6'
+down_revision: Union[str, None] = 'a2d7e5c9b314'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('raw_log_event_keys',
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('event', postgresql.ENUM(name='eventtypeenum', create_type=False), nullable=False),
+    sa.Column('task_id', sa.String(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('job_id', 'event', 'task_id')
+    )
+    op.create_index('ix_raw_log_event_keys_timestamp_brin', 'raw_log_event_keys', ['timestamp'],
+                    unique=False, postgresql_using='brin')
+    # Claim the key of every stored event. Re-stamped copies already in
+    # raw_logs (and counted in job_state) are left as they are.
+    op.execute("""
+        INSERT INTO raw_log_event_keys (job_id, event, task_id, timestamp)
+        SELECT job_id, event, coalesce(task_id, ''), min(timestamp)
+        FROM raw_logs
+        WHERE task_id IS NOT NULL OR event <> 'SPARK_LISTENER_TASK_END'
+        GROUP BY job_id, event, coalesce(task_id, '')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_raw_log_event_keys_timestamp_brin', table_name='raw_log_event_keys', postgresql_using='brin')
+    op.drop_table('raw_log_event_keys')
@@ -0,0 +1,44 @@
+"""deduplicate raw_logs and make uq_job_event_task NULLS NOT DISTINCT
+
+Revision ID: f6b1d9c4a870
+Revises: c3f8a1e6d492
+Create Date: 2026-10-18 18:02:14.301655
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b1d9c4a870'
+down_revision: Union[str, None] = 'c3f8a1e6d492'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # JobStart/JobEnd rows have a NULL task_id, so the old key let their
+    # duplicates through. Keep the first copy of each and drop the rest.
+    op.execute("""
+        DELETE FROM raw_logs AS dup
+        USING raw_logs AS kept
+        WHERE dup.job_id = kept.job_id
+          AND dup.event = kept.event
+          AND dup.task_id IS NOT DISTINCT FROM kept.task_id
+          AND dup.timestamp = kept.timestamp
+          AND (kept.insertion_time, kept.id) < (dup.insertion_time, dup.id)
+    """)
+    op.drop_constraint('uq_job_event_task', 'raw_logs', type_='unique')
+    # NULLS NOT DISTINCT needs Postgres 15+
+    op.execute(
+        'ALTER TABLE raw_logs ADD CONSTRAINT uq_job_event_task '
+        'UNIQUE NULLS NOT DISTINCT (job_id, event, task_id, timestamp)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_job_event_task', 'raw_logs', type_='unique')
+    op.create_unique_constraint('uq_job_event_task', 'raw_logs', ['job_id', 'event', 'task_id', 'timestamp'])
@@ -1,14 +1,35 @@
 # celery_worker.py
+import time
+import uuid
+from collections import defaultdict
 from celery import Celery,group
+from celery.signals import before_task_publish, setup_logging, task_prerun, task_postrun, worker_init
+from sqlalchemy import select, update, func, distinct, and_, or_, cast, String
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
-from app.database import SessionLocal
-from app.models import RawLog, JobAnalytics
-from app.schemas import EventTypeEnum,LogStatusEnum
-from datetime import datetime,timezone,timedelta
-from app.utils.config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND,SCHEDULER_TIMEOUT
-from app.utils.logger import logger
-from app.utils.redis_client import redis_client
+from app.database import SessionLocal, is_row_rejection, rejection_message
+from app.models import RawLog, JobAnalytics, JobState
+from app.schemas import EventTypeEnum,LogStatusEnum,JobAnalyticsResponse
+from datetime import datetime,timezone
+from typing import Any, Dict, List, Optional, Tuple
+from app.utils.config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND,SCHEDULER_TIMEOUT,SCHEDULER_DRAIN_BATCH,SCHEDULER_MAX_ATTEMPTS,ANALYTICS_COMPUTE_MODE,ANALYTICS_BATCH_CHUNK_SIZE,PARTITION_MAINTENANCE_INTERVAL,EXPORT_DIR,EXPORT_INTERVAL,CELERY_METRICS_PORT,LOG_INTERCEPT_STDLIB
+from app.partitions import ensure_partitions, expire_partitions
+from app.pending_jobs import claim_pending_jobs, complete_pending_jobs, exhausted_pending_jobs, requeue_jobs
+from app.rollups import update_job_rollups
+from app.task_stats import MAX_TASK_DURATION_MS, empty_task_stats, stats_from_durations, stats_from_sketch, task_duration_ms
+from app.export import export_all
+from app.utils.logger import logger, intercept_stdlib_logging
+from app.utils.cache import write_through, release_compute
+from app.utils.serialization import encode_model
+from app.utils.metrics import (
+    analytics_jobs_computed,
+    celery_task_queue_lag_seconds,
+    celery_task_seconds,
+    scheduler_jobs_claimed,
+    scheduler_jobs_exhausted,
+    start_metrics_server,
+)
 
 celery_app = Celery(
     "worker",
@@ -21,85 +42,224 @@ celery_app.conf.beat_schedule = {
     "periodic_analytics": {
         "task": "tasks.schedule_pending_analytics",
         "schedule": SCHEDULER_TIMEOUT #Value in seconds
+    },
+    "raw_log_partition_maintenance": {
+        "task": "tasks.maintain_raw_log_partitions",
+        "schedule": PARTITION_MAINTENANCE_INTERVAL #Value in seconds
     }
 }
 
+if EXPORT_DIR:
+    celery_app.conf.beat_schedule["analytics_export"] = {
+        "task": "tasks.export_analytics",
+        "schedule": EXPORT_INTERVAL #Value in seconds
+    }
+
+# Per-job messages, sampled so large batches do not flood the log
+skip_logger = logger.bind(rate_limit="analytics_skipped")
+computed_logger = logger.bind(rate_limit="analytics_computed")
+exhausted_logger = logger.bind(rate_limit="scheduler_exhausted")
+
+if LOG_INTERCEPT_STDLIB:
+    # Having a receiver stops Celery from configuring logging itself
+    @setup_logging.connect
+    def _use_loguru(**kwargs):
+        intercept_stdlib_logging()
+
+
+# Task timings for the metrics server: publish time travels in a header
+_task_started: Dict[str, float] = {}
+
+
+@before_task_publish.connect
+def _stamp_published(headers=None, **kwargs):
+    if headers is not None:
+        headers["published_at"] = time.time()
+
+
+@task_prerun.connect
+def _task_started_at(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    published_at = getattr(task.request, "published_at", None)
+    if published_at:
+        celery_task_queue_lag_seconds.labels(task.name).observe(max(time.time() - published_at, 0))
+
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        celery_task_seconds.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+@worker_init.connect
+def _start_worker_metrics(**kwargs):
+    start_metrics_server(CELERY_METRICS_PORT)
+
+
 @celery_app.task(name="tasks.schedule_pending_analytics")
 def schedule_pending_analytics():
     """
-    Scan raw logs for jobs that have both a START and END event,
-    and still have at least one PENDING log entry. Enqueue
-    compute_job_analytics for each such job_id.
+    Drain the pending_jobs ready-set: claim due jobs SCHEDULER_DRAIN_BATCH
+    at a time with FOR UPDATE SKIP LOCKED and enqueue
+    compute_job_analytics_batch for them in chunks of
+    ANALYTICS_BATCH_CHUNK_SIZE job_ids. Each claim is committed only after
+    its group is published, so a broker failure leaves the jobs due.
+    The cost follows the amount of new work, not the size of raw_logs.
+    Jobs that have run out of attempts are counted in the
+    scheduler_jobs_exhausted gauge and logged as errors.
     """
     db: Session = SessionLocal()
+    total = 0
     try:
-        cutoff = datetime.now(timezone.utc) - timedelta(seconds=2*SCHEDULER_TIMEOUT)
-        # 1) Find job_ids with both START and END events
-        jobs_with_start_end = (
-            db.query(RawLog.job_id)
-              .filter(
-                  RawLog.timestamp >= cutoff,
-                  RawLog.event.in_([
-                      EventTypeEnum.SPARK_LISTENER_JOB_START,
-                      EventTypeEnum.SPARK_LISTENER_JOB_END
-                  ])
-              )
-              .group_by(RawLog.job_id)
-              .having(func.count(distinct(RawLog.event)) == 2)
-              .subquery()
-        )
+        while True:
+            job_ids = claim_pending_jobs(db, SCHEDULER_DRAIN_BATCH)
+            if not job_ids:
+                db.rollback()
+                break
 
-        # 2) From those, pick job_ids that still have any PENDING logs
-        pending_jobs = (
-            db.query(RawLog.job_id)
-              .filter(
-                  RawLog.timestamp >= cutoff,
-                  RawLog.job_id.in_(jobs_with_start_end),
-                  RawLog.status == LogStatusEnum.PENDING
-              )
-              .distinct()
-              .all()
-        )
-        job_ids = [jid for (jid,) in pending_jobs]
+            job_groups = group(
+                compute_job_analytics_batch.s(job_ids[i:i + ANALYTICS_BATCH_CHUNK_SIZE])
+                for i in range(0, len(job_ids), ANALYTICS_BATCH_CHUNK_SIZE)
+            )
+            job_groups.apply_async()
+            db.commit()
+            total += len(job_ids)
+            scheduler_jobs_claimed.inc(len(job_ids))
+            logger.info(f"Enqueued analytics for {len(job_ids)} jobs in {len(job_groups.tasks)} batches as group {job_groups.id}")
+            if len(job_ids) < SCHEDULER_DRAIN_BATCH:
+                break
 
-        if not job_ids:
-            logger.info("No jobs with complete events and pending logs found.")
-            return
+        if not total:
+            logger.debug("No pending jobs to schedule.")
 
-        # 3) Enqueue analytics computation in parallel
-        job_groups = group(compute_job_analytics.s(job_id) for job_id in job_ids)
-        job_groups.apply_async()
-        logger.info(f"Enqueued analytics for job_ids={job_ids} as group {job_groups.id}")
+        exhausted, oldest = exhausted_pending_jobs(db)
+        db.rollback()
+        scheduler_jobs_exhausted.set(exhausted)
+        if exhausted:
+            exhausted_logger.error(
+                f"{exhausted} jobs in pending_jobs were claimed {SCHEDULER_MAX_ATTEMPTS} times without "
+                f"finishing and are no longer computed, oldest {oldest}"
+            )
 
     except Exception as e:
+        db.rollback()
         logger.error(f"Error scheduling pending analytics: {e}")
         raise
     finally:
         db.close()
 
 
-@celery_app.task(name="tasks.compute_job_analytics")
-def compute_job_analytics(job_id: int):
+@celery_app.task(name="tasks.maintain_raw_log_partitions")
+def maintain_raw_log_partitions():
     """
-    Compute and store job analytics for the given job_id.
+    Create upcoming raw_logs partitions and retire the ones past
+    RAW_LOG_RETENTION_DAYS whose logs have all been processed.
+    """
+    db: Session = SessionLocal()
+    try:
+        today = datetime.now(timezone.utc).date()
+        created = ensure_partitions(db, today)
+        expired = expire_partitions(db, today)
+        db.commit()
+        if created or expired:
+            logger.info(f"raw_logs partitions created={created} expired={expired}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error maintaining raw_logs partitions: {e}")
+        raise
+    finally:
+        db.close()
 
-    1. Fetch pending logs for job_id.
-    2. Identify start, end, and task-end events.
-    3. If both start and end exist, calculate duration, task count,
-       failed tasks, and success rate.
-    4. Upsert into JobAnalytics and mark logs as processed.
+
+@celery_app.task(name="tasks.export_analytics")
+def export_analytics(directory: Optional[str] = None):
+    """
+    Export job_analytics and raw_logs rows inserted since the last run to
+    day-partitioned Parquet (or Arrow) files under EXPORT_DIR.
     """
     db: Session = SessionLocal()
     try:
-        logs = (
-            db.query(RawLog)
-            .filter(RawLog.job_id == job_id, RawLog.status == LogStatusEnum.PENDING)
-            .all()
-        )
+        return export_all(db, directory or EXPORT_DIR)
+    except Exception as e:
+        logger.error(f"Error exporting analytics: {e}")
+        raise
+    finally:
+        db.close()
+
+
+def build_job_analytics(job_id: int, user, start_time: datetime, end_time: datetime,
+                        task_count: int, failed_tasks: int,
+                        task_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Derive duration and success rate; shared by every compute mode."""
+    duration = int((end_time - start_time).total_seconds())
+    success_rate = round(((task_count - failed_tasks) / task_count) * 100, 2) if task_count else 0.0
+    return {
+        **(task_stats or empty_task_stats()),
+        "job_id": job_id,
+        "user": user,
+        "start_time": start_time,
+        "end_time": end_time,
+        "duration_seconds": duration,
+        "task_count": task_count,
+        "failed_tasks": failed_tasks,
+        "success_rate": success_rate,
+    }
+
+
+def upsert_job_analytics(db: Session, records: List[Dict[str, Any]]):
+    """INSERT ... ON CONFLICT (job_id) DO UPDATE, with no SELECT first."""
+    stmt = insert(JobAnalytics).values([{"id": uuid.uuid4(), **record} for record in records])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[JobAnalytics.job_id],
+        set_={
+            **{field: stmt.excluded[field] for field in records[0] if field not in ("id", "job_id")},
+            # Recomputed rows are picked up again by the incremental export
+            "insertion_time": func.now(),
+        },
+    )
+    db.execute(stmt)
+
 
+def _earliest_event(db: Session, job_ids: List[int]) -> Optional[datetime]:
+    """
+    Lower bound on the jobs' raw_logs timestamps from job_state, so their
+    queries only touch the partitions that can hold them. None if any job
+    has no recorded first event.
+    """
+    earliest, known = db.query(
+        func.min(JobState.first_event_at), func.count(JobState.first_event_at)
+    ).filter(JobState.job_id.in_(job_ids)).one()
+    return earliest if known == len(set(job_ids)) else None
+
+
+def _pending_logs(table, job_ids: List[int], earliest: Optional[datetime]) -> list:
+    """WHERE clauses for the PENDING raw logs of `job_ids`."""
+    clauses = [table.job_id.in_(job_ids), table.status == LogStatusEnum.PENDING]
+    if earliest is not None:
+        clauses.append(table.timestamp >= earliest)
+    return clauses
+
+
+def _analytics_from_logs(db: Session, job_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Recompute analytics from the jobs' PENDING raw logs, loaded in one
+    query, and mark them processed. Jobs with nothing to compute yet are
+    left out.
+    """
+    if not job_ids:
+        return []
+    earliest = _earliest_event(db, job_ids)
+    logs_by_job = defaultdict(list)
+    for log in db.query(RawLog).filter(*_pending_logs(RawLog, job_ids, earliest)):
+        logs_by_job[log.job_id].append(log)
+
+    records = []
+    for job_id in job_ids:
+        logs = logs_by_job.get(job_id)
         if not logs:
-            logger.info(f"No pending logs found for job {job_id}, skipping.")
-            return
+            skip_logger.info(f"No pending logs found for job {job_id}, skipping.")
+            continue
 
         # Initialize variables
         job_start = None
@@ -117,49 +277,310 @@ def compute_job_analytics(job_id: int):
 
         # Ensure required events exist
         if not job_start or not job_end:
-            logger.info(f"Job {job_id} analytics deferred: missing start/end logs.")
-            return  # Wait for all required logs
+            skip_logger.info(f"Job {job_id} analytics deferred: missing start/end logs.")
+            continue  # Wait for all required logs
 
         # Parse timestamps
         start_time = datetime.fromisoformat(job_start.log["timestamp"].replace("Z", "+00:00"))
         end_time = datetime.fromisoformat(job_end.log["completion_time"].replace("Z", "+00:00"))
 
-        # Compute analytics
-        duration = int((end_time - start_time).total_seconds())
-        task_count = len(task_ends)
-        failed_tasks = sum(1 for t in task_ends if not t.log.get("successful", True))
-        success_rate = round(((task_count - failed_tasks) / task_count) * 100, 2) if task_count else 0.0
+        timed_tasks = [(t.task_id, task_duration_ms(t.log)) for t in task_ends]
+        timed_tasks = [(task_id, duration) for task_id, duration in timed_tasks if duration is not None]
 
-        # Create or update analytics row
-        analytics_record = JobAnalytics(
-            job_id=job_id,
+        records.append(build_job_analytics(
+            job_id,
             user=job_start.log.get("user"),
             start_time=start_time,
             end_time=end_time,
-            duration_seconds=duration,
-            task_count=task_count,
-            failed_tasks=failed_tasks,
-            success_rate=success_rate,
-        )
-        db.merge(analytics_record)
-
+            task_count=len(task_ends),
+            failed_tasks=sum(1 for t in task_ends if not t.log.get("successful", True)),
+            task_stats=stats_from_durations(
+                [task_id for task_id, _ in timed_tasks],
+                [duration for _, duration in timed_tasks],
+            ),
+        ))
 
         # Mark logs as processed
         for log in logs:
             log.status = LogStatusEnum.PROCESSED
 
+    return records
+
+
+def _analytics_from_sql(db: Session, job_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Aggregate the jobs' PENDING logs in Postgres and mark them processed in
+    the same statement.
+
+    The UPDATE ... RETURNING runs as a CTE that the aggregate reads from, so
+    exactly the rows that are counted get marked processed, and a log
+    inserted concurrently stays PENDING for the next run. It only touches
+    jobs whose pending logs include both a start and an end, matching the
+    deferral rule of _analytics_from_logs.
+    """
+    raw_logs = RawLog.__table__
+    earliest = _earliest_event(db, job_ids)
+    ready = (
+        select(raw_logs.c.job_id)
+        .where(
+            *_pending_logs(raw_logs.c, job_ids, earliest),
+            raw_logs.c.event.in_([
+                EventTypeEnum.SPARK_LISTENER_JOB_START,
+                EventTypeEnum.SPARK_LISTENER_JOB_END
+            ])
+        )
+        .group_by(raw_logs.c.job_id)
+        .having(
+            func.count(distinct(raw_logs.c.event)) == 2,
+            # The Python path cannot finalize a job whose JobEnd lacks completion_time
+            func.count().filter(raw_logs.c.log["completion_time"].as_string().isnot(None)) > 0
+        )
+    )
+    marked = (
+        update(raw_logs)
+        .where(*_pending_logs(raw_logs.c, ready, earliest))
+        .values(status=LogStatusEnum.PROCESSED)
+        .returning(raw_logs.c.job_id, raw_logs.c.event, raw_logs.c.task_id, raw_logs.c.log)
+        .cte("marked")
+    )
+    is_start = marked.c.event == EventTypeEnum.SPARK_LISTENER_JOB_START
+    is_end = marked.c.event == EventTypeEnum.SPARK_LISTENER_JOB_END
+    is_task = marked.c.event == EventTypeEnum.SPARK_LISTENER_TASK_END
+    # Same as task_duration_ms(log) is not None
+    is_timed = and_(
+        is_task,
+        func.jsonb_typeof(marked.c.log["duration_ms"]) == "number",
+        func.abs(marked.c.log["duration_ms"].as_float()) < MAX_TASK_DURATION_MS,
+    )
+    # Same as `not log.get("successful", True)` for boolean or null values
+    is_failed = and_(is_task, or_(
+        marked.c.log["successful"].as_string() == "false",
+        cast(marked.c.log["successful"], String) == "null",
+    ))
+    rows = db.execute(
+        select(
+            marked.c.job_id,
+            func.count().filter(is_task).label("task_count"),
+            func.count().filter(is_failed).label("failed_tasks"),
+            func.max(marked.c.log["user"].as_string()).filter(is_start).label("user"),
+            func.max(marked.c.log["timestamp"].as_string()).filter(is_start).label("start_time"),
+            func.max(marked.c.log["completion_time"].as_string()).filter(is_end).label("end_time"),
+            # Parallel arrays of the timed tasks, for the duration statistics
+            func.array_agg(marked.c.task_id).filter(is_timed).label("task_ids"),
+            func.array_agg(marked.c.log["duration_ms"].as_float()).filter(is_timed).label("durations"),
+        )
+        .group_by(marked.c.job_id)
+        .order_by(marked.c.job_id)
+    ).all()
+
+    skipped = len(job_ids) - len(rows)
+    if skipped:
+        logger.info(f"{skipped} of {len(job_ids)} jobs skipped: no pending logs with both start and end.")
+
+    return [
+        build_job_analytics(
+            row.job_id,
+            user=row.user,
+            start_time=datetime.fromisoformat(row.start_time.replace("Z", "+00:00")),
+            end_time=datetime.fromisoformat(row.end_time.replace("Z", "+00:00")),
+            task_count=row.task_count,
+            failed_tasks=row.failed_tasks,
+            task_stats=stats_from_durations(row.task_ids or [], row.durations or []),
+        )
+        for row in rows
+    ]
+
+
+def _analytics_from_job_state(db: Session, job_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Finalize analytics from the running aggregates in job_state, in O(1)
+    per job regardless of task count, and mark the jobs' PENDING logs
+    processed with one set-based UPDATE.
+
+    The job_state rows are locked first: a concurrent insert for one of
+    these jobs blocks on it, so its log stays PENDING and is picked up by
+    the next run instead of being marked processed without being counted.
+    Jobs with no job_state row (e.g. logs written directly by
+    insert_script.py) fall back to _analytics_from_logs.
+    """
+    states = {
+        state.job_id: state
+        for state in db.query(JobState)
+            .filter(JobState.job_id.in_(job_ids))
+            .order_by(JobState.job_id)
+            .with_for_update()
+    }
+
+    ready = []
+    for job_id in job_ids:
+        state = states.get(job_id)
+        if state is None:
+            continue
+        if not state.has_start or not state.has_end or state.start_time is None or state.end_time is None:
+            skip_logger.info(f"Job {job_id} analytics deferred: missing start/end logs.")
+            continue
+        ready.append(job_id)
+
+    records = _analytics_from_logs(db, [job_id for job_id in job_ids if job_id not in states])
+    if not ready:
+        return records
+
+    ready_states = [states[job_id] for job_id in ready]
+    earliest = None
+    if all(state.first_event_at is not None for state in ready_states):
+        earliest = min(state.first_event_at for state in ready_states)
+
+    raw_logs = RawLog.__table__
+    marked = (
+        update(raw_logs)
+        .where(*_pending_logs(raw_logs.c, ready, earliest))
+        .values(status=LogStatusEnum.PROCESSED)
+        .returning(raw_logs.c.job_id)
+        .cte("marked")
+    )
+    marked_jobs = set(db.execute(select(marked.c.job_id).distinct()).scalars())
+
+    for job_id in ready:
+        if job_id not in marked_jobs:
+            skip_logger.info(f"No pending logs found for job {job_id}, skipping.")
+            continue
+        state = states[job_id]
+        records.append(build_job_analytics(
+            job_id,
+            user=state.user,
+            start_time=state.start_time,
+            end_time=state.end_time,
+            task_count=state.task_count,
+            failed_tasks=state.failed_tasks,
+            task_stats=stats_from_sketch(state.task_duration_histogram, state.top_tasks, state.task_duration_ms_sum),
+        ))
+    return records
+
+
+def _compute_and_write(db: Session, job_ids: List[int]) -> List[Dict[str, Any]]:
+    """Compute analytics for `job_ids` and write them, without committing."""
+    if ANALYTICS_COMPUTE_MODE == "incremental":
+        records = _analytics_from_job_state(db, job_ids)
+    elif ANALYTICS_COMPUTE_MODE == "sql":
+        records = _analytics_from_sql(db, job_ids)
+    else:
+        records = _analytics_from_logs(db, job_ids)
+
+    if records:
+        # Move the jobs' figures into their daily rollups, then create or update analytics rows
+        update_job_rollups(db, records)
+        upsert_job_analytics(db, records)
+    return records
+
+
+def _compute_isolating(db: Session, job_ids: List[int]) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    """
+    _compute_and_write for `job_ids`, which must be the only work in the
+    caller's transaction. If the database rejects a job's figures (e.g. a
+    JobStart with no user), the transaction is rolled back and the jobs are
+    computed again in halves under savepoints until each rejected job is
+    isolated, so the others are still written. Returns (records, {job_id:
+    error}).
+    """
+    try:
+        return _compute_and_write(db, job_ids), {}
+    except DBAPIError as e:
+        if not is_row_rejection(e):
+            raise
+        db.rollback()
+        logger.warning(f"Database rejected analytics for a chunk of {len(job_ids)} jobs, isolating the bad ones: {rejection_message(e)}")
+    return _compute_bisecting(db, job_ids)
+
+
+def _compute_bisecting(db: Session, job_ids: List[int]) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    try:
+        with db.begin_nested():
+            return _compute_and_write(db, job_ids), {}
+    except DBAPIError as e:
+        if not is_row_rejection(e):
+            raise
+        if len(job_ids) == 1:
+            return [], {job_ids[0]: rejection_message(e)}
+    middle = len(job_ids) // 2
+    first_records, first_rejected = _compute_bisecting(db, job_ids[:middle])
+    second_records, second_rejected = _compute_bisecting(db, job_ids[middle:])
+    return first_records + second_records, {**first_rejected, **second_rejected}
+
+
+def _compute_analytics(job_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Compute, upsert and commit analytics for `job_ids` in one transaction,
+    then write them through to the cache in one Redis pipeline. Returns the records
+    that were written. Jobs the database rejects are logged and requeued,
+    so they use up their attempts like any other failure without holding
+    back the rest of the chunk.
+    """
+    db: Session = SessionLocal()
+    try:
+        records, rejected = _compute_isolating(db, job_ids)
+        # Done with these jobs either way; an event arriving meanwhile keeps its row
+        complete_pending_jobs(db, [job_id for job_id in job_ids if job_id not in rejected])
         db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-        #Evict cache for job analytics and daily summary
-        redis_client.delete(f"job_analytics:{job_id}")
-        date_key = analytics_record.end_time.date().isoformat()
-        redis_client.delete(f"analytics_summary:{date_key}")
+    if rejected:
+        for job_id, error in rejected.items():
+            logger.error(f"Database rejected analytics for job {job_id}: {error}")
+        requeue_jobs(list(rejected))
+    if not records:
+        return []
 
-        logger.success(f"Analytics computed and saved for job {job_id}")
+    #Write the new analytics through to the job keys and daily summary hashes
+    write_through({
+        record["job_id"]: (
+            record["end_time"].date().isoformat(),
+            encode_model(JobAnalyticsResponse.model_validate(record)),
+        )
+        for record in records
+    })
+    # Let the API request a recompute for these jobs again
+    release_compute([record["job_id"] for record in records])
+    return records
 
+
+@celery_app.task(name="tasks.compute_job_analytics")
+def compute_job_analytics(job_id: int):
+    """
+    Compute and store job analytics for the given job_id.
+
+    With ANALYTICS_COMPUTE_MODE=incremental (the default) the figures come
+    from the job's running aggregate in job_state; "sql" aggregates the
+    job's PENDING raw logs in one statement; "python" loads and counts them
+    in Python. Either way the result is upserted into JobAnalytics and the
+    logs are marked processed.
+    """
+    try:
+        if _compute_analytics([job_id]):
+            analytics_jobs_computed.labels("compute_job_analytics").inc()
+            computed_logger.success(f"Analytics computed and saved for job {job_id}")
     except Exception as e:
-        db.rollback()
         logger.error(f"Failed to compute analytics for job {job_id}: {e}")
+        requeue_jobs([job_id])
+        raise
+
+
+@celery_app.task(name="tasks.compute_job_analytics_batch")
+def compute_job_analytics_batch(job_ids: List[int]):
+    """
+    Compute and store analytics for a chunk of jobs in one transaction,
+    using the same compute mode as compute_job_analytics but with
+    set-based queries across the whole chunk. A job the database rejects
+    is isolated and requeued; the rest of the chunk is still written.
+    """
+    try:
+        records = _compute_analytics(sorted(set(job_ids)))
+        analytics_jobs_computed.labels("compute_job_analytics_batch").inc(len(records))
+        logger.success(f"Analytics computed and saved for {len(records)} of {len(job_ids)} jobs")
+    except Exception as e:
+        logger.error(f"Failed to compute analytics for job batch {job_ids[:10]}...: {e}")
+        requeue_jobs(job_ids)
         raise
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,14 +1,92 @@
+import re
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from app.utils.config import DATABASE_URL
+from app.utils.config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    USE_ASYNC_DB,
+)
+from app.utils.metrics import db_pool_checkout_seconds
 
-engine = create_engine(DATABASE_URL)
+
+class _CheckoutTimer:
+    """Pool mixin that records how long each checkout waited for a connection."""
+
+    _checkout_wait = db_pool_checkout_seconds.labels("sync")
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self._checkout_wait.observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_CheckoutTimer, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimer, AsyncAdaptedQueuePool):
+    _checkout_wait = db_pool_checkout_seconds.labels("async")
+
+
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
+# The async engine is opt-in so asyncpg is only needed when USE_ASYNC_DB is set
+async_engine = None
+AsyncSessionLocal = None
+if USE_ASYNC_DB:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# SQLSTATE classes for the database refusing the data itself (22 data
+# exception, 23 integrity violation), as opposed to failures (a lost
+# connection, a timeout) that a retry can get past. asyncpg's data errors
+# reach SQLAlchemy as a plain DBAPIError, hence the code check.
+ROW_REJECTED_SQLSTATES = ("22", "23")
+
+
+def is_row_rejection(e: DBAPIError) -> bool:
+    """Whether the database refused the rows, so retrying them cannot help."""
+    return isinstance(e, (DataError, IntegrityError)) or \
+        str(getattr(e.orig, "pgcode", None) or "")[:2] in ROW_REJECTED_SQLSTATES
+
+
+def rejection_message(e: DBAPIError) -> str:
+    """The first line of the database's error message."""
+    message = str(e.orig or e).strip().splitlines()[0]
+    # asyncpg's adapter prefixes the driver exception class
+    return re.sub(r"^<class '[\w.]+'>: ", "", message)
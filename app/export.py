@@ -0,0 +1,257 @@
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+from sqlalchemy import BigInteger, and_, case, cast, func, select
+from sqlalchemy.orm import Session
+from app.models import RawLog, JobAnalytics
+from app.utils.config import EXPORT_BATCH_SIZE, EXPORT_FORMAT, EXPORT_SAFETY_LAG
+from app.utils.logger import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional; only needed to run an export
+    pa = pq = None
+
+WATERMARK_FILE = "_watermarks.json"
+EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+
+# Column name -> Arrow type name, in file order. The `log` JSON of raw_logs
+# is flattened into typed columns by Postgres as the rows are read.
+RAW_LOG_COLUMNS = {
+    "id": "string",
+    "event": "string",
+    "job_id": "int64",
+    "user": "string",
+    "timestamp": "timestamp",
+    "task_id": "string",
+    "status": "string",
+    "insertion_time": "timestamp",
+    "duration_ms": "int64",
+    "successful": "bool",
+    "job_result": "string",
+    "completion_time": "string",
+}
+
+JOB_ANALYTICS_COLUMNS = {
+    "id": "string",
+    "job_id": "int64",
+    "user": "string",
+    "start_time": "timestamp",
+    "end_time": "timestamp",
+    "duration_seconds": "int64",
+    "task_count": "int64",
+    "failed_tasks": "int64",
+    "success_rate": "float64",
+    "task_duration_p50_ms": "float64",
+    "task_duration_p90_ms": "float64",
+    "task_duration_p99_ms": "float64",
+    "task_duration_max_ms": "int64",
+    "total_task_time_ms": "int64",
+    "task_duration_skew": "float64",
+    "straggler_task_ids": "list<string>",
+    "insertion_time": "timestamp",
+}
+
+
+def _raw_logs_query():
+    duration_ms, successful = RawLog.log["duration_ms"], RawLog.log["successful"]
+    return select(
+        RawLog.id,
+        RawLog.event,
+        RawLog.job_id,
+        RawLog.user,
+        RawLog.timestamp,
+        RawLog.task_id,
+        RawLog.status,
+        RawLog.insertion_time,
+        # Casts guarded by the JSON type, since ingest accepts any value:
+        # durations are truncated like app.task_stats.task_duration_ms, and
+        # anything else exports as null instead of failing the whole query
+        case(
+            (and_(func.jsonb_typeof(duration_ms) == "number", func.abs(duration_ms.as_float()) < 2 ** 63),
+             cast(func.trunc(duration_ms.as_float()), BigInteger)),
+        ).label("duration_ms"),
+        case(
+            (func.jsonb_typeof(successful) == "boolean", successful.as_boolean()),
+        ).label("successful"),
+        RawLog.log["job_result"].as_string().label("job_result"),
+        RawLog.log["completion_time"].as_string().label("completion_time"),
+    )
+
+
+def _job_analytics_query():
+    return select(*(getattr(JobAnalytics, column) for column in JOB_ANALYTICS_COLUMNS))
+
+
+# table -> (query, columns, ORM table, column the files are partitioned by day on)
+EXPORT_TABLES = {
+    "raw_logs": (_raw_logs_query, RAW_LOG_COLUMNS, RawLog, "timestamp"),
+    "job_analytics": (_job_analytics_query, JOB_ANALYTICS_COLUMNS, JobAnalytics, "end_time"),
+}
+
+
+def _arrow_schema(columns: Dict[str, str]):
+    types = {
+        "string": pa.string(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "list<string>": pa.list_(pa.string()),
+    }
+    return pa.schema([(name, types[type_name]) for name, type_name in columns.items()])
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def read_watermarks(directory: str) -> Dict[str, str]:
+    path = os.path.join(directory, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_watermarks(directory: str, watermarks: Dict[str, str]):
+    path = os.path.join(directory, WATERMARK_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class PartitionedWriter:
+    """
+    Write record batches into one file per day under
+    <directory>/<table>/dt=YYYY-MM-DD/. Files are written under a temporary
+    name and only renamed into place by `commit`, so a failed run leaves
+    nothing a reader would pick up.
+    """
+
+    def __init__(self, directory: str, table: str, schema, run_id: str, fmt: str = EXPORT_FORMAT):
+        if fmt not in EXTENSIONS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        self.directory = os.path.join(directory, table)
+        self.schema = schema
+        self.run_id = run_id
+        self.format = fmt
+        self._writers = {}
+        self._paths = {}
+
+    def _open(self, day: str):
+        partition_dir = os.path.join(self.directory, f"dt={day}")
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, f"part-{self.run_id}.{EXTENSIONS[self.format]}")
+        tmp_path = os.path.join(partition_dir, f".part-{self.run_id}.tmp")
+        if self.format == "parquet":
+            writer = pq.ParquetWriter(tmp_path, self.schema)
+        else:
+            writer = pa.ipc.new_file(tmp_path, self.schema)
+        self._writers[day] = writer
+        self._paths[day] = (tmp_path, path)
+        return writer
+
+    def write(self, day: str, columns: Dict[str, list]):
+        writer = self._writers.get(day) or self._open(day)
+        writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=self.schema))
+
+    def commit(self) -> int:
+        for writer in self._writers.values():
+            writer.close()
+        for tmp_path, path in self._paths.values():
+            os.replace(tmp_path, path)
+        return len(self._paths)
+
+    def abort(self):
+        for writer in self._writers.values():
+            try:
+                writer.close()
+            except Exception:
+                pass
+        for tmp_path, _ in self._paths.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def _batches_by_day(rows: Iterable, columns: Dict[str, str], partition_column: str):
+    by_day = defaultdict(lambda: {name: [] for name in columns})
+    for row in rows:
+        mapping = row._mapping
+        day = mapping[partition_column].astimezone(timezone.utc).date().isoformat()
+        batch = by_day[day]
+        for name in columns:
+            batch[name].append(_plain(mapping[name]))
+    return by_day.items()
+
+
+def export_table(db: Session, directory: str, table: str, since: Optional[datetime], until: datetime,
+                 run_id: str, fmt: str = EXPORT_FORMAT, batch_size: int = EXPORT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Stream rows of `table` inserted in (since, until] into day-partitioned
+    files, reading batch_size rows per round trip with a server-side
+    cursor so memory is bounded by one batch plus the open writers.
+    """
+    query, columns, model, partition_column = EXPORT_TABLES[table]
+    stmt = query().where(model.insertion_time <= until)
+    if since is not None:
+        stmt = stmt.where(model.insertion_time > since)
+    stmt = stmt.order_by(model.insertion_time).execution_options(yield_per=batch_size)
+
+    writer = PartitionedWriter(directory, table, _arrow_schema(columns), run_id, fmt)
+    rows = 0
+    try:
+        for partition in db.execute(stmt).partitions():
+            for day, batch in _batches_by_day(partition, columns, partition_column):
+                writer.write(day, batch)
+            rows += len(partition)
+        files = writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+    return {"rows": rows, "files": files}
+
+
+def export_all(db: Session, directory: str, tables: List[str] = None, fmt: str = EXPORT_FORMAT,
+               batch_size: int = EXPORT_BATCH_SIZE) -> Dict[str, Dict[str, Any]]:
+    """
+    Incrementally export each table since its insertion_time watermark.
+
+    The upper bound trails now() by EXPORT_SAFETY_LAG seconds, because
+    insertion_time is set when a transaction starts: rows from transactions
+    still open at export time commit with an older timestamp and would
+    otherwise fall behind the watermark. A table's watermark only advances
+    once its files are in place.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for exports: pip install pyarrow")
+
+    os.makedirs(directory, exist_ok=True)
+    watermarks = read_watermarks(directory)
+    until = datetime.now(timezone.utc) - timedelta(seconds=EXPORT_SAFETY_LAG)
+    run_id = until.strftime("%Y%m%dT%H%M%S")
+    results = {}
+
+    for table in tables or list(EXPORT_TABLES):
+        since = watermarks.get(table)
+        since = datetime.fromisoformat(since) if since else None
+        if since is not None and since >= until:
+            results[table] = {"rows": 0, "files": 0, "watermark": since.isoformat()}
+            continue
+        summary = export_table(db, directory, table, since, until, run_id, fmt, batch_size)
+        watermarks[table] = until.isoformat()
+        write_watermarks(directory, watermarks)
+        results[table] = {**summary, "watermark": until.isoformat()}
+        logger.info(f"Exported {summary['rows']} {table} rows into {summary['files']} files")
+
+    return results
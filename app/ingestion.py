@@ -0,0 +1,677 @@
+import json
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from sqlalchemy import bindparam, func, or_, select, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine.interfaces import BindTyping
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.database import is_row_rejection, rejection_message
+from app.models import RawLog, RawLogEventKey, JobState, LogStatusEnum
+from app.schemas import BaseEventLog, EventTypeEnum, parse_iso_datetime
+from app.celery_worker import compute_job_analytics
+from app.pending_jobs import MARK_LATE_JOBS, requeue_jobs
+from app.task_stats import empty_histogram, histogram_bucket, merge_top_tasks, task_duration_ms
+from app.utils.config import INGEST_INSERT_CHUNK_SIZE, INGEST_STREAM_CHUNK_SIZE, INGEST_STREAM_MAX_ERRORS, STRAGGLER_MAX_TASKS
+from app.utils.logger import logger
+from app.utils.metrics import NULL_CLOCK
+
+JOB_BOUNDARY_EVENTS = (EventTypeEnum.SPARK_LISTENER_JOB_START, EventTypeEnum.SPARK_LISTENER_JOB_END)
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def normalize_event(log: BaseEventLog) -> Dict[str, Any]:
+    """
+    Build a raw_logs row for a validated event.
+
+    The primary timestamp (and completion_time, if present) are normalized
+    to UTC so every ingestion path stores identical rows. The row id is
+    generated client-side so bulk inserts can map results back to items,
+    and the single ingest path never has to read it back.
+    """
+    # 1) Normalize primary timestamp
+    ts = log.timestamp
+    # If it’s naive, assume UTC; otherwise convert to UTC
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    else:
+        ts = ts.astimezone(timezone.utc)
+
+    # Build the JSONB payload in one pass through pydantic-core
+    full_log = log.model_dump(mode="json")
+    full_log["timestamp"] = ts.isoformat()
+
+    # normalize completion_time if present
+    if full_log.get("completion_time") is not None:
+        full_log["completion_time"] = parse_iso_datetime(full_log["completion_time"]).astimezone(timezone.utc).isoformat()
+
+    return {
+        "id": uuid.uuid4(),
+        "job_id": log.job_id,
+        "event": log.event,
+        "user": log.user,
+        "timestamp": ts,
+        "task_id": log.task_id,
+        "log": full_log,
+        "status": LogStatusEnum.PENDING,
+    }
+
+
+def validate_event(item: Any) -> Tuple[Optional[BaseEventLog], Optional[str]]:
+    """Validate a decoded item, returning (event, None) or (None, error)."""
+    try:
+        return BaseEventLog.model_validate(item), None
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+        )
+
+
+def parse_batch_body(body: bytes, ndjson: bool) -> List[Tuple[Optional[BaseEventLog], Optional[str]]]:
+    """
+    Decode a batch request body into a list of (event, error) pairs.
+
+    `body` is either a JSON array of events or, when `ndjson` is set, one
+    JSON event per line. Blank NDJSON lines are ignored. Raises ValueError
+    if a JSON body is not an array.
+    """
+    if not ndjson:
+        items = json.loads(body)
+        if not isinstance(items, list):
+            raise ValueError("Batch body must be a JSON array of events")
+        return [validate_event(item) for item in items]
+
+    parsed = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            parsed.append((None, f"Invalid JSON: {e}"))
+            continue
+        parsed.append(validate_event(item))
+    return parsed
+
+
+# Renders plain :name placeholders; the casts a driver needs (e.g. ::UUID)
+# are added when the text() is compiled for the connection
+_TEMPLATE_DIALECT = postgresql.dialect(paramstyle="named")
+_TEMPLATE_DIALECT.bind_typing = BindTyping.NONE
+
+
+def _precompiled(stmt, *result_columns):
+    """
+    A text() copy of a PostgreSQL insert() that is compiled only once.
+    In SQLAlchemy 2.0, insert() ... ON CONFLICT has no cache key, so it is
+    recompiled on every execute. The bind parameter types carry over, so
+    enums, UUIDs and JSONB are processed as before. Every column must be
+    given in .values(): Python-side column defaults are not applied.
+    """
+    compiled = stmt.compile(dialect=_TEMPLATE_DIALECT)
+    clause = text(compiled.string).bindparams(*(
+        bindparam(name, param.value, type_=param.type, required=param.required)
+        for param, name in compiled.bind_names.items()
+    ))
+    return clause.columns(*result_columns) if result_columns else clause
+
+
+def _bind_columns(columns: Iterable[str]) -> Dict[str, Any]:
+    return {name: bindparam(name) for name in columns}
+
+
+# Keys of the rows built by normalize_event
+RAW_LOG_COLUMNS = ("id", "job_id", "event", "user", "timestamp", "task_id", "log", "status")
+
+
+def _insert_raw_logs_stmt(rows):
+    return (
+        insert(RawLog.__table__)
+        .values(rows)
+        .on_conflict_do_nothing()
+        .returning(RawLog.__table__.c.id)
+    )
+
+
+# The single ingest path inserts one row per request
+RAW_LOG_INSERT_ONE = _precompiled(_insert_raw_logs_stmt(_bind_columns(RAW_LOG_COLUMNS)), RawLog.__table__.c.id)
+
+
+def _raw_logs_chunks(rows: List[Dict[str, Any]]):
+    """(statement, parameters) per INGEST_INSERT_CHUNK_SIZE chunk of rows."""
+    if len(rows) == 1:
+        yield RAW_LOG_INSERT_ONE, rows[0]
+        return
+    # Larger chunks are one multi-row VALUES each, compiled once per chunk
+    for start in range(0, len(rows), INGEST_INSERT_CHUNK_SIZE):
+        yield _insert_raw_logs_stmt(rows[start:start + INGEST_INSERT_CHUNK_SIZE]), None
+
+
+# (job_id, event value, task_id); RETURNING gives app.models' EventTypeEnum
+EventKey = Tuple[int, str, str]
+EVENT_KEY_COLUMNS = ("job_id", "event", "task_id", "timestamp")
+EVENT_KEY_RETURNING = tuple(RawLogEventKey.__table__.c[name] for name in ("job_id", "event", "task_id"))
+
+
+def _event_key(row: Dict[str, Any]) -> Optional[EventKey]:
+    """The raw_log_event_keys key of a row, or None for a TaskEnd without a task_id."""
+    if row["task_id"] is None and row["event"] == EventTypeEnum.SPARK_LISTENER_TASK_END:
+        return None
+    return row["job_id"], EventTypeEnum(row["event"]).value, row["task_id"] or ""
+
+
+def _insert_event_keys_stmt(keys):
+    return (
+        insert(RawLogEventKey.__table__)
+        .values(keys)
+        .on_conflict_do_nothing()
+        .returning(*EVENT_KEY_RETURNING)
+    )
+
+
+EVENT_KEY_INSERT_ONE = _precompiled(_insert_event_keys_stmt(_bind_columns(EVENT_KEY_COLUMNS)), *EVENT_KEY_RETURNING)
+
+
+def _event_key_chunks(rows: List[Dict[str, Any]]):
+    """(statement, parameters) per INGEST_INSERT_CHUNK_SIZE chunk of the rows' event keys."""
+    keys = {}
+    for row in rows:
+        key = _event_key(row)
+        if key is not None and key not in keys:
+            keys[key] = {"job_id": key[0], "event": row["event"], "task_id": key[2], "timestamp": row["timestamp"]}
+    # Sorted so concurrent batches take the key locks in the same order
+    keys = [keys[key] for key in sorted(keys)]
+    if len(keys) == 1:
+        yield EVENT_KEY_INSERT_ONE, keys[0]
+        return
+    for start in range(0, len(keys), INGEST_INSERT_CHUNK_SIZE):
+        yield _insert_event_keys_stmt(keys[start:start + INGEST_INSERT_CHUNK_SIZE]), None
+
+
+def _typed_bind(column, name: Optional[str] = None):
+    return bindparam(name or column.name, type_=column.type)
+
+
+# The single ingest path: the key claim as a CTE that the insert selects
+# from, so a duplicate writes nothing and the row costs one round trip
+_CLAIMED_KEY = (
+    insert(RawLogEventKey.__table__)
+    .values(
+        job_id=_typed_bind(RawLog.__table__.c.job_id),
+        event=_typed_bind(RawLog.__table__.c.event),
+        task_id=_typed_bind(RawLogEventKey.__table__.c.task_id, "key_task_id"),
+        timestamp=_typed_bind(RawLog.__table__.c.timestamp),
+    )
+    .on_conflict_do_nothing()
+    .returning(RawLogEventKey.__table__.c.job_id)
+    .cte("claimed_key")
+)
+RAW_LOG_CLAIM_AND_INSERT_ONE = _precompiled(
+    insert(RawLog.__table__)
+    .from_select(
+        list(RAW_LOG_COLUMNS),
+        select(*(_typed_bind(RawLog.__table__.c[name]) for name in RAW_LOG_COLUMNS)).select_from(_CLAIMED_KEY),
+    )
+    .on_conflict_do_nothing()
+    .returning(RawLog.__table__.c.id),
+    RawLog.__table__.c.id,
+)
+
+
+def _claim_and_insert_one(rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Parameters of RAW_LOG_CLAIM_AND_INSERT_ONE if `rows` is a single row with an event key."""
+    if len(rows) != 1:
+        return None
+    key = _event_key(rows[0])
+    return None if key is None else {**rows[0], "key_task_id": key[2]}
+
+
+def _new_events(rows: List[Dict[str, Any]], claimed: Set[EventKey]) -> List[Dict[str, Any]]:
+    """The rows whose event key was just claimed (the first copy of each), and those without a key."""
+    new = []
+    for row in rows:
+        key = _event_key(row)
+        if key is None:
+            new.append(row)
+        elif key in claimed:
+            claimed.discard(key)
+            new.append(row)
+    return new
+
+
+def insert_raw_logs(db: Session, rows: List[Dict[str, Any]]) -> Set[uuid.UUID]:
+    """
+    Insert rows into raw_logs with multi-row INSERT ... ON CONFLICT DO NOTHING.
+
+    Each row's event key is claimed in raw_log_event_keys first, so a retry
+    of an event that was already stored is dropped even if it carries a
+    different timestamp. Rows are written in chunks of
+    INGEST_INSERT_CHUNK_SIZE inside the caller's transaction. Returns the
+    ids of the rows that were actually inserted; rows missing from the
+    result were duplicates, either of another event or of a row id that
+    was already written (e.g. a replayed buffer entry).
+    """
+    single = _claim_and_insert_one(rows)
+    if single is not None:
+        return {row_id for (row_id,) in db.execute(RAW_LOG_CLAIM_AND_INSERT_ONE, single)}
+    claimed = set()
+    for stmt, params in _event_key_chunks(rows):
+        claimed.update((job_id, event.value, task_id) for job_id, event, task_id in db.execute(stmt, params))
+    inserted = set()
+    for stmt, params in _raw_logs_chunks(_new_events(rows, claimed)):
+        inserted.update(row_id for (row_id,) in db.execute(stmt, params))
+    return inserted
+
+
+async def insert_raw_logs_async(db: AsyncSession, rows: List[Dict[str, Any]]) -> Set[uuid.UUID]:
+    """Async counterpart of insert_raw_logs."""
+    single = _claim_and_insert_one(rows)
+    if single is not None:
+        return {row_id for (row_id,) in await db.execute(RAW_LOG_CLAIM_AND_INSERT_ONE, single)}
+    claimed = set()
+    for stmt, params in _event_key_chunks(rows):
+        claimed.update(
+            (job_id, event.value, task_id) for job_id, event, task_id in await db.execute(stmt, params)
+        )
+    inserted = set()
+    for stmt, params in _raw_logs_chunks(_new_events(rows, claimed)):
+        inserted.update(row_id for (row_id,) in await db.execute(stmt, params))
+    return inserted
+
+
+# Keeps the STRAGGLER_MAX_TASKS longest [task_id, duration_ms] pairs of the
+# stored and incoming lists
+TOP_TASKS_MERGE_SQL = f"""
+    (SELECT coalesce(jsonb_agg(e ORDER BY (e->>1)::bigint DESC), '[]'::jsonb)
+     FROM (SELECT e FROM jsonb_array_elements(coalesce(job_state.top_tasks, '[]'::jsonb) || excluded.top_tasks) AS e
+           ORDER BY (e->>1)::bigint DESC
+           LIMIT {STRAGGLER_MAX_TASKS}) AS top)
+"""
+
+
+JOB_STATE_COLUMNS = (
+    "job_id", "has_start", "has_end", "user", "start_time", "end_time", "task_count", "failed_tasks",
+    "task_duration_ms_sum", "task_duration_histogram", "top_tasks", "first_event_at",
+)
+JOB_STATE_RETURNING = tuple(
+    JobState.__table__.c[name] for name in ("job_id", "has_start", "has_end", "analytics_enqueued")
+)
+
+
+def _job_state_upsert(values):
+    """
+    The job_state upsert. It folds new rows into one running aggregate per
+    job: start/end flags and times, the job's user, task count, failures
+    and duration sum, and a mergeable duration sketch (histogram plus the
+    longest tasks). RETURNING gives each job's state after the merge, so
+    the caller only runs the late-event marking and the trigger claim when
+    some job needs them.
+    """
+    job_state = JobState.__table__
+    upsert = insert(job_state).values(values)
+    excluded = upsert.excluded
+    return upsert.on_conflict_do_update(
+        index_elements=[job_state.c.job_id],
+        set_={
+            "has_start": or_(job_state.c.has_start, excluded.has_start),
+            "has_end": or_(job_state.c.has_end, excluded.has_end),
+            "user": func.coalesce(excluded.user, job_state.c.user),
+            "start_time": func.coalesce(excluded.start_time, job_state.c.start_time),
+            "end_time": func.coalesce(excluded.end_time, job_state.c.end_time),
+            "task_count": job_state.c.task_count + excluded.task_count,
+            "failed_tasks": job_state.c.failed_tasks + excluded.failed_tasks,
+            "task_duration_ms_sum": job_state.c.task_duration_ms_sum + excluded.task_duration_ms_sum,
+            "task_duration_histogram": text(
+                "ARRAY(SELECT coalesce(a, 0) + coalesce(b, 0) FROM unnest(job_state.task_duration_histogram, "
+                "excluded.task_duration_histogram) AS h(a, b))"
+            ),
+            "top_tasks": text(TOP_TASKS_MERGE_SQL),
+            "first_event_at": func.least(job_state.c.first_event_at, excluded.first_event_at),
+            "updated_at": func.now(),
+        },
+    ).returning(*JOB_STATE_RETURNING)
+
+
+# The single ingest path touches one job per request
+JOB_STATE_UPSERT_ONE = _precompiled(
+    _job_state_upsert({**_bind_columns(JOB_STATE_COLUMNS), "analytics_enqueued": False}), *JOB_STATE_RETURNING
+)
+
+
+def _job_state_upsert_params(values: List[Dict[str, Any]]):
+    if len(values) == 1:
+        return JOB_STATE_UPSERT_ONE, values[0]
+    return _job_state_upsert(values), None
+
+
+# Flips analytics_enqueued for jobs that now have both a start and an end
+# and returns their ids; the row lock taken by the upsert means concurrent
+# start and end inserts cannot both claim a job
+JOB_STATE_CLAIM = (
+    update(JobState.__table__)
+    .where(
+        JobState.__table__.c.job_id.in_(bindparam("job_ids", expanding=True)),
+        JobState.__table__.c.has_start,
+        JobState.__table__.c.has_end,
+        JobState.__table__.c.analytics_enqueued.is_(False),
+    )
+    .values(analytics_enqueued=True, updated_at=func.now())
+    .returning(JobState.__table__.c.job_id)
+)
+
+
+def _job_state_values(rows: List[Dict[str, Any]], inserted: Set[uuid.UUID]) -> List[Dict[str, Any]]:
+    """Parameters of the job_state upsert for the newly inserted rows, one per job."""
+    states = {}
+    for row in rows:
+        if row["id"] not in inserted:
+            continue
+        state = states.setdefault(row["job_id"], {
+            "job_id": row["job_id"],
+            "has_start": False,
+            "has_end": False,
+            "user": None,
+            "start_time": None,
+            "end_time": None,
+            "task_count": 0,
+            "failed_tasks": 0,
+            "task_duration_ms_sum": 0,
+            "task_duration_histogram": empty_histogram(),
+            "top_tasks": [],
+            "first_event_at": row["timestamp"],
+        })
+        state["first_event_at"] = min(state["first_event_at"], row["timestamp"])
+        log = row["log"]
+        if row["event"] == EventTypeEnum.SPARK_LISTENER_JOB_START:
+            state["has_start"] = True
+            state["start_time"] = row["timestamp"]
+            state["user"] = log.get("user")
+        elif row["event"] == EventTypeEnum.SPARK_LISTENER_JOB_END:
+            state["has_end"] = True
+            if log.get("completion_time"):
+                state["end_time"] = datetime.fromisoformat(log["completion_time"])
+        elif row["event"] == EventTypeEnum.SPARK_LISTENER_TASK_END:
+            state["task_count"] += 1
+            state["failed_tasks"] += 0 if log.get("successful", True) else 1
+            duration_ms = task_duration_ms(log)
+            if duration_ms is not None:
+                state["task_duration_ms_sum"] += duration_ms
+                state["task_duration_histogram"][histogram_bucket(duration_ms)] += 1
+                state["top_tasks"].append([row["task_id"], duration_ms])
+    for state in states.values():
+        state["top_tasks"] = merge_top_tasks(state["top_tasks"])
+    # Sorted so concurrent batches lock job_state rows in the same order
+    return [states[job_id] for job_id in sorted(states)]
+
+
+def _split_job_states(merged) -> Tuple[List[Dict[str, int]], List[int]]:
+    """
+    From the upsert's RETURNING rows: parameters of MARK_LATE_JOBS for jobs
+    whose analytics were already enqueued, and the jobs that are now
+    complete and still to be claimed.
+    """
+    late, complete = [], []
+    for job_id, has_start, has_end, analytics_enqueued in merged:
+        if analytics_enqueued:
+            late.append(job_id)
+        elif has_start and has_end:
+            complete.append(job_id)
+    return [{"job_id": job_id} for job_id in sorted(late)], sorted(complete)
+
+
+def track_job_events(db: Session, rows: List[Dict[str, Any]], inserted: Set[uuid.UUID]) -> List[int]:
+    """
+    Fold newly inserted rows into job_state within the caller's
+    transaction. Returns the job_ids that just became complete; pass them
+    to enqueue_job_analytics once the transaction commits.
+    """
+    values = _job_state_values(rows, inserted)
+    if not values:
+        return []
+    late, complete = _split_job_states(db.execute(*_job_state_upsert_params(values)))
+    if late:
+        db.execute(MARK_LATE_JOBS, late)
+    if not complete:
+        return []
+    return sorted(job_id for (job_id,) in db.execute(JOB_STATE_CLAIM, {"job_ids": complete}))
+
+
+async def track_job_events_async(db: AsyncSession, rows: List[Dict[str, Any]], inserted: Set[uuid.UUID]) -> List[int]:
+    """Async counterpart of track_job_events."""
+    values = _job_state_values(rows, inserted)
+    if not values:
+        return []
+    late, complete = _split_job_states(await db.execute(*_job_state_upsert_params(values)))
+    if late:
+        await db.execute(MARK_LATE_JOBS, late)
+    if not complete:
+        return []
+    return sorted(job_id for (job_id,) in await db.execute(JOB_STATE_CLAIM, {"job_ids": complete}))
+
+
+WriteResult = Tuple[Set[uuid.UUID], List[int], Dict[int, str]]
+
+
+def _merge_results(first: WriteResult, second: WriteResult) -> WriteResult:
+    return first[0] | second[0], sorted(first[1] + second[1]), {**first[2], **second[2]}
+
+
+def write_rows(db: Session, rows: List[Dict[str, Any]], clock=NULL_CLOCK) -> WriteResult:
+    """
+    insert_raw_logs and track_job_events for `rows`, which must be the only
+    writes in the caller's transaction. If the database rejects a row, the
+    transaction is rolled back and the rows are written again in halves
+    under savepoints until each rejected row is isolated, so the others are
+    still written. Returns (inserted ids, ready job_ids, {index in rows:
+    error}); commit afterwards as usual.
+    """
+    try:
+        inserted = insert_raw_logs(db, rows)
+        clock.mark("insert")
+        ready_jobs = track_job_events(db, rows, inserted)
+        clock.mark("job_state")
+        return inserted, ready_jobs, {}
+    except DBAPIError as e:
+        if not is_row_rejection(e):
+            raise
+        db.rollback()
+        logger.warning(f"Database rejected a batch of {len(rows)} rows, isolating the bad ones: {rejection_message(e)}")
+    return _write_bisecting(db, rows, 0)
+
+
+def _write_bisecting(db: Session, rows: List[Dict[str, Any]], offset: int) -> WriteResult:
+    try:
+        with db.begin_nested():
+            inserted = insert_raw_logs(db, rows)
+            return inserted, track_job_events(db, rows, inserted), {}
+    except DBAPIError as e:
+        if not is_row_rejection(e):
+            raise
+        if len(rows) == 1:
+            return set(), [], {offset: rejection_message(e)}
+    middle = len(rows) // 2
+    return _merge_results(
+        _write_bisecting(db, rows[:middle], offset),
+        _write_bisecting(db, rows[middle:], offset + middle),
+    )
+
+
+async def write_rows_async(db: AsyncSession, rows: List[Dict[str, Any]], clock=NULL_CLOCK) -> WriteResult:
+    """Async counterpart of write_rows."""
+    try:
+        inserted = await insert_raw_logs_async(db, rows)
+        clock.mark("insert")
+        ready_jobs = await track_job_events_async(db, rows, inserted)
+        clock.mark("job_state")
+        return inserted, ready_jobs, {}
+    except DBAPIError as e:
+        if not is_row_rejection(e):
+            raise
+        await db.rollback()
+        logger.warning(f"Database rejected a batch of {len(rows)} rows, isolating the bad ones: {rejection_message(e)}")
+    return await _write_bisecting_async(db, rows, 0)
+
+
+async def _write_bisecting_async(db: AsyncSession, rows: List[Dict[str, Any]], offset: int) -> WriteResult:
+    try:
+        async with db.begin_nested():
+            inserted = await insert_raw_logs_async(db, rows)
+            return inserted, await track_job_events_async(db, rows, inserted), {}
+    except DBAPIError as e:
+        if not is_row_rejection(e):
+            raise
+        if len(rows) == 1:
+            return set(), [], {offset: rejection_message(e)}
+    middle = len(rows) // 2
+    return _merge_results(
+        await _write_bisecting_async(db, rows[:middle], offset),
+        await _write_bisecting_async(db, rows[middle:], offset + middle),
+    )
+
+
+def enqueue_job_analytics(job_ids: List[int]):
+    for index, job_id in enumerate(job_ids):
+        try:
+            compute_job_analytics.delay(job_id)
+        except Exception as e:
+            # The logs are committed; leave the rest to the scheduler
+            logger.error(f"Failed to enqueue analytics for job {job_id}: {e}")
+            requeue_jobs(job_ids[index:])
+            return
+
+
+class NDJSONStreamDecoder:
+    """
+    Incrementally split a byte stream into NDJSON lines.
+
+    Gzip input is detected from the magic bytes of the first chunk and
+    decompressed on the fly, so only one partial line is ever buffered.
+    """
+
+    def __init__(self):
+        self._decompressor = None
+        self._started = False
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> List[bytes]:
+        if not data:
+            return []
+        if not self._started:
+            self._started = True
+            if data.startswith(GZIP_MAGIC):
+                # wbits=16+MAX_WBITS reads the gzip header and trailer
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data)
+        return self._split(data)
+
+    def finish(self) -> List[bytes]:
+        lines = []
+        if self._decompressor is not None:
+            lines = self._split(self._decompressor.flush())
+        if self._buffer:
+            lines.append(self._buffer)
+            self._buffer = b""
+        return lines
+
+    def _split(self, data: bytes) -> List[bytes]:
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        return lines
+
+
+def iter_ndjson_lines(fileobj: BinaryIO, read_size: int = 1 << 20) -> Iterator[bytes]:
+    """Yield NDJSON lines from a (possibly gzipped) binary file object."""
+    decoder = NDJSONStreamDecoder()
+    while True:
+        data = fileobj.read(read_size)
+        if not data:
+            break
+        yield from decoder.feed(data)
+    yield from decoder.finish()
+
+
+def iter_chunks(items: Iterable[Any], size: int = INGEST_STREAM_CHUNK_SIZE) -> Iterator[List[Any]]:
+    """Group an iterable into lists of at most `size` items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class StreamIngestor:
+    """
+    Validate and write NDJSON lines to raw_logs one chunk at a time.
+
+    Each call to ingest_lines commits its own transaction, so memory is
+    bounded by the chunk size rather than by the size of the stream. Only
+    running counts and the first INGEST_STREAM_MAX_ERRORS errors are kept.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.line_no = 0
+        self.accepted = 0
+        self.duplicate = 0
+        self.invalid = 0
+        self.errors = []
+
+    def ingest_lines(self, lines: List[bytes]):
+        rows, line_numbers = [], []
+        for line in lines:
+            self.line_no += 1
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                self._invalid(f"Invalid JSON: {e}")
+                continue
+            log, error = validate_event(item)
+            if error:
+                self._invalid(error)
+                continue
+            rows.append(normalize_event(log))
+            line_numbers.append(self.line_no)
+
+        if not rows:
+            return
+
+        try:
+            inserted, ready_jobs, rejected = write_rows(self.db, rows)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        for position, error in rejected.items():
+            self._invalid(error, line_numbers[position])
+        self.accepted += len(inserted)
+        self.duplicate += len(rows) - len(rejected) - len(inserted)
+        enqueue_job_analytics(ready_jobs)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "lines": self.line_no,
+            "accepted": self.accepted,
+            "duplicate": self.duplicate,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+    def _invalid(self, error: str, line_no: Optional[int] = None):
+        line_no = line_no or self.line_no
+        self.invalid += 1
+        if len(self.errors) < INGEST_STREAM_MAX_ERRORS:
+            self.errors.append({"line": line_no, "error": error})
+        else:
+            logger.debug(f"Invalid line {line_no}: {error}")
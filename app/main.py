@@ -1,10 +1,56 @@
-from fastapi import FastAPI
-from app.routers import ingest,analytics
-from app.database import Base, engine
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.routers import ingest,analytics,async_ingest,async_analytics
+from datetime import datetime, timezone
+from app.database import Base, engine, async_engine, SessionLocal
+from app.partitions import ensure_partitions
+from app.write_buffer import write_buffer
+from app.utils.cache import cache_stats, start_invalidation_listener, stop_invalidation_listener
+from app.utils.config import METRICS_ENABLED, USE_ASYNC_DB, WRITE_BUFFER_ENABLED
+from app.utils.metrics import CacheCollector, PoolCollector, metrics_registry, render_metrics
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_invalidation_listener()
+    if WRITE_BUFFER_ENABLED:
+        write_buffer.start()
+    yield
+    if WRITE_BUFFER_ENABLED:
+        write_buffer.stop()
+    stop_invalidation_listener()
+
+
+app = FastAPI(lifespan=lifespan)
 
 Base.metadata.create_all(bind=engine)
 
-app.include_router(ingest.router)
-app.include_router(analytics.router)
+# create_all only creates the partitioned parent of raw_logs
+with SessionLocal() as db:
+    ensure_partitions(db, datetime.now(timezone.utc).date())
+    db.commit()
+
+if USE_ASYNC_DB:
+    app.include_router(async_ingest.router)
+    app.include_router(async_analytics.router)
+else:
+    app.include_router(ingest.router)
+    app.include_router(analytics.router)
+
+
+def _pools():
+    pools = {"sync": engine.pool}
+    if async_engine is not None:
+        pools["async"] = async_engine.sync_engine.pool
+    return pools
+
+
+if METRICS_ENABLED:
+    metrics_registry().register(CacheCollector(cache_stats))
+    metrics_registry().register(PoolCollector(_pools))
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus metrics of this process (or of all processes in multiprocess mode)."""
+        return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime,Float,UniqueConstraint,func,Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime,Float,Boolean,UniqueConstraint,Index,func,Enum,false,text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 import uuid
 import enum
 from .database import Base
@@ -18,18 +18,49 @@ class LogStatusEnum(str, enum.Enum):
 class RawLog(Base):
     __tablename__ = "raw_logs"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    # Partitioned by timestamp, so it has to be part of every unique key
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     event = Column(Enum(EventTypeEnum), nullable=False)
     job_id = Column(Integer, nullable=False, index=True)
     user =Column(String,index=True,nullable=True)
-    timestamp = Column(DateTime(timezone=True), nullable=False)
+    timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)
     task_id= Column(String, nullable=True,index=True)
-    log = Column(JSON, nullable=False)
+    log = Column(JSONB, nullable=False)
     insertion_time = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     status = Column(Enum(LogStatusEnum), default=LogStatusEnum.PENDING, nullable=False)
 
     __table_args__ = (
-        UniqueConstraint('job_id', 'event', 'task_id', name='uq_job_event_task'),
+        # NULLS NOT DISTINCT so JobStart/JobEnd (task_id NULL) are deduplicated too
+        UniqueConstraint('job_id', 'event', 'task_id', 'timestamp', name='uq_job_event_task',
+                         postgresql_nulls_not_distinct=True),
+        # Only the small PENDING slice is indexed for the scheduler and compute queries
+        Index('ix_raw_logs_pending_job_id', 'job_id', postgresql_where=text("status = 'PENDING'")),
+        Index('ix_raw_logs_pending_timestamp_job_id', 'timestamp', 'job_id', postgresql_where=text("status = 'PENDING'")),
+        Index('ix_raw_logs_timestamp_brin', 'timestamp', postgresql_using='brin'),
+        # Partitions are created and retired by tasks.maintain_raw_log_partitions
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
+
+
+class RawLogEventKey(Base):
+    """
+    One row per logical event: a job's start, its end and each of its
+    tasks. raw_logs is partitioned on timestamp, so its unique key has to
+    include it and lets a listener retry that was re-stamped through. The
+    ingest path claims an event's key here, in the same transaction, before
+    writing its raw_logs row. TaskEnd events without a task_id have no key
+    and are deduplicated by uq_job_event_task only.
+    """
+    __tablename__ = "raw_log_event_keys"
+
+    job_id = Column(Integer, primary_key=True)
+    event = Column(Enum(EventTypeEnum), primary_key=True)
+    task_id = Column(String, primary_key=True)  # '' for JobStart/JobEnd
+    # Timestamp of the stored copy; keys are pruned with their partitions
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index('ix_raw_log_event_keys_timestamp_brin', 'timestamp', postgresql_using='brin'),
     )
 
 
@@ -48,8 +79,90 @@ class JobAnalytics(Base):
     failed_tasks = Column(Integer, nullable=False)
     success_rate = Column(Float, nullable=False)
 
+    # Task duration statistics; null when the job's tasks carry no duration_ms
+    task_duration_p50_ms = Column(Float, nullable=True)
+    task_duration_p90_ms = Column(Float, nullable=True)
+    task_duration_p99_ms = Column(Float, nullable=True)
+    task_duration_max_ms = Column(BigInteger, nullable=True)
+    total_task_time_ms = Column(BigInteger, nullable=True)
+    task_duration_skew = Column(Float, nullable=True)  # max / p50
+    straggler_task_ids = Column(ARRAY(String), nullable=True)
+
     insertion_time = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     __table_args__ = (
         UniqueConstraint("job_id", name="uq_job_analytics_job_id"),
-    )
\ No newline at end of file
+        # Keyset pagination of the daily summary, with and without a user filter
+        Index("ix_job_analytics_end_time_job_id", "end_time", "job_id"),
+        Index("ix_job_analytics_user_end_time_job_id", "user", "end_time", "job_id"),
+    )
+
+
+class JobState(Base):
+    """
+    Per-job completeness flags and running aggregates, updated in the same
+    transaction as each raw_logs insert so the analytics trigger is a
+    primary-key lookup and finalizing a job does not rescan its logs.
+    """
+    __tablename__ = "job_state"
+
+    job_id = Column(Integer, primary_key=True)
+    has_start = Column(Boolean, nullable=False, default=False, server_default=false())
+    has_end = Column(Boolean, nullable=False, default=False, server_default=false())
+    analytics_enqueued = Column(Boolean, nullable=False, default=False, server_default=false())
+
+    user = Column(String, nullable=True)
+    start_time = Column(DateTime(timezone=True), nullable=True)
+    end_time = Column(DateTime(timezone=True), nullable=True)
+    task_count = Column(Integer, nullable=False, default=0, server_default="0")
+    failed_tasks = Column(Integer, nullable=False, default=0, server_default="0")
+    task_duration_ms_sum = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Mergeable duration sketch: log-bucket counts and the longest [task_id, duration_ms]
+    # pairs (see app.task_stats)
+    task_duration_histogram = Column(ARRAY(Integer), nullable=True)
+    top_tasks = Column(JSONB, nullable=True)
+    # Earliest raw_logs timestamp for the job, used to prune partitions
+    first_event_at = Column(DateTime(timezone=True), nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class JobRollup(Base):
+    """
+    Per-day, per-user totals of job_analytics, kept current by the worker
+    as it writes analytics so range aggregates read one row per day and
+    user instead of every job. Durations are kept as a fixed-bucket
+    histogram (see app.rollups.DURATION_BUCKETS) for percentile estimates.
+    """
+    __tablename__ = "job_rollups"
+
+    day = Column(Date, primary_key=True)  # UTC date of end_time
+    user = Column(String, primary_key=True)
+    job_count = Column(Integer, nullable=False, default=0, server_default="0")
+    duration_seconds_sum = Column(BigInteger, nullable=False, default=0, server_default="0")
+    task_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    failed_tasks = Column(BigInteger, nullable=False, default=0, server_default="0")
+    duration_histogram = Column(ARRAY(Integer), nullable=False)
+    # Shortest and longest job seen, to narrow percentile estimates. A
+    # recompute can only widen them, so they still bound the jobs counted.
+    duration_seconds_min = Column(Integer, nullable=True)
+    duration_seconds_max = Column(Integer, nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class PendingJob(Base):
+    """
+    Ready-set of complete jobs whose analytics need (re)computing: written
+    by the ingest path when a late event lands on an already-enqueued job,
+    and when enqueueing or computing a job fails. The scheduler claims rows
+    with FOR UPDATE SKIP LOCKED instead of scanning raw_logs, and the
+    worker deletes them once the analytics are committed.
+    """
+    __tablename__ = "pending_jobs"
+
+    job_id = Column(Integer, primary_key=True)
+    # When the job is next due; a claim pushes it out by SCHEDULER_RETRY_DELAY
+    ready_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    # Claims so far; 0 again whenever a new event arrives for the job
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,114 @@
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.utils.config import (
+    RAW_LOG_PARTITION_DAYS,
+    RAW_LOG_PARTITION_PREMAKE,
+    RAW_LOG_RETENTION_DAYS,
+    RAW_LOG_RETENTION_ACTION,
+)
+from app.utils.logger import logger
+
+PARENT_TABLE = "raw_logs"
+DEFAULT_PARTITION = "raw_logs_default"
+EVENT_KEYS_TABLE = "raw_log_event_keys"
+EPOCH = date(1970, 1, 1)
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def partition_start(day: date, interval_days: int = RAW_LOG_PARTITION_DAYS) -> date:
+    """Lower bound of the partition containing `day`, aligned to the epoch."""
+    offset = (day - EPOCH).days
+    return EPOCH + timedelta(days=offset - offset % interval_days)
+
+
+def partition_name(start: date) -> str:
+    return f"{PARENT_TABLE}_p{start:%Y%m%d}"
+
+
+def list_partitions(db: Session) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    """(name, lower, upper) for each partition of raw_logs; bounds are None for the default."""
+    rows = db.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent
+        ORDER BY c.relname
+    """), {"parent": PARENT_TABLE}).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or "")
+        if match:
+            lower, upper = (datetime.fromisoformat(b) for b in match.groups())
+            partitions.append((name, lower, upper))
+        else:
+            partitions.append((name, None, None))
+    return partitions
+
+
+def ensure_partitions(db: Session, today: date, premake: int = RAW_LOG_PARTITION_PREMAKE,
+                      interval_days: int = RAW_LOG_PARTITION_DAYS) -> List[str]:
+    """
+    Create the partition covering `today`, the next `premake` ones and the
+    default partition if it is missing. Returns the names of the
+    partitions that were created.
+    """
+    existing = {name for name, _, _ in list_partitions(db)}
+    created = []
+    if DEFAULT_PARTITION not in existing:
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+        created.append(DEFAULT_PARTITION)
+    start = partition_start(today, interval_days)
+    for _ in range(premake + 1):
+        end = start + timedelta(days=interval_days)
+        name = partition_name(start)
+        if name not in existing:
+            try:
+                # A savepoint keeps one failure (e.g. overlapping rows already in
+                # the default partition) from aborting the rest of the run
+                with db.begin_nested():
+                    db.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+                        f"FOR VALUES FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+                    ))
+                created.append(name)
+            except Exception as e:
+                logger.error(f"Could not create partition {name}: {e}")
+        start = end
+    return created
+
+
+def expire_partitions(db: Session, today: date, retention_days: int = RAW_LOG_RETENTION_DAYS,
+                      action: str = RAW_LOG_RETENTION_ACTION) -> List[str]:
+    """
+    Detach (and unless action is "detach", drop) partitions that end more
+    than `retention_days` before `today` and hold no PENDING logs, and
+    prune the raw_log_event_keys of the logs they held. Returns the names
+    of the partitions that were removed.
+    """
+    if retention_days <= 0:
+        return []
+    cutoff = datetime.combine(today - timedelta(days=retention_days), datetime.min.time(), tzinfo=timezone.utc)
+    expired = []
+    # Keys are only pruned below the oldest partition that is kept
+    prune_before = cutoff
+    for name, lower, upper in list_partitions(db):
+        if upper is None or upper > cutoff:
+            continue
+        pending = db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE status = 'PENDING')")).scalar()
+        if pending:
+            logger.warning(f"Partition {name} is past retention but still has PENDING logs, keeping it.")
+            prune_before = min(prune_before, lower)
+            continue
+        db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        if action != "detach":
+            db.execute(text(f"DROP TABLE {name}"))
+        expired.append(name)
+    if expired:
+        # A retry of an event this old is stored again
+        db.execute(text(f"DELETE FROM {EVENT_KEYS_TABLE} WHERE timestamp < :before"), {"before": prune_before})
+    return expired
@@ -0,0 +1,101 @@
+from datetime import timedelta
+from typing import List, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import PendingJob
+from app.utils.config import SCHEDULER_DRAIN_BATCH, SCHEDULER_MAX_ATTEMPTS, SCHEDULER_RETRY_DELAY
+from app.utils.logger import logger
+
+
+def _upsert_pending(stmt):
+    # A new event makes the job due now and restarts its attempt count
+    return stmt.on_conflict_do_update(
+        index_elements=[PendingJob.job_id],
+        set_={"ready_at": func.now(), "attempts": 0},
+    )
+
+
+# Adds jobs whose analytics were already enqueued to pending_jobs, for a
+# recompute. Executed with [{"job_id": ...}, ...] in the ingest transaction
+# before the trigger claim, so a job that only now became complete (and is
+# enqueued directly) is not added as well.
+MARK_LATE_JOBS = _upsert_pending(insert(PendingJob.__table__))
+
+
+def requeue_jobs(job_ids: List[int]):
+    """
+    Add jobs to pending_jobs in their own transaction, after a failed
+    enqueue or compute. Jobs already there keep their row, so a claimed
+    job that keeps failing still runs out of attempts.
+    """
+    if not job_ids:
+        return
+    db: Session = SessionLocal()
+    try:
+        db.execute(
+            insert(PendingJob)
+            .values([{"job_id": job_id} for job_id in sorted(set(job_ids))])
+            .on_conflict_do_nothing(index_elements=[PendingJob.job_id])
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to requeue jobs {job_ids[:10]}: {e}")
+    finally:
+        db.close()
+
+
+def claim_pending_jobs(db: Session, limit: int = SCHEDULER_DRAIN_BATCH) -> List[int]:
+    """
+    Claim up to `limit` due jobs, oldest first. Rows locked by a concurrent
+    drain are skipped. A claim does not remove the row: it pushes ready_at
+    out by SCHEDULER_RETRY_DELAY, so a job whose compute never finishes is
+    claimed again, up to SCHEDULER_MAX_ATTEMPTS times. Commit once the jobs
+    have been handed to the broker.
+    """
+    due = (
+        select(PendingJob.job_id)
+        .where(PendingJob.ready_at <= func.now(), PendingJob.attempts < SCHEDULER_MAX_ATTEMPTS)
+        .order_by(PendingJob.ready_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = db.execute(
+        update(PendingJob)
+        .where(PendingJob.job_id.in_(due.scalar_subquery()))
+        .values(
+            attempts=PendingJob.attempts + 1,
+            ready_at=func.now() + timedelta(seconds=SCHEDULER_RETRY_DELAY),
+        )
+        .returning(PendingJob.job_id)
+    )
+    return sorted(job_id for (job_id,) in claimed)
+
+
+def complete_pending_jobs(db: Session, job_ids: List[int]):
+    """
+    Remove finished jobs from pending_jobs in the compute transaction. Rows
+    reset by an event that arrived after the claim (attempts back at 0)
+    stay, so that event gets computed too.
+    """
+    db.execute(
+        delete(PendingJob).where(PendingJob.job_id.in_(sorted(job_ids)), PendingJob.attempts > 0)
+    )
+
+
+def exhausted_pending_jobs(db: Session, limit: int = 10) -> Tuple[int, List[int]]:
+    """
+    How many jobs have been claimed SCHEDULER_MAX_ATTEMPTS times without
+    finishing, and the job_ids of the oldest `limit` of them. They are not
+    claimed again until a new event resets their row.
+    """
+    exhausted = PendingJob.attempts >= SCHEDULER_MAX_ATTEMPTS
+    count = db.execute(select(func.count()).where(exhausted)).scalar_one()
+    if not count:
+        return 0, []
+    oldest = db.execute(
+        select(PendingJob.job_id).where(exhausted).order_by(PendingJob.ready_at).limit(limit)
+    ).scalars().all()
+    return count, list(oldest)
@@ -0,0 +1,196 @@
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models import JobAnalytics, JobRollup
+
+# Upper bounds (seconds, exclusive) of the duration histogram buckets; the
+# last bucket holds everything longer. Changing them needs a rebuild of
+# job_rollups, so keep them in step with the migration that created it.
+DURATION_BUCKETS = [1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600, 86400]
+
+RollupKey = Tuple[date, str]
+
+
+def bucket_index(duration_seconds: int) -> int:
+    for index, bound in enumerate(DURATION_BUCKETS):
+        if duration_seconds < bound:
+            return index
+    return len(DURATION_BUCKETS)
+
+
+def rollup_day(end_time: datetime) -> date:
+    return end_time.astimezone(timezone.utc).date()
+
+
+def _empty_delta() -> Dict[str, Any]:
+    return {
+        "job_count": 0,
+        "duration_seconds_sum": 0,
+        "task_count": 0,
+        "failed_tasks": 0,
+        "duration_histogram": [0] * (len(DURATION_BUCKETS) + 1),
+        "duration_seconds_min": None,
+        "duration_seconds_max": None,
+    }
+
+
+def _widen(low: Optional[int], high: Optional[int], value: Optional[int]) -> Tuple[Optional[int], Optional[int]]:
+    """The range (low, high) stretched to include `value`; None means empty."""
+    if value is None:
+        return low, high
+    return min(value, low if low is not None else value), max(value, high if high is not None else value)
+
+
+def _apply(deltas: Dict[RollupKey, Dict[str, Any]], job, sign: int):
+    get = job.get if isinstance(job, dict) else job._mapping.get
+    delta = deltas[(rollup_day(get("end_time")), get("user"))]
+    delta["job_count"] += sign
+    delta["duration_seconds_sum"] += sign * get("duration_seconds")
+    delta["task_count"] += sign * get("task_count")
+    delta["failed_tasks"] += sign * get("failed_tasks")
+    delta["duration_histogram"][bucket_index(get("duration_seconds"))] += sign
+    if sign > 0:
+        delta["duration_seconds_min"], delta["duration_seconds_max"] = _widen(
+            delta["duration_seconds_min"], delta["duration_seconds_max"], get("duration_seconds")
+        )
+
+
+def rollup_deltas(old_rows: Iterable, records: Iterable[Dict[str, Any]]) -> Dict[RollupKey, Dict[str, Any]]:
+    """Net change to each (day, user) rollup from replacing `old_rows` with `records`."""
+    deltas = defaultdict(_empty_delta)
+    for row in old_rows:
+        _apply(deltas, row, -1)
+    for record in records:
+        _apply(deltas, record, 1)
+    return {
+        key: delta for key, delta in deltas.items()
+        if delta["job_count"] or delta["duration_seconds_sum"] or delta["task_count"]
+        or delta["failed_tasks"] or any(delta["duration_histogram"])
+    }
+
+
+def update_job_rollups(db: Session, records: List[Dict[str, Any]]):
+    """
+    Fold `records` into job_rollups before they are upserted into
+    job_analytics. Jobs that already have analytics are locked and their
+    previous figures subtracted, so a recompute moves a job between rollups
+    instead of counting it twice. Runs in the caller's transaction.
+    """
+    old_rows = db.execute(
+        select(
+            JobAnalytics.user,
+            JobAnalytics.end_time,
+            JobAnalytics.duration_seconds,
+            JobAnalytics.task_count,
+            JobAnalytics.failed_tasks,
+        )
+        .where(JobAnalytics.job_id.in_([record["job_id"] for record in records]))
+        .order_by(JobAnalytics.job_id)
+        .with_for_update()
+    ).all()
+
+    deltas = rollup_deltas(old_rows, records)
+    if not deltas:
+        return
+
+    # Sorted so concurrent workers lock rollup rows in the same order. A
+    # missing user sorts as "" and is left for the database to reject.
+    stmt = insert(JobRollup).values([
+        {"day": day, "user": user, **delta}
+        for (day, user), delta in sorted(deltas.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+    ])
+    table = JobRollup.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[JobRollup.day, JobRollup.user],
+        set_={
+            "job_count": table.c.job_count + stmt.excluded.job_count,
+            "duration_seconds_sum": table.c.duration_seconds_sum + stmt.excluded.duration_seconds_sum,
+            "task_count": table.c.task_count + stmt.excluded.task_count,
+            "failed_tasks": table.c.failed_tasks + stmt.excluded.failed_tasks,
+            # Element-wise sum of the two histograms
+            "duration_histogram": text(
+                "ARRAY(SELECT a + b FROM unnest(job_rollups.duration_histogram, "
+                "excluded.duration_histogram) AS h(a, b))"
+            ),
+            "duration_seconds_min": func.least(table.c.duration_seconds_min, stmt.excluded.duration_seconds_min),
+            "duration_seconds_max": func.greatest(table.c.duration_seconds_max, stmt.excluded.duration_seconds_max),
+            "updated_at": text("now()"),
+        },
+    )
+    db.execute(stmt)
+
+
+def rollup_query(start: date, end: date, user: Optional[str] = None):
+    """Rollup rows for the inclusive day range, optionally for one user."""
+    stmt = select(JobRollup).where(JobRollup.day >= start, JobRollup.day <= end)
+    if user is not None:
+        stmt = stmt.where(JobRollup.user == user)
+    return stmt.order_by(JobRollup.day, JobRollup.user)
+
+
+def histogram_percentile(histogram: List[int], fraction: float, min_seconds: Optional[int] = None,
+                         max_seconds: Optional[int] = None) -> Optional[float]:
+    """
+    Estimate a duration percentile from a bucket histogram, interpolating
+    linearly inside the bucket that holds the target rank, narrowed to the
+    observed [min_seconds, max_seconds]. The true percentile lies in the
+    same range, so the error is less than its width. Durations past the
+    last bound run up to max_seconds, or are reported as that bound.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = fraction * total
+    seen = 0
+    for index, count in enumerate(histogram):
+        if count and seen + count >= rank:
+            break
+        seen += count
+    lower = DURATION_BUCKETS[index - 1] if index else 0
+    # The last bucket is open-ended
+    upper = DURATION_BUCKETS[index] if index < len(DURATION_BUCKETS) else max_seconds
+    if min_seconds is not None:
+        lower = max(lower, min_seconds)
+    if upper is None:
+        upper = lower
+    elif max_seconds is not None:
+        upper = max(min(upper, max_seconds), lower)
+    return round(lower + (upper - lower) * (rank - seen) / count, 2)
+
+
+def summarize_rollups(rollups: Iterable[JobRollup], group_by: str) -> List[Dict[str, Any]]:
+    """Merge rollup rows into one aggregate per user or per day."""
+    groups = defaultdict(_empty_delta)
+    for rollup in rollups:
+        key = rollup.user if group_by == "user" else rollup.day.isoformat()
+        group = groups[key]
+        group["job_count"] += rollup.job_count
+        group["duration_seconds_sum"] += rollup.duration_seconds_sum
+        group["task_count"] += rollup.task_count
+        group["failed_tasks"] += rollup.failed_tasks
+        group["duration_histogram"] = [a + b for a, b in zip(group["duration_histogram"], rollup.duration_histogram)]
+        for value in (rollup.duration_seconds_min, rollup.duration_seconds_max):
+            group["duration_seconds_min"], group["duration_seconds_max"] = _widen(
+                group["duration_seconds_min"], group["duration_seconds_max"], value
+            )
+
+    results = []
+    for key, group in sorted(groups.items()):
+        if not group["job_count"]:
+            continue
+        task_count = group["task_count"]
+        duration_range = group["duration_seconds_min"], group["duration_seconds_max"]
+        results.append({
+            "key": key,
+            "job_count": group["job_count"],
+            "mean_duration_seconds": round(group["duration_seconds_sum"] / group["job_count"], 2),
+            "p50_duration_seconds": histogram_percentile(group["duration_histogram"], 0.5, *duration_range),
+            "p95_duration_seconds": histogram_percentile(group["duration_histogram"], 0.95, *duration_range),
+            "total_tasks": task_count,
+            "failed_tasks": group["failed_tasks"],
+            "success_rate": round((task_count - group["failed_tasks"]) / task_count * 100, 2) if task_count else 0.0,
+        })
+    return results
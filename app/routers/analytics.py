@@ -1,15 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException,Query
-from datetime import datetime
-from typing import List
+import base64
+import binascii
 import json
-from sqlalchemy import cast, Date
+from fastapi import APIRouter, Depends, HTTPException,Query,Request
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Literal, Optional, Tuple
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models import JobAnalytics
-from app.schemas import JobAnalyticsResponse
+from app.schemas import JobAnalyticsResponse, JobAnalyticsPage, JobRollupResponse
 from app.celery_worker import compute_job_analytics
-from app.utils.redis_client import redis_client
-from app.utils.config import CACHING_TTL
+from app.rollups import rollup_query, summarize_rollups
+from app.utils.cache import (
+    cache_stats,
+    claim_compute,
+    fetch,
+    fetch_summary,
+    job_cache_key,
+    summary_generation,
+    summary_page_key,
+)
+from app.utils.config import SUMMARY_PAGE_DEFAULT_LIMIT, SUMMARY_PAGE_MAX_LIMIT, SUMMARY_EXPORT_BATCH_SIZE
+from app.utils.serialization import encode_model, json_response
 from app.utils.logger import logger
 
 router = APIRouter(
@@ -18,23 +31,100 @@ router = APIRouter(
 )
 
 
+def encode_job_analytics(analytics: JobAnalytics) -> bytes:
+    return encode_model(JobAnalyticsResponse.model_validate(analytics))
+
+
+def encode_analytics_summary(analytics_list: List[JobAnalytics]) -> Dict[int, bytes]:
+    """Per-job response bytes for a day's summary hash."""
+    return {a.job_id: encode_job_analytics(a) for a in analytics_list}
+
+
+def parse_date(date_str: str) -> date:
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+
+
+def summary_query(day: date, user: Optional[str] = None, min_success_rate: Optional[float] = None):
+    """
+    Jobs that ended on `day` (UTC), in keyset order. A half-open range on
+    end_time rather than a cast to date, so (end_time, job_id) is usable.
+    """
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    stmt = select(JobAnalytics).where(
+        JobAnalytics.end_time >= start,
+        JobAnalytics.end_time < start + timedelta(days=1),
+    )
+    if user is not None:
+        stmt = stmt.where(JobAnalytics.user == user)
+    if min_success_rate is not None:
+        stmt = stmt.where(JobAnalytics.success_rate >= min_success_rate)
+    return stmt.order_by(JobAnalytics.end_time, JobAnalytics.job_id)
+
+
+def encode_cursor(analytics: JobAnalytics) -> str:
+    position = json.dumps([analytics.end_time.isoformat(), analytics.job_id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        end_time, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(end_time), int(job_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_query(stmt, cursor: Optional[str], limit: int):
+    """Rows after `cursor`, plus one to tell whether another page follows."""
+    if cursor:
+        end_time, job_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(JobAnalytics.end_time, JobAnalytics.job_id) > tuple_(end_time, job_id))
+    return stmt.limit(limit + 1)
+
+
+def encode_page(rows: List[JobAnalytics], limit: int) -> bytes:
+    items = rows[:limit]
+    return encode_model(JobAnalyticsPage(
+        items=[JobAnalyticsResponse.model_validate(a) for a in items],
+        next_cursor=encode_cursor(items[-1]) if len(rows) > limit else None,
+    ))
+
+
+def page_params(cursor: Optional[str], limit: int, user: Optional[str], min_success_rate: Optional[float]) -> str:
+    return json.dumps([cursor, limit, user, min_success_rate])
+
+
+def export_lines(stmt):
+    """
+    Yield NDJSON lines for `stmt`, fetching SUMMARY_EXPORT_BATCH_SIZE rows
+    per round trip. Uses its own session, since the response body is
+    streamed after the request's dependencies have been closed.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=SUMMARY_EXPORT_BATCH_SIZE))
+        for analytics in result.scalars():
+            yield encode_job_analytics(analytics) + b"\n"
+    finally:
+        db.close()
+
+
 @router.get("/jobs/{job_id}", response_model=JobAnalyticsResponse)
-def get_job_analytics(job_id: int, db: Session = Depends(get_db)):
-    cached = redis_client.get(f"job_analytics:{job_id}")
-    if cached:
-        logger.success(f"Job analytics for job_id {job_id} retrieved from Redis.")
-        return JobAnalyticsResponse.model_validate(json.loads(cached))
-
-    analytics = db.query(JobAnalytics).filter(JobAnalytics.job_id == job_id).first()
-
-    if analytics:
-        # Convert SQLAlchemy model to dict using Pydantic
-        analytics_data = JobAnalyticsResponse.model_validate(analytics).model_dump_json()
-        redis_client.set(f"job_analytics:{job_id}", analytics_data, ex=CACHING_TTL)
-        return analytics
-
-    logger.warning(f"Job analytics for job_id {job_id} not found in DB, triggering computation.")
-    compute_job_analytics.delay(job_id)
+def get_job_analytics(job_id: int, request: Request, db: Session = Depends(get_db)):
+    def load():
+        analytics = db.query(JobAnalytics).filter(JobAnalytics.job_id == job_id).first()
+        return encode_job_analytics(analytics) if analytics else None
+
+    payload = fetch(job_cache_key(job_id), load)
+    if payload is not None:
+        return json_response(payload, request)
+
+    logger.bind(rate_limit="analytics_miss").info(f"Job analytics for job_id {job_id} not found in DB, triggering computation.")
+    if claim_compute([job_id]):
+        compute_job_analytics.delay(job_id)
     raise HTTPException(
         status_code=202,
         detail=f"Analytics for job_id {job_id} are being processed. Please check back later."
@@ -42,28 +132,78 @@ def get_job_analytics(job_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/summary", response_model=List[JobAnalyticsResponse])
-def get_analytics_summary(date_str: str = Query(..., alias="date"), db: Session = Depends(get_db)):
-    try:
-        query_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+def get_analytics_summary(request: Request, date_str: str = Query(..., alias="date"), db: Session = Depends(get_db)):
+    query_date = parse_date(date_str)
 
-    cached = redis_client.get(f"analytics_summary:{date_str}")
-    if cached:
-        logger.success(f"Analytics summary for date {date_str} retrieved from Redis.")
-        return [JobAnalyticsResponse.model_validate(json.loads(c)) for c in json.loads(cached)]
+    def load():
+        return encode_analytics_summary(db.execute(summary_query(query_date)).scalars().all())
 
-    analytics_list = (
-        db.query(JobAnalytics)
-        .filter(cast(JobAnalytics.end_time, Date) == query_date)
-        .all()
-    )
-
-    if not analytics_list:
+    payload = fetch_summary(query_date.isoformat(), load)
+    if payload is None:
         raise HTTPException(status_code=404, detail=f"No job analytics found for date {date_str}")
 
-    # Convert list of SQLAlchemy models to list of dicts using Pydantic
-    analytics_response = [JobAnalyticsResponse.model_validate(a).model_dump_json() for a in analytics_list]
-    redis_client.set(f"analytics_summary:{date_str}", json.dumps(analytics_response), ex=CACHING_TTL)
+    return json_response(payload, request)
+
+
+@router.get("/summary/jobs", response_model=JobAnalyticsPage)
+def get_analytics_summary_page(
+    request: Request,
+    date_str: str = Query(..., alias="date"),
+    limit: int = Query(SUMMARY_PAGE_DEFAULT_LIMIT, ge=1, le=SUMMARY_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    user: Optional[str] = None,
+    min_success_rate: Optional[float] = Query(None, ge=0, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    One page of a day's jobs in (end_time, job_id) order. Pass the returned
+    `next_cursor` as `cursor` to fetch the next page; it is null on the last.
+    """
+    query_date = parse_date(date_str)
+    stmt = page_query(summary_query(query_date, user, min_success_rate), cursor, limit)
+
+    def load():
+        return encode_page(db.execute(stmt).scalars().all(), limit)
+
+    day = query_date.isoformat()
+    key = summary_page_key(day, summary_generation(day), page_params(cursor, limit, user, min_success_rate))
+    return json_response(fetch(key, load), request)
+
+
+@router.get("/summary/export")
+def export_analytics_summary(
+    date_str: str = Query(..., alias="date"),
+    user: Optional[str] = None,
+    min_success_rate: Optional[float] = Query(None, ge=0, le=100),
+):
+    """Stream every matching job for a day as NDJSON, for bulk export."""
+    stmt = summary_query(parse_date(date_str), user, min_success_rate)
+    return StreamingResponse(export_lines(stmt), media_type="application/x-ndjson")
+
+
+@router.get("/rollups", response_model=List[JobRollupResponse])
+def get_analytics_rollups(
+    from_str: str = Query(..., alias="from"),
+    to_str: str = Query(..., alias="to"),
+    group_by: Literal["user", "day"] = "user",
+    user: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Job count, duration mean/p50/p95, task totals and success rate per user
+    or per day over an inclusive date range, read from job_rollups so the
+    cost follows the number of days and users rather than jobs. The
+    percentiles are histogram estimates narrowed to the shortest and
+    longest job; each is off by less than the width of its duration
+    bucket (app.rollups.DURATION_BUCKETS) clipped to that range.
+    """
+    start, end = parse_date(from_str), parse_date(to_str)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    return summarize_rollups(db.execute(rollup_query(start, end, user)).scalars().all(), group_by)
+
 
-    return analytics_list
\ No newline at end of file
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Hit, miss and eviction counters for the local and Redis cache tiers."""
+    return cache_stats()
@@ -0,0 +1,128 @@
+from fastapi import APIRouter, Depends, HTTPException,Query,Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, AsyncSessionLocal
+from app.models import JobAnalytics
+from app.schemas import JobAnalyticsResponse, JobAnalyticsPage, JobRollupResponse
+from app.celery_worker import compute_job_analytics
+from app.rollups import rollup_query, summarize_rollups
+from app.routers.analytics import (
+    encode_job_analytics,
+    encode_analytics_summary,
+    encode_page,
+    get_cache_stats,
+    page_params,
+    page_query,
+    parse_date,
+    summary_query,
+)
+from app.utils.cache import (
+    async_fetch,
+    async_fetch_summary,
+    async_summary_generation,
+    claim_compute,
+    job_cache_key,
+    summary_page_key,
+)
+from app.utils.config import SUMMARY_PAGE_DEFAULT_LIMIT, SUMMARY_PAGE_MAX_LIMIT, SUMMARY_EXPORT_BATCH_SIZE
+from app.utils.serialization import json_response
+from app.utils.logger import logger
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"]
+)
+
+router.add_api_route("/cache/stats", get_cache_stats, methods=["GET"])
+
+
+@router.get("/jobs/{job_id}", response_model=JobAnalyticsResponse)
+async def get_job_analytics(job_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        analytics = (
+            await db.execute(select(JobAnalytics).where(JobAnalytics.job_id == job_id))
+        ).scalars().first()
+        return encode_job_analytics(analytics) if analytics else None
+
+    payload = await async_fetch(job_cache_key(job_id), load)
+    if payload is not None:
+        return json_response(payload, request)
+
+    logger.bind(rate_limit="analytics_miss").info(f"Job analytics for job_id {job_id} not found in DB, triggering computation.")
+    if await run_in_threadpool(claim_compute, [job_id]):
+        await run_in_threadpool(compute_job_analytics.delay, job_id)
+    raise HTTPException(
+        status_code=202,
+        detail=f"Analytics for job_id {job_id} are being processed. Please check back later."
+    )
+
+
+@router.get("/summary", response_model=List[JobAnalyticsResponse])
+async def get_analytics_summary(request: Request, date_str: str = Query(..., alias="date"),
+                                db: AsyncSession = Depends(get_async_db)):
+    query_date = parse_date(date_str)
+
+    async def load():
+        return encode_analytics_summary((await db.execute(summary_query(query_date))).scalars().all())
+
+    payload = await async_fetch_summary(query_date.isoformat(), load)
+    if payload is None:
+        raise HTTPException(status_code=404, detail=f"No job analytics found for date {date_str}")
+
+    return json_response(payload, request)
+
+
+@router.get("/summary/jobs", response_model=JobAnalyticsPage)
+async def get_analytics_summary_page(
+    request: Request,
+    date_str: str = Query(..., alias="date"),
+    limit: int = Query(SUMMARY_PAGE_DEFAULT_LIMIT, ge=1, le=SUMMARY_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    user: Optional[str] = None,
+    min_success_rate: Optional[float] = Query(None, ge=0, le=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    query_date = parse_date(date_str)
+    stmt = page_query(summary_query(query_date, user, min_success_rate), cursor, limit)
+
+    async def load():
+        return encode_page((await db.execute(stmt)).scalars().all(), limit)
+
+    day = query_date.isoformat()
+    generation = await async_summary_generation(day)
+    key = summary_page_key(day, generation, page_params(cursor, limit, user, min_success_rate))
+    return json_response(await async_fetch(key, load), request)
+
+
+async def export_lines(stmt):
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=SUMMARY_EXPORT_BATCH_SIZE))
+        async for analytics in result.scalars():
+            yield encode_job_analytics(analytics) + b"\n"
+
+
+@router.get("/summary/export")
+async def export_analytics_summary(
+    date_str: str = Query(..., alias="date"),
+    user: Optional[str] = None,
+    min_success_rate: Optional[float] = Query(None, ge=0, le=100),
+):
+    stmt = summary_query(parse_date(date_str), user, min_success_rate)
+    return StreamingResponse(export_lines(stmt), media_type="application/x-ndjson")
+
+
+@router.get("/rollups", response_model=List[JobRollupResponse])
+async def get_analytics_rollups(
+    from_str: str = Query(..., alias="from"),
+    to_str: str = Query(..., alias="to"),
+    group_by: Literal["user", "day"] = "user",
+    user: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    start, end = parse_date(from_str), parse_date(to_str)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    return summarize_rollups((await db.execute(rollup_query(start, end, user))).scalars().all(), group_by)
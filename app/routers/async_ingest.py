@@ -0,0 +1,139 @@
+from fastapi import APIRouter, Depends,HTTPException,Request
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, is_row_rejection, rejection_message
+from app.schemas import BaseEventLog
+from app.ingestion import (
+    insert_raw_logs_async,
+    normalize_event,
+    enqueue_job_analytics,
+    track_job_events_async,
+    write_rows_async,
+)
+from app.routers.ingest import (
+    read_batch_body,
+    ingest_log_file,
+    enqueue_log,
+    get_write_buffer_stats,
+    get_ingest_queue_stats,
+    duplicate_logger,
+)
+from app.stream_worker import StreamFullError, async_publish_event
+from app.utils.config import WRITE_BUFFER_ENABLED, WRITE_BUFFER_DURABLE
+from app.utils.logger import logger
+from app.utils.metrics import ingest_clock, ingest_events
+
+router = APIRouter()
+
+# File uploads already stream on the event loop and hand chunks to a worker thread
+router.add_api_route("/logs/ingest/file", ingest_log_file, methods=["POST"])
+router.add_api_route("/logs/ingest/buffer", get_write_buffer_stats, methods=["GET"])
+router.add_api_route("/logs/ingest/queue", get_ingest_queue_stats, methods=["GET"])
+
+
+@router.post("/logs/ingest")
+async def ingest_log(log: BaseEventLog, db: AsyncSession = Depends(get_async_db)):
+    if WRITE_BUFFER_ENABLED:
+        # A durable enqueue appends to a Redis stream with the sync client
+        if WRITE_BUFFER_DURABLE:
+            return await run_in_threadpool(enqueue_log, log)
+        return enqueue_log(log)
+
+    clock = ingest_clock("single")
+    row = normalize_event(log)
+    clock.mark("normalize")
+    try:
+        inserted = await insert_raw_logs_async(db, [row])
+        clock.mark("insert")
+        if not inserted:
+            # ON CONFLICT DO NOTHING skipped it: nothing failed, nothing to roll back
+            ingest_events.labels("single", "duplicate").inc()
+            duplicate_logger.info(f"Duplicate log for job {log.job_id} ({log.event})")
+            raise HTTPException(409, "Duplicate log")
+        ready_jobs = await track_job_events_async(db, [row], inserted)
+        clock.mark("job_state")
+        await db.commit()
+        clock.mark("commit")
+    except IntegrityError:
+        await db.rollback()
+        logger.error(f"Constraint violation for job {log.job_id} ({log.event})")
+        raise HTTPException(400, "Duplicate log or constraint violation")
+    except DBAPIError as e:
+        await db.rollback()
+        if not is_row_rejection(e):
+            raise
+        logger.error(f"Rejected log for job {log.job_id} ({log.event}): {e.orig}")
+        raise HTTPException(400, f"Log rejected by the database: {rejection_message(e)}")
+
+    # Publishing to the broker is blocking I/O
+    if ready_jobs:
+        await run_in_threadpool(enqueue_job_analytics, ready_jobs)
+    clock.mark("enqueue")
+    ingest_events.labels("single", "accepted").inc()
+
+    return {
+        "message": "Log ingested successfully",
+        "log_id": str(row["id"])
+    }
+
+
+@router.post("/logs/ingest/queue")
+async def queue_log(log: BaseEventLog):
+    try:
+        log_id = await async_publish_event(log)
+    except StreamFullError:
+        raise HTTPException(429, "Ingest stream is full, retry later")
+    return JSONResponse(
+        status_code=202,
+        content={"message": "Log queued for ingestion", "log_id": log_id},
+    )
+
+
+@router.post("/logs/ingest/batch")
+async def ingest_log_batch(request: Request, items: list = Depends(read_batch_body),
+                           db: AsyncSession = Depends(get_async_db)):
+    """Async counterpart of the batch ingest endpoint in app/routers/ingest.py."""
+    clock = request.state.ingest_clock
+    results = [None] * len(items)
+    rows, indexes = [], []
+    for index, (log, error) in enumerate(items):
+        if error:
+            results[index] = {"index": index, "status": "invalid", "error": error}
+            continue
+        rows.append(normalize_event(log))
+        indexes.append(index)
+    clock.mark("normalize")
+
+    try:
+        # Rows the database rejects are isolated and reported, the rest written
+        inserted, ready_jobs, rejected = await write_rows_async(db, rows, clock)
+        await db.commit()
+        clock.mark("commit")
+    except Exception:
+        await db.rollback()
+        raise
+
+    for position, (index, row) in enumerate(zip(indexes, rows)):
+        if position in rejected:
+            results[index] = {"index": index, "status": "invalid", "error": rejected[position]}
+        elif row["id"] in inserted:
+            results[index] = {"index": index, "status": "accepted", "log_id": str(row["id"])}
+        else:
+            results[index] = {"index": index, "status": "duplicate"}
+
+    await run_in_threadpool(enqueue_job_analytics, ready_jobs)
+    clock.mark("enqueue")
+
+    counts = {"accepted": 0, "duplicate": 0, "invalid": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    for outcome, count in counts.items():
+        ingest_events.labels("batch", outcome).inc(count)
+
+    return {
+        "message": "Batch ingested",
+        **counts,
+        "results": results,
+    }
@@ -1,67 +1,218 @@
-from fastapi import APIRouter, Depends,HTTPException
-from sqlalchemy.exc import IntegrityError
-from fastapi.encoders import jsonable_encoder
+import zlib
+from fastapi import APIRouter, Depends,HTTPException,Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import Session
-from dateutil.parser import isoparse
-from datetime import timezone
-from app.database import get_db
-from app.models import RawLog,LogStatusEnum
-from app.schemas import BaseEventLog,EventTypeEnum
-from app.celery_worker import compute_job_analytics
-from app.utils import logger
-from dateutil import tz
+from app.database import get_db, SessionLocal, is_row_rejection, rejection_message
+from app.schemas import BaseEventLog
+from app.ingestion import (
+    NDJSONStreamDecoder,
+    StreamIngestor,
+    insert_raw_logs,
+    normalize_event,
+    parse_batch_body,
+    enqueue_job_analytics,
+    track_job_events,
+    write_rows,
+)
+from app.write_buffer import BufferFullError, write_buffer
+from app.stream_worker import StreamFullError, publish_event, stream_stats
+from app.utils.config import INGEST_BATCH_MAX_ITEMS, INGEST_STREAM_CHUNK_SIZE, WRITE_BUFFER_ENABLED
+from app.utils.logger import logger
+from app.utils.metrics import ingest_clock, ingest_events
 
 router = APIRouter()
 
+# Duplicates are routine under listener retries; log a sample of them
+duplicate_logger = logger.bind(rate_limit="duplicate_log")
+
+
+async def read_batch_body(request: Request):
+    """
+    Parse a JSON array or NDJSON request body into (event, error) pairs.
+    The request's stage clock is left on request.state.ingest_clock for the
+    handler to carry on with.
+    """
+    content_type = request.headers.get("content-type", "")
+    ndjson = "ndjson" in content_type or "jsonlines" in content_type
+    body = await request.body()
+    clock = request.state.ingest_clock = ingest_clock("batch")
+    try:
+        items = parse_batch_body(body, ndjson=ndjson)
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid batch body: {e}")
+    clock.mark("validate")
+    if len(items) > INGEST_BATCH_MAX_ITEMS:
+        raise HTTPException(413, f"Batch exceeds {INGEST_BATCH_MAX_ITEMS} events")
+    return items
+
+
+def enqueue_log(log: BaseEventLog) -> JSONResponse:
+    """Hand a normalized row to the write-behind buffer and ack with 202."""
+    row = normalize_event(log)
+    try:
+        write_buffer.submit(row)
+    except BufferFullError:
+        raise HTTPException(429, "Ingest buffer is full, retry later")
+    return JSONResponse(
+        status_code=202,
+        content={"message": "Log queued for ingestion", "log_id": str(row["id"])},
+    )
+
 
 @router.post("/logs/ingest")
 def ingest_log(log: BaseEventLog, db: Session = Depends(get_db)):
-    # 1) Normalize primary timestamp
-    ts = log.timestamp
-    # If it’s naive, assume UTC; otherwise convert to UTC
-    if ts.tzinfo is None:
-        ts = ts.replace(tzinfo=tz.UTC)
-    else:
-        ts = ts.astimezone(tz.UTC)
-
-    # Build a JSON-friendly dict and normalize any other timestamps
-    full_log = jsonable_encoder(log)
-    full_log["timestamp"] = ts.isoformat()
-
-    # normalize completion_time if present
-    if "completion_time" in full_log:
-        ct = isoparse(full_log["completion_time"])
-        full_log["completion_time"] = ct.astimezone(timezone.utc).isoformat()
+    if WRITE_BUFFER_ENABLED:
+        return enqueue_log(log)
 
+    clock = ingest_clock("single")
+    row = normalize_event(log)
+    clock.mark("normalize")
     try:
-        raw_log = RawLog(
-            job_id=log.job_id,
-            event=log.event,
-            user=log.user,
-            timestamp=ts,
-            task_id=log.task_id,
-            log=full_log,
-            status=LogStatusEnum.PENDING,
-        )
-        db.add(raw_log)
+        # Core INSERT ... RETURNING id: no ORM instance, and no refresh since the id is ours
+        inserted = insert_raw_logs(db, [row])
+        clock.mark("insert")
+        if not inserted:
+            # ON CONFLICT DO NOTHING skipped it: nothing failed, nothing to roll back
+            ingest_events.labels("single", "duplicate").inc()
+            duplicate_logger.info(f"Duplicate log for job {log.job_id} ({log.event})")
+            raise HTTPException(409, "Duplicate log")
+        ready_jobs = track_job_events(db, [row], inserted)
+        clock.mark("job_state")
         db.commit()
-        db.refresh(raw_log)
+        clock.mark("commit")
     except IntegrityError:
         db.rollback()
-        logger.error(f"Duplicate log or constraint violation: {log}")
+        logger.error(f"Constraint violation for job {log.job_id} ({log.event})")
         raise HTTPException(400, "Duplicate log or constraint violation")
+    except DBAPIError as e:
+        db.rollback()
+        if not is_row_rejection(e):
+            raise
+        logger.error(f"Rejected log for job {log.job_id} ({log.event}): {e.orig}")
+        raise HTTPException(400, f"Log rejected by the database: {rejection_message(e)}")
 
-    # Only enqueue once we have both start & end events in the DB
-    if log.event in (EventTypeEnum.SPARK_LISTENER_JOB_START, EventTypeEnum.SPARK_LISTENER_JOB_END):
-        events = db.query(RawLog.event) \
-                   .filter(RawLog.job_id == log.job_id) \
-                   .distinct().all()
-        present = {e[0] for e in events}
-        if {EventTypeEnum.SPARK_LISTENER_JOB_START, EventTypeEnum.SPARK_LISTENER_JOB_END} \
-           .issubset(present):
-            compute_job_analytics.delay(log.job_id)
+    enqueue_job_analytics(ready_jobs)
+    clock.mark("enqueue")
+    ingest_events.labels("single", "accepted").inc()
 
     return {
         "message": "Log ingested successfully",
-        "log_id": str(raw_log.id)
-    }
\ No newline at end of file
+        "log_id": str(row["id"])
+    }
+
+
+@router.get("/logs/ingest/buffer")
+def get_write_buffer_stats():
+    """Queue depth and flush latency of the write-behind buffer."""
+    return write_buffer.stats()
+
+
+@router.post("/logs/ingest/queue")
+def queue_log(log: BaseEventLog):
+    """
+    Validate an event and XADD it to the ingest stream, acking with 202.
+    app.stream_worker consumers write it to raw_logs.
+    """
+    try:
+        log_id = publish_event(log)
+    except StreamFullError:
+        raise HTTPException(429, "Ingest stream is full, retry later")
+    return JSONResponse(
+        status_code=202,
+        content={"message": "Log queued for ingestion", "log_id": log_id},
+    )
+
+
+@router.get("/logs/ingest/queue")
+def get_ingest_queue_stats():
+    """Backlog and consumer-group state of the ingest stream."""
+    return stream_stats()
+
+
+@router.post("/logs/ingest/batch")
+def ingest_log_batch(request: Request, items: list = Depends(read_batch_body), db: Session = Depends(get_db)):
+    """
+    Ingest a JSON array or NDJSON body of events in a single transaction.
+
+    Valid events are written with multi-row INSERT ... ON CONFLICT DO NOTHING,
+    and each item is reported back as accepted, duplicate or invalid. Items
+    the database itself rejects are reported invalid with its error, and the
+    rest of the batch is still written.
+    """
+    clock = request.state.ingest_clock
+    results = [None] * len(items)
+    rows, indexes = [], []
+    for index, (log, error) in enumerate(items):
+        if error:
+            results[index] = {"index": index, "status": "invalid", "error": error}
+            continue
+        rows.append(normalize_event(log))
+        indexes.append(index)
+    clock.mark("normalize")
+
+    try:
+        # Rows the database rejects are isolated and reported, the rest written
+        inserted, ready_jobs, rejected = write_rows(db, rows, clock)
+        db.commit()
+        clock.mark("commit")
+    except Exception:
+        db.rollback()
+        raise
+
+    for position, (index, row) in enumerate(zip(indexes, rows)):
+        if position in rejected:
+            results[index] = {"index": index, "status": "invalid", "error": rejected[position]}
+        elif row["id"] in inserted:
+            results[index] = {"index": index, "status": "accepted", "log_id": str(row["id"])}
+        else:
+            results[index] = {"index": index, "status": "duplicate"}
+
+    enqueue_job_analytics(ready_jobs)
+    clock.mark("enqueue")
+
+    counts = {"accepted": 0, "duplicate": 0, "invalid": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    for outcome, count in counts.items():
+        ingest_events.labels("batch", outcome).inc(count)
+
+    return {
+        "message": "Batch ingested",
+        **counts,
+        "results": results,
+    }
+
+
+@router.post("/logs/ingest/file")
+async def ingest_log_file(request: Request):
+    """
+    Stream an NDJSON event-log file (optionally gzipped) into raw_logs.
+
+    The body is decompressed and split into lines as it arrives, and every
+    INGEST_STREAM_CHUNK_SIZE lines are validated and committed on a worker
+    thread, so memory stays flat regardless of the upload size.
+    """
+    decoder = NDJSONStreamDecoder()
+    db = SessionLocal()
+    ingestor = StreamIngestor(db)
+    try:
+        lines = []
+        async for data in request.stream():
+            lines.extend(decoder.feed(data))
+            if len(lines) >= INGEST_STREAM_CHUNK_SIZE:
+                await run_in_threadpool(ingestor.ingest_lines, lines)
+                lines = []
+        lines.extend(decoder.finish())
+        if lines:
+            await run_in_threadpool(ingestor.ingest_lines, lines)
+    except zlib.error as e:
+        raise HTTPException(400, f"Invalid gzip stream: {e}")
+    finally:
+        db.close()
+
+    return {
+        "message": "File ingested",
+        **ingestor.summary(),
+    }
@@ -1,8 +1,9 @@
 import uuid
-from pydantic import BaseModel
+from dateutil.parser import isoparse
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
 #
 class EventTypeEnum(str, Enum):
     SPARK_LISTENER_JOB_START = "SparkListenerJobStart"
@@ -15,9 +16,36 @@ class LogStatusEnum(str, Enum):
     PROCESSED = "processed"
 
 
+# raw_logs.job_id and job_state.job_id are Postgres integers
+JOB_ID_MIN, JOB_ID_MAX = -2**31, 2**31 - 1
+
+
+def parse_iso_datetime(value: str) -> datetime:
+    # fromisoformat covers the usual forms far faster; isoparse takes the rest
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return isoparse(value)
+
+
+def _has_nul(value: Any) -> bool:
+    if isinstance(value, str):
+        return "\x00" in value
+    if isinstance(value, dict):
+        return any(_has_nul(k) or _has_nul(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return any(_has_nul(v) for v in value)
+    return False
+
+
 class BaseEventLog(BaseModel):
+    """
+    An ingested event. Besides the field types it checks what Postgres
+    would otherwise reject at insert time, so one bad event in a batch is
+    reported as invalid instead of failing the whole transaction.
+    """
     event: EventTypeEnum
-    job_id: int
+    job_id: int = Field(ge=JOB_ID_MIN, le=JOB_ID_MAX)
     timestamp: datetime
     user: Optional[str] = None
     task_id: Optional[str] = None
@@ -26,6 +54,27 @@ class BaseEventLog(BaseModel):
         use_enum_values = True
         extra = "allow"
 
+    @model_validator(mode="before")
+    @classmethod
+    def _no_nul_characters(cls, data: Any) -> Any:
+        # Neither text nor jsonb columns can store \u0000
+        if _has_nul(data):
+            raise ValueError("strings and keys cannot contain NUL (\\u0000) characters")
+        return data
+
+    @model_validator(mode="after")
+    def _parsable_completion_time(self) -> "BaseEventLog":
+        value = (self.model_extra or {}).get("completion_time")
+        if value is None:
+            return self
+        if not isinstance(value, str):
+            raise ValueError("completion_time must be an ISO 8601 string")
+        try:
+            parse_iso_datetime(value)
+        except (ValueError, OverflowError):
+            raise ValueError(f"completion_time is not an ISO 8601 datetime: {value!r}")
+        return self
+
 
 class RawLogCreate(BaseEventLog):
     """Model used to ingest logs from the API"""
@@ -57,8 +106,31 @@ class JobAnalyticsResponse(BaseModel):
     task_count: int
     failed_tasks: int
     success_rate: float
+    task_duration_p50_ms: Optional[float] = None
+    task_duration_p90_ms: Optional[float] = None
+    task_duration_p99_ms: Optional[float] = None
+    task_duration_max_ms: Optional[int] = None
+    total_task_time_ms: Optional[int] = None
+    task_duration_skew: Optional[float] = None
+    straggler_task_ids: Optional[List[str]] = None
 
     class Config:
         orm_mode = True
         use_enum_values = True
-        from_attributes=True
\ No newline at end of file
+        from_attributes=True
+
+
+class JobAnalyticsPage(BaseModel):
+    items: List[JobAnalyticsResponse]
+    next_cursor: Optional[str] = None
+
+
+class JobRollupResponse(BaseModel):
+    key: str  # user, or YYYY-MM-DD when grouped by day
+    job_count: int
+    mean_duration_seconds: float
+    p50_duration_seconds: Optional[float]
+    p95_duration_seconds: Optional[float]
+    total_tasks: int
+    failed_tasks: int
+    success_rate: float
@@ -0,0 +1,277 @@
+"""
+Redis Streams ingestion transport.
+
+Producers XADD events to STREAM_INGEST_KEY, either directly or through
+POST /logs/ingest/queue, and any number of these workers read them as one
+consumer group, bulk insert them into raw_logs and ack. Run one or more:
+
+    python -m app.stream_worker
+"""
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import redis
+from app.database import SessionLocal
+from app.ingestion import (
+    enqueue_job_analytics,
+    normalize_event,
+    validate_event,
+    write_rows,
+)
+from app.schemas import BaseEventLog
+from app.utils.config import (
+    STREAM_INGEST_KEY,
+    STREAM_INGEST_GROUP,
+    STREAM_INGEST_DEAD_LETTER,
+    STREAM_INGEST_BATCH,
+    STREAM_INGEST_BLOCK_MS,
+    STREAM_INGEST_CLAIM_IDLE_MS,
+    STREAM_INGEST_MAX_DELIVERIES,
+    STREAM_INGEST_MAX_LENGTH,
+    STREAM_WORKER_METRICS_PORT,
+)
+from app.utils.logger import logger
+from app.utils.metrics import ingest_clock, ingest_events, start_metrics_server
+from app.utils.redis_client import redis_client, async_redis_client
+
+RETRY_SECONDS = 1
+
+Entry = Tuple[bytes, Dict[bytes, bytes]]
+
+
+class StreamFullError(Exception):
+    """Raised when the ingest stream backlog is at STREAM_INGEST_MAX_LENGTH."""
+
+
+def stream_fields(log: BaseEventLog) -> Dict[str, str]:
+    """
+    Stream entry for an event: its JSON plus the raw_logs id it will be
+    stored under. External producers may leave out the id.
+    """
+    return {"id": str(uuid.uuid4()), "event": log.model_dump_json()}
+
+
+def publish_event(log: BaseEventLog) -> str:
+    """XADD an event to the ingest stream and return its log_id."""
+    # Acked entries are deleted, so XLEN is the backlog still to be written
+    if STREAM_INGEST_MAX_LENGTH and redis_client.xlen(STREAM_INGEST_KEY) >= STREAM_INGEST_MAX_LENGTH:
+        raise StreamFullError("Ingest stream is full")
+    fields = stream_fields(log)
+    redis_client.xadd(STREAM_INGEST_KEY, fields)
+    return fields["id"]
+
+
+async def async_publish_event(log: BaseEventLog) -> str:
+    """Async counterpart of publish_event."""
+    if STREAM_INGEST_MAX_LENGTH and await async_redis_client.xlen(STREAM_INGEST_KEY) >= STREAM_INGEST_MAX_LENGTH:
+        raise StreamFullError("Ingest stream is full")
+    fields = stream_fields(log)
+    await async_redis_client.xadd(STREAM_INGEST_KEY, fields)
+    return fields["id"]
+
+
+def _plain(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def stream_stats() -> Dict[str, Any]:
+    """Backlog of the ingest stream and the state of its consumer groups."""
+    try:
+        groups = redis_client.xinfo_groups(STREAM_INGEST_KEY)
+    except redis.ResponseError:
+        # The stream does not exist until the first XADD or worker start
+        groups = []
+    return {
+        "stream": STREAM_INGEST_KEY,
+        "length": redis_client.xlen(STREAM_INGEST_KEY),
+        "capacity": STREAM_INGEST_MAX_LENGTH or None,
+        "dead_letter_length": redis_client.xlen(STREAM_INGEST_DEAD_LETTER),
+        "groups": [{_plain(k): _plain(v) for k, v in group.items()} for group in groups],
+    }
+
+
+def decode_entry(fields: Dict[bytes, bytes]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate and normalize a stream entry, returning (row, None) or (None, error)."""
+    try:
+        item = json.loads(fields[b"event"])
+    except KeyError:
+        return None, "Missing event field"
+    except ValueError as e:
+        return None, f"Invalid JSON: {e}"
+    log, error = validate_event(item)
+    if error:
+        return None, error
+    row = normalize_event(log)
+    if b"id" in fields:
+        try:
+            row["id"] = uuid.UUID(fields[b"id"].decode())
+        except ValueError:
+            return None, "Invalid id"
+    return row, None
+
+
+class StreamConsumer:
+    """
+    One member of the STREAM_INGEST_GROUP consumer group.
+
+    Each round reads up to `batch` new entries with XREADGROUP, writes the
+    valid ones with one bulk insert and job_state update, then XACKs and
+    XDELs the whole batch. A batch that fails to commit is not acked; its
+    entries stay pending and are picked up again with XAUTOCLAIM once they
+    have been idle for `claim_idle_ms`, by this or any other consumer, so a
+    crashed worker loses nothing. Duplicates from redelivery are dropped by
+    ON CONFLICT DO NOTHING. Invalid entries, entries the database rejects
+    (isolated by write_rows, so the rest of the batch is still written) and
+    entries delivered `max_deliveries` times without being written go to
+    the dead-letter stream.
+    """
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        stream: str = STREAM_INGEST_KEY,
+        group: str = STREAM_INGEST_GROUP,
+        dead_letter: str = STREAM_INGEST_DEAD_LETTER,
+        batch: int = STREAM_INGEST_BATCH,
+        block_ms: int = STREAM_INGEST_BLOCK_MS,
+        claim_idle_ms: int = STREAM_INGEST_CLAIM_IDLE_MS,
+        max_deliveries: int = STREAM_INGEST_MAX_DELIVERIES,
+    ):
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.stream = stream
+        self.group = group
+        self.dead_letter = dead_letter
+        self.batch = batch
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self._stopping = threading.Event()
+        self._claim_cursor = "0-0"
+        self._last_claim = 0.0
+
+    def ensure_group(self):
+        try:
+            redis_client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        self.ensure_group()
+        logger.info(f"Stream consumer {self.name} reading {self.stream} as {self.group}")
+        while not self._stopping.is_set():
+            try:
+                entries = self._claim_stale() or self._read_new()
+                if entries:
+                    self._process(entries)
+            except Exception as e:
+                logger.error(f"Stream consumer {self.name} failed, retrying: {e}")
+                time.sleep(RETRY_SECONDS)
+        logger.info(f"Stream consumer {self.name} stopped")
+
+    def _read_new(self) -> List[Entry]:
+        response = redis_client.xreadgroup(
+            self.group, self.name, {self.stream: ">"}, count=self.batch, block=self.block_ms
+        )
+        return response[0][1] if response else []
+
+    def _claim_stale(self) -> List[Entry]:
+        """
+        Take over entries other consumers left pending. Runs every half
+        claim interval, and on every round while a scan is in progress.
+        """
+        now = time.monotonic()
+        if self._claim_cursor == "0-0" and now - self._last_claim < self.claim_idle_ms / 2000:
+            return []
+        self._last_claim = now
+        if self._claim_cursor == "0-0":
+            self._dead_letter_exhausted()
+
+        cursor, entries, *_ = redis_client.xautoclaim(
+            self.stream, self.group, self.name, self.claim_idle_ms, start_id=self._claim_cursor, count=self.batch
+        )
+        self._claim_cursor = _plain(cursor)
+        # Entries deleted while pending come back without fields
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if entries:
+            logger.warning(f"Claimed {len(entries)} entries idle for over {self.claim_idle_ms}ms")
+        return entries
+
+    def _dead_letter_exhausted(self):
+        pending = redis_client.xpending_range(
+            self.stream, self.group, min="-", max="+", count=self.batch, idle=self.claim_idle_ms
+        )
+        exhausted = [p["message_id"] for p in pending if p["times_delivered"] >= self.max_deliveries]
+        if not exhausted:
+            return
+        entries = []
+        for entry_id in exhausted:
+            entries.extend(redis_client.xrange(self.stream, min=entry_id, max=entry_id))
+        self._finish(
+            exhausted,
+            [(fields, f"Not written after {self.max_deliveries} deliveries") for _, fields in entries],
+        )
+        logger.error(f"Dead-lettered {len(exhausted)} entries to {self.dead_letter}")
+
+    def _process(self, entries: List[Entry]):
+        clock = ingest_clock("stream")
+        rows, row_fields, invalid = [], [], []
+        for _, fields in entries:
+            row, error = decode_entry(fields)
+            if error:
+                invalid.append((fields, error))
+            else:
+                rows.append(row)
+                row_fields.append(fields)
+        clock.mark("validate")
+
+        ready_jobs = []
+        if rows:
+            db = SessionLocal()
+            try:
+                # Rows the database rejects are dead-lettered, not retried with the batch
+                inserted, ready_jobs, rejected = write_rows(db, rows, clock)
+                db.commit()
+                clock.mark("commit")
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            invalid.extend((row_fields[position], error) for position, error in rejected.items())
+            ingest_events.labels("stream", "accepted").inc(len(inserted))
+            ingest_events.labels("stream", "duplicate").inc(len(rows) - len(rejected) - len(inserted))
+
+        enqueue_job_analytics(ready_jobs)
+        clock.mark("enqueue")
+        ingest_events.labels("stream", "invalid").inc(len(invalid))
+        self._finish([entry_id for entry_id, _ in entries], invalid)
+
+    def _finish(self, entry_ids: List[bytes], dead: List[Tuple[Dict[bytes, bytes], str]]):
+        """Dead-letter `dead`, then ack and delete `entry_ids`, in one round trip."""
+        pipe = redis_client.pipeline(transaction=False)
+        for fields, error in dead:
+            pipe.xadd(self.dead_letter, {**fields, b"error": error})
+        pipe.xack(self.stream, self.group, *entry_ids)
+        pipe.xdel(self.stream, *entry_ids)
+        pipe.execute()
+
+
+def main():
+    start_metrics_server(STREAM_WORKER_METRICS_PORT)
+    consumer = StreamConsumer()
+    signal.signal(signal.SIGTERM, lambda *_: consumer.stop())
+    signal.signal(signal.SIGINT, lambda *_: consumer.stop())
+    consumer.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from app.utils.config import STRAGGLER_FACTOR, STRAGGLER_MAX_TASKS
+
+# Task durations are sketched in log-spaced buckets, four per doubling, so a
+# percentile read back from the histogram is within ~9% of the exact value.
+# Bucket 0 holds durations under 2^(1/4) ms; the last one everything from
+# 2^27 ms (~37 hours) up.
+BUCKETS_PER_DOUBLING = 4
+HISTOGRAM_SIZE = 27 * BUCKETS_PER_DOUBLING + 1
+PERCENTILES = (50, 90, 99)
+
+STAT_FIELDS = (
+    "task_duration_p50_ms",
+    "task_duration_p90_ms",
+    "task_duration_p99_ms",
+    "task_duration_max_ms",
+    "total_task_time_ms",
+    "task_duration_skew",
+    "straggler_task_ids",
+)
+
+
+# Durations at or beyond this (~24.8 days) are treated as malformed, which
+# also keeps job_state's bigint duration sum from overflowing
+MAX_TASK_DURATION_MS = 2**31
+
+
+def task_duration_ms(log: Dict[str, Any]) -> Optional[int]:
+    """The numeric duration_ms of a TaskEnd log, or None if missing or malformed."""
+    duration_ms = log.get("duration_ms")
+    if (isinstance(duration_ms, (int, float)) and not isinstance(duration_ms, bool)
+            and abs(duration_ms) < MAX_TASK_DURATION_MS):
+        return int(duration_ms)
+    return None
+
+
+def histogram_bucket(duration_ms: int) -> int:
+    if duration_ms <= 1:
+        return 0
+    return min(int(BUCKETS_PER_DOUBLING * math.log2(duration_ms)), HISTOGRAM_SIZE - 1)
+
+
+def empty_histogram() -> List[int]:
+    return [0] * HISTOGRAM_SIZE
+
+
+def merge_top_tasks(*top_lists: Iterable[Sequence], limit: int = STRAGGLER_MAX_TASKS) -> List[List]:
+    """Keep the `limit` longest [task_id, duration_ms] pairs across lists."""
+    merged = [list(task) for tasks in top_lists for task in (tasks or [])]
+    merged.sort(key=lambda task: task[1], reverse=True)
+    return merged[:limit]
+
+
+def empty_task_stats() -> Dict[str, Any]:
+    stats = dict.fromkeys(STAT_FIELDS)
+    stats["total_task_time_ms"] = 0
+    stats["straggler_task_ids"] = []
+    return stats
+
+
+def _finish(p50: float, p90: float, p99: float, max_ms: float, total_ms: int,
+            top_tasks: List[List]) -> Dict[str, Any]:
+    # Plain Python numbers: psycopg2 renders numpy 2 scalars as np.float64(...)
+    p50, p90, p99, max_ms = float(p50), float(p90), float(p99), float(max_ms)
+    threshold = STRAGGLER_FACTOR * p50
+    return {
+        "task_duration_p50_ms": round(p50, 2),
+        "task_duration_p90_ms": round(p90, 2),
+        "task_duration_p99_ms": round(p99, 2),
+        "task_duration_max_ms": int(max_ms),
+        "total_task_time_ms": int(total_ms),
+        # How much longer the slowest task ran than the typical one
+        "task_duration_skew": round(max_ms / p50, 2) if p50 else None,
+        "straggler_task_ids": [
+            task_id for task_id, duration in top_tasks if duration > threshold and task_id is not None
+        ],
+    }
+
+
+def stats_from_durations(task_ids: Sequence[Optional[str]], durations: Sequence[int]) -> Dict[str, Any]:
+    """
+    Exact task statistics over all of a job's task durations, as array
+    operations: percentiles, max and total in one pass each, and stragglers
+    (tasks over STRAGGLER_FACTOR x the median, longest first, at most
+    STRAGGLER_MAX_TASKS) via a partial sort of just the candidates.
+    """
+    if not len(durations):
+        return empty_task_stats()
+    values = np.asarray(durations, dtype=np.int64)
+    p50, p90, p99 = np.percentile(values, PERCENTILES)
+
+    candidates = np.flatnonzero(values > STRAGGLER_FACTOR * p50)
+    if len(candidates) > STRAGGLER_MAX_TASKS:
+        longest = np.argpartition(values[candidates], -STRAGGLER_MAX_TASKS)[-STRAGGLER_MAX_TASKS:]
+        candidates = candidates[longest]
+    top_tasks = sorted(
+        ([task_ids[i], int(values[i])] for i in candidates),
+        key=lambda task: task[1],
+        reverse=True,
+    )
+    return _finish(p50, p90, p99, values.max(), int(values.sum()), top_tasks)
+
+
+def _bucket_value(bucket: int, max_ms: float) -> float:
+    """Geometric midpoint of a bucket, capped at the largest duration seen."""
+    if bucket == 0:
+        return min(1.0, max_ms)
+    return min(2 ** ((bucket + 0.5) / BUCKETS_PER_DOUBLING), max_ms)
+
+
+def stats_from_sketch(histogram: Optional[Sequence[int]], top_tasks: Optional[List[List]],
+                      total_ms: int) -> Dict[str, Any]:
+    """
+    Task statistics from the mergeable sketch job_state keeps while logs
+    are ingested: approximate percentiles from the duration histogram,
+    exact max and total, and stragglers from the running top-N tasks.
+    """
+    if not histogram or not top_tasks:
+        return empty_task_stats()
+    counts = np.asarray(histogram, dtype=np.int64)
+    cumulative = np.cumsum(counts)
+    if not cumulative[-1]:
+        return empty_task_stats()
+    max_ms = top_tasks[0][1]
+    ranks = np.asarray(PERCENTILES) / 100 * cumulative[-1]
+    buckets = np.searchsorted(cumulative, ranks, side="left")
+    p50, p90, p99 = (_bucket_value(int(b), max_ms) for b in buckets)
+    return _finish(p50, p90, p99, max_ms, total_ms, top_tasks)
@@ -0,0 +1,530 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from app.utils.config import (
+    LOCAL_CACHE_MAX_ENTRIES,
+    LOCAL_CACHE_TTL,
+    CACHE_INVALIDATION_CHANNEL,
+    CACHING_TTL,
+    CACHE_LOCK_TIMEOUT,
+    CACHE_LOCK_WAIT,
+    CACHE_EARLY_REFRESH_BETA,
+    ANALYTICS_DEDUPE_TTL,
+)
+from app.utils.logger import logger
+from app.utils.redis_client import redis_client, async_redis_client
+from app.utils.serialization import compress
+
+
+class TierStats:
+    """Thread-safe counters for one cache tier."""
+
+    def __init__(self, *counters: str):
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(counters or ("hits", "misses", "evictions", "invalidations"), 0)
+
+    def incr(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+class LocalCache:
+    """
+    Bounded per-process LRU cache with a TTL, holding serialized response
+    bytes. Entries are evicted least-recently-used first once
+    `max_entries` is reached, and expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_entries: int = LOCAL_CACHE_MAX_ENTRIES, ttl: int = LOCAL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = TierStats()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats.incr("hits")
+                    return value
+                del self._entries[key]
+                self.stats.incr("evictions")
+        self.stats.incr("misses")
+        return None
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.incr("evictions")
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.stats.incr("invalidations")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+local_cache = LocalCache()
+redis_stats = TierStats()
+_listener = None
+
+
+def write_through(jobs: Dict[int, Tuple[str, bytes]]):
+    """
+    Store freshly computed job responses, keyed by job_id and given as
+    (end date, response bytes), in the per-job keys and in their day's
+    summary hash, and drop the stale copies from every local tier. One
+    pipeline round trip; the summary is updated in place, never rebuilt.
+    """
+    if not jobs:
+        return
+    days = set()
+    pipe = redis_client.pipeline(transaction=False)
+    for job_id, (day, payload) in jobs.items():
+        pipe.set(job_cache_key(job_id), payload, ex=CACHING_TTL)
+        pipe.hset(summary_cache_key(day), job_id, payload)
+        days.add(day)
+    for day in days:
+        pipe.expire(summary_cache_key(day), CACHING_TTL)
+        # Retire every cached page of the day's paginated summary. The new
+        # generation is a timestamp rather than a counter, so once the key
+        # expires it cannot come back round to a value whose pages are
+        # still cached
+        pipe.set(summary_generation_key(day), time.time_ns(), ex=CACHING_TTL)
+    keys = [job_cache_key(job_id) for job_id in jobs] + [summary_cache_key(day) for day in days]
+    pipe.publish(CACHE_INVALIDATION_CHANNEL, json.dumps(keys))
+    pipe.execute()
+
+
+def _on_invalidation(message):
+    try:
+        local_cache.delete(*json.loads(message["data"]))
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Ignoring malformed cache invalidation message: {e}")
+
+
+def start_invalidation_listener():
+    """Subscribe to invalidation messages on a background thread."""
+    global _listener
+    if _listener is not None:
+        return
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{CACHE_INVALIDATION_CHANNEL: _on_invalidation})
+    _listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+
+def stop_invalidation_listener():
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    local = local_cache.stats.snapshot()
+    local["entries"] = len(local_cache)
+    redis = redis_stats.snapshot()
+    redis.update(fill_stats.snapshot())
+    return {"local": local, "redis": redis}
+
+
+# How Redis misses and early refreshes were resolved
+fill_stats = TierStats("fills", "shared_fills", "early_refreshes")
+# Recent fill duration per key family ("job_analytics", "analytics_summary"),
+# the delta used by the early refresh draw
+_fill_seconds: Dict[str, float] = {}
+
+Loader = Callable[[], Optional[bytes]]
+
+
+def job_cache_key(job_id: int) -> str:
+    return f"job_analytics:{job_id}"
+
+
+def summary_cache_key(day: str) -> str:
+    # v3: a hash of job_id -> job response bytes, maintained by the worker
+    return f"analytics_summary:v3:{day}"
+
+
+def _record_fill(key: str, started: float):
+    family = key.split(":", 1)[0]
+    elapsed = time.monotonic() - started
+    previous = _fill_seconds.get(family, elapsed)
+    _fill_seconds[family] = 0.8 * previous + 0.2 * elapsed
+
+
+def _should_refresh_early(key: str, pttl_ms: int) -> bool:
+    """
+    Probabilistic early expiration: refresh with a probability that rises
+    as the key nears expiry and with how long a fill takes, so one request
+    recomputes shortly before the TTL instead of every request right after.
+    """
+    if CACHE_EARLY_REFRESH_BETA <= 0 or pttl_ms is None or pttl_ms < 0:
+        return False
+    delta = _fill_seconds.get(key.split(":", 1)[0], 0.0)
+    return delta * CACHE_EARLY_REFRESH_BETA * -math.log(1.0 - random.random()) >= pttl_ms / 1000
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+_flights: Dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight(key: str, fill: Loader) -> Optional[bytes]:
+    """Run `fill` once per key in this process; concurrent callers share its result."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if flight.done.wait(CACHE_LOCK_TIMEOUT):
+            fill_stats.incr("shared_fills")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        return fill()
+
+    try:
+        flight.value = fill()
+        return flight.value
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _fill(key: str, load: Loader, ttl: int) -> Optional[bytes]:
+    """
+    Fill `key` from `load` under a Redis lock, so only one process queries
+    the database. Processes that lose the race wait for the lock and then
+    read the value the winner stored.
+    """
+    lock = redis_client.lock(f"lock:{key}", timeout=CACHE_LOCK_TIMEOUT, sleep=0.01)
+    acquired = lock.acquire(blocking_timeout=CACHE_LOCK_WAIT)
+    try:
+        if acquired:
+            cached = redis_client.get(key)
+            if cached is not None:
+                fill_stats.incr("shared_fills")
+                return cached
+        started = time.monotonic()
+        value = load()
+        fill_stats.incr("fills")
+        _record_fill(key, started)
+        if value is not None:
+            redis_client.set(key, value, ex=ttl)
+        return value
+    finally:
+        if acquired:
+            lock.release()
+
+
+def _refresh_early(key: str, load: Loader, ttl: int) -> Optional[bytes]:
+    lock = redis_client.lock(f"lock:{key}", timeout=CACHE_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return None
+    try:
+        started = time.monotonic()
+        value = load()
+        fill_stats.incr("early_refreshes")
+        _record_fill(key, started)
+        if value is not None:
+            redis_client.set(key, value, ex=ttl)
+        return value
+    finally:
+        lock.release()
+
+
+def fetch(key: str, load: Loader, ttl: int = CACHING_TTL) -> Optional[bytes]:
+    """
+    Return the cached payload for `key` from the local tier, then Redis,
+    then `load`. `load` returns the final (optionally compressed) response
+    bytes, or None when there is nothing to cache; the same bytes are
+    stored in both tiers. Misses are single-flight per key, within the
+    process and across processes.
+    """
+    body = local_cache.get(key)
+    if body is not None:
+        return body
+
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.get(key)
+    pipe.pttl(key)
+    cached, pttl = pipe.execute()
+
+    if cached is not None:
+        redis_stats.incr("hits")
+        if _should_refresh_early(key, pttl):
+            cached = _refresh_early(key, load, ttl) or cached
+    else:
+        redis_stats.incr("misses")
+        cached = _single_flight(key, lambda: _fill(key, load, ttl))
+        if cached is None:
+            return None
+
+    local_cache.set(key, cached)
+    return cached
+
+
+_async_flights: Dict[str, asyncio.Future] = {}
+
+
+async def _async_single_flight(key: str, fill: Callable[[], Awaitable]):
+    """Run `fill` once per key on this event loop; concurrent callers await the same future."""
+    flight = _async_flights.get(key)
+    if flight is not None:
+        fill_stats.incr("shared_fills")
+        return await asyncio.shield(flight)
+    flight = _async_flights[key] = asyncio.ensure_future(fill())
+    try:
+        return await asyncio.shield(flight)
+    finally:
+        _async_flights.pop(key, None)
+
+
+async def _async_fill(key: str, load: Callable[[], Awaitable[Optional[bytes]]], ttl: int) -> Optional[bytes]:
+    lock = async_redis_client.lock(f"lock:{key}", timeout=CACHE_LOCK_TIMEOUT, sleep=0.01)
+    acquired = await lock.acquire(blocking_timeout=CACHE_LOCK_WAIT)
+    try:
+        if acquired:
+            cached = await async_redis_client.get(key)
+            if cached is not None:
+                fill_stats.incr("shared_fills")
+                return cached
+        started = time.monotonic()
+        value = await load()
+        fill_stats.incr("fills")
+        _record_fill(key, started)
+        if value is not None:
+            await async_redis_client.set(key, value, ex=ttl)
+        return value
+    finally:
+        if acquired:
+            await lock.release()
+
+
+async def _async_refresh_early(key: str, load: Callable[[], Awaitable[Optional[bytes]]], ttl: int) -> Optional[bytes]:
+    lock = async_redis_client.lock(f"lock:{key}", timeout=CACHE_LOCK_TIMEOUT)
+    if not await lock.acquire(blocking=False):
+        return None
+    try:
+        started = time.monotonic()
+        value = await load()
+        fill_stats.incr("early_refreshes")
+        _record_fill(key, started)
+        if value is not None:
+            await async_redis_client.set(key, value, ex=ttl)
+        return value
+    finally:
+        await lock.release()
+
+
+async def async_fetch(key: str, load: Callable[[], Awaitable[Optional[bytes]]],
+                      ttl: int = CACHING_TTL) -> Optional[bytes]:
+    """Async counterpart of `fetch` for the asyncpg-backed routers."""
+    body = local_cache.get(key)
+    if body is not None:
+        return body
+
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        pipe.get(key)
+        pipe.pttl(key)
+        cached, pttl = await pipe.execute()
+
+    if cached is not None:
+        redis_stats.incr("hits")
+        if _should_refresh_early(key, pttl):
+            cached = await _async_refresh_early(key, load, ttl) or cached
+    else:
+        redis_stats.incr("misses")
+        cached = await _async_single_flight(key, lambda: _async_fill(key, load, ttl))
+        if cached is None:
+            return None
+
+    local_cache.set(key, cached)
+    return cached
+
+
+# A summary hash is authoritative only once a full build from the database
+# has set this field; until then it may hold just the jobs written through
+SUMMARY_COMPLETE = b"__complete__"
+
+
+def summary_generation_key(day: str) -> str:
+    return f"analytics_summary_generation:{day}"
+
+
+def summary_page_key(day: str, generation: int, params: str) -> str:
+    """Cache key of one page of a day's summary, retired when the day's generation moves on."""
+    digest = hashlib.sha1(params.encode()).hexdigest()
+    return f"analytics_summary_page:{day}:{generation}:{digest}"
+
+
+def summary_generation(day: str) -> int:
+    return int(redis_client.get(summary_generation_key(day)) or 0)
+
+
+async def async_summary_generation(day: str) -> int:
+    return int(await async_redis_client.get(summary_generation_key(day)) or 0)
+
+SummaryLoader = Callable[[], Dict[int, bytes]]
+
+
+def _assemble_summary(fields: Dict[bytes, bytes]) -> Optional[bytes]:
+    rows = sorted((int(job_id), payload) for job_id, payload in fields.items() if job_id != SUMMARY_COMPLETE)
+    if not rows:
+        return None
+    return compress(b"[" + b",".join(payload for _, payload in rows) + b"]")
+
+
+def _store_summary(pipe, key: str, rows: Dict[int, bytes]):
+    # HSETNX so a job the worker wrote through during the build keeps its newer value
+    for job_id, payload in rows.items():
+        pipe.hsetnx(key, job_id, payload)
+    pipe.hset(key, SUMMARY_COMPLETE, 1)
+    pipe.expire(key, CACHING_TTL)
+    pipe.hgetall(key)
+
+
+def _fill_summary(key: str, load: SummaryLoader) -> Dict[bytes, bytes]:
+    lock = redis_client.lock(f"lock:{key}", timeout=CACHE_LOCK_TIMEOUT, sleep=0.01)
+    acquired = lock.acquire(blocking_timeout=CACHE_LOCK_WAIT)
+    try:
+        if acquired:
+            fields = redis_client.hgetall(key)
+            if SUMMARY_COMPLETE in fields:
+                fill_stats.incr("shared_fills")
+                return fields
+        rows = load()
+        fill_stats.incr("fills")
+        if not rows:
+            return {}
+        pipe = redis_client.pipeline(transaction=False)
+        _store_summary(pipe, key, rows)
+        return pipe.execute()[-1]
+    finally:
+        if acquired:
+            lock.release()
+
+
+def fetch_summary(day: str, load: SummaryLoader) -> Optional[bytes]:
+    """
+    Return the summary response bytes for `day`, assembled from its Redis
+    hash. The hash is built from `load` (job_id -> job response bytes) once
+    and then kept current by `write_through`, so a busy day is not rebuilt
+    from job_analytics after every computed job.
+    """
+    key = summary_cache_key(day)
+    body = local_cache.get(key)
+    if body is not None:
+        return body
+
+    fields = redis_client.hgetall(key)
+    if SUMMARY_COMPLETE in fields:
+        redis_stats.incr("hits")
+    else:
+        redis_stats.incr("misses")
+        fields = _single_flight(key, lambda: _fill_summary(key, load))
+
+    body = _assemble_summary(fields)
+    if body is not None:
+        local_cache.set(key, body)
+    return body
+
+
+async def _async_fill_summary(key: str, load: Callable[[], Awaitable[Dict[int, bytes]]]) -> Dict[bytes, bytes]:
+    lock = async_redis_client.lock(f"lock:{key}", timeout=CACHE_LOCK_TIMEOUT, sleep=0.01)
+    acquired = await lock.acquire(blocking_timeout=CACHE_LOCK_WAIT)
+    try:
+        if acquired:
+            fields = await async_redis_client.hgetall(key)
+            if SUMMARY_COMPLETE in fields:
+                fill_stats.incr("shared_fills")
+                return fields
+        rows = await load()
+        fill_stats.incr("fills")
+        if not rows:
+            return {}
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            _store_summary(pipe, key, rows)
+            return (await pipe.execute())[-1]
+    finally:
+        if acquired:
+            await lock.release()
+
+
+async def async_fetch_summary(day: str, load: Callable[[], Awaitable[Dict[int, bytes]]]) -> Optional[bytes]:
+    """Async counterpart of `fetch_summary`."""
+    key = summary_cache_key(day)
+    body = local_cache.get(key)
+    if body is not None:
+        return body
+
+    fields = await async_redis_client.hgetall(key)
+    if SUMMARY_COMPLETE in fields:
+        redis_stats.incr("hits")
+    else:
+        redis_stats.incr("misses")
+        fields = await _async_single_flight(key, lambda: _async_fill_summary(key, load))
+
+    body = _assemble_summary(fields)
+    if body is not None:
+        local_cache.set(key, body)
+    return body
+
+
+def _compute_key(job_id: int) -> str:
+    return f"compute_requested:{job_id}"
+
+
+def claim_compute(job_ids: Iterable[int]) -> List[int]:
+    """
+    Mark compute requests for `job_ids` as in flight and return the ones
+    that were not already, so each job has at most one queued compute.
+    """
+    job_ids = list(job_ids)
+    if not job_ids:
+        return []
+    pipe = redis_client.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.set(_compute_key(job_id), 1, nx=True, ex=ANALYTICS_DEDUPE_TTL)
+    return [job_id for job_id, claimed in zip(job_ids, pipe.execute()) if claimed]
+
+
+def release_compute(job_ids: Iterable[int]):
+    keys = [_compute_key(job_id) for job_id in job_ids]
+    if keys:
+        redis_client.delete(*keys)
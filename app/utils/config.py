@@ -18,6 +18,31 @@ DB_USER = os.getenv("DB_USER","postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD","postgres")
 DB_NAME = os.getenv("DB_NAME","postgres")
 DATABASE_URL= f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL= f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+#Connection pool, shared by the sync and async engines
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE","5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW","10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING","true").lower() == "true"
+
+#Logging (app/utils/logger.py); "production" turns on the enqueued JSON profile
+LOG_PROFILE = os.getenv("LOG_PROFILE","development") # development | production
+_PRODUCTION_LOGS = LOG_PROFILE == "production"
+LOG_LEVEL = os.getenv("LOG_LEVEL","INFO" if _PRODUCTION_LOGS else "DEBUG")
+LOG_JSON = os.getenv("LOG_JSON",str(_PRODUCTION_LOGS)).lower() == "true" # one JSON object per line
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE",str(_PRODUCTION_LOGS)).lower() == "true" # write from a background thread
+LOG_DIAGNOSE = os.getenv("LOG_DIAGNOSE",str(not _PRODUCTION_LOGS)).lower() == "true" # variable values in tracebacks
+LOG_INTERCEPT_STDLIB = os.getenv("LOG_INTERCEPT_STDLIB",str(_PRODUCTION_LOGS)).lower() == "true" # route uvicorn/celery logging through loguru
+LOG_RATE_LIMIT_SECONDS = float(os.getenv("LOG_RATE_LIMIT_SECONDS","10")) # per-request messages let through per key; 0 disables
+
+#Prometheus metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED","true").lower() == "true"
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE","1.0")) # share of ingest requests whose stages are timed
+CELERY_METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT","0")) # 0 disables the worker's metrics server
+STREAM_WORKER_METRICS_PORT = int(os.getenv("STREAM_WORKER_METRICS_PORT","0")) # 0 disables the stream worker's metrics server
+
+#Serve the API from the asyncpg engine and async Redis client
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB","false").lower() == "true"
 
 #Redis Connection Details
 REDIS_HOST = os.getenv("REDIS_HOST","localhost")
@@ -25,4 +50,73 @@ REDIS_PORT = os.getenv("REDIS_PORT","6379")
 REDIS_DB = os.getenv("REDIS_DB","0")
 
 CACHING_TTL=3600 # 1 hour
-SCHEDULER_TIMEOUT=60 # 1 minute
\ No newline at end of file
+SCHEDULER_TIMEOUT=60 # 1 minute
+SCHEDULER_DRAIN_BATCH = int(os.getenv("SCHEDULER_DRAIN_BATCH", "10000")) # pending_jobs rows claimed per round
+SCHEDULER_MAX_ATTEMPTS = int(os.getenv("SCHEDULER_MAX_ATTEMPTS", "5")) # claims before a job is left in pending_jobs
+SCHEDULER_RETRY_DELAY = int(os.getenv("SCHEDULER_RETRY_DELAY", "300")) # seconds before an unfinished claim is retried
+
+#Ingestion
+INGEST_BATCH_MAX_ITEMS = int(os.getenv("INGEST_BATCH_MAX_ITEMS", "10000"))
+INGEST_INSERT_CHUNK_SIZE = int(os.getenv("INGEST_INSERT_CHUNK_SIZE", "1000"))
+INGEST_STREAM_CHUNK_SIZE = int(os.getenv("INGEST_STREAM_CHUNK_SIZE", "5000"))
+INGEST_STREAM_MAX_ERRORS = int(os.getenv("INGEST_STREAM_MAX_ERRORS", "100"))
+
+#Write-behind buffer for POST /logs/ingest
+WRITE_BUFFER_ENABLED = os.getenv("WRITE_BUFFER_ENABLED","false").lower() == "true"
+WRITE_BUFFER_MAX_BATCH = int(os.getenv("WRITE_BUFFER_MAX_BATCH","500")) # rows per flush
+WRITE_BUFFER_MAX_LATENCY_MS = int(os.getenv("WRITE_BUFFER_MAX_LATENCY_MS","50")) # max wait before a flush
+WRITE_BUFFER_MAX_SIZE = int(os.getenv("WRITE_BUFFER_MAX_SIZE","10000")) # queued rows before returning 429
+WRITE_BUFFER_DURABLE = os.getenv("WRITE_BUFFER_DURABLE","false").lower() == "true"
+WRITE_BUFFER_STREAM = os.getenv("WRITE_BUFFER_STREAM","ingest_buffer")
+
+#Redis Streams transport: POST /logs/ingest/queue and external producers XADD, app.stream_worker writes
+STREAM_INGEST_KEY = os.getenv("STREAM_INGEST_KEY","ingest_events")
+STREAM_INGEST_GROUP = os.getenv("STREAM_INGEST_GROUP","raw_log_writers")
+STREAM_INGEST_DEAD_LETTER = os.getenv("STREAM_INGEST_DEAD_LETTER","ingest_events_dead")
+STREAM_INGEST_BATCH = int(os.getenv("STREAM_INGEST_BATCH","500")) # entries per XREADGROUP and bulk insert
+STREAM_INGEST_BLOCK_MS = int(os.getenv("STREAM_INGEST_BLOCK_MS","1000")) # XREADGROUP wait when the stream is empty
+STREAM_INGEST_CLAIM_IDLE_MS = int(os.getenv("STREAM_INGEST_CLAIM_IDLE_MS","60000")) # pending entries idle this long are claimed from their consumer
+STREAM_INGEST_MAX_DELIVERIES = int(os.getenv("STREAM_INGEST_MAX_DELIVERIES","5")) # deliveries before an entry is dead-lettered
+STREAM_INGEST_MAX_LENGTH = int(os.getenv("STREAM_INGEST_MAX_LENGTH","1000000")) # backlog before the endpoint returns 429; 0 disables
+
+#Analytics
+ANALYTICS_COMPUTE_MODE = os.getenv("ANALYTICS_COMPUTE_MODE","incremental") # incremental | sql | python
+ANALYTICS_BATCH_CHUNK_SIZE = int(os.getenv("ANALYTICS_BATCH_CHUNK_SIZE","500")) # job_ids per compute_job_analytics_batch task
+
+#raw_logs partitioning
+RAW_LOG_PARTITION_DAYS = int(os.getenv("RAW_LOG_PARTITION_DAYS","1")) # days covered by each partition
+RAW_LOG_PARTITION_PREMAKE = int(os.getenv("RAW_LOG_PARTITION_PREMAKE","3")) # partitions created ahead of today
+RAW_LOG_RETENTION_DAYS = int(os.getenv("RAW_LOG_RETENTION_DAYS","30")) # 0 keeps every partition
+RAW_LOG_RETENTION_ACTION = os.getenv("RAW_LOG_RETENTION_ACTION","drop") # drop | detach
+PARTITION_MAINTENANCE_INTERVAL = 3600 # 1 hour
+
+#In-process cache in front of Redis for the analytics API
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES","10000"))
+LOCAL_CACHE_TTL = int(os.getenv("LOCAL_CACHE_TTL","30")) # seconds; bounds staleness if an invalidation is missed
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL","analytics_cache_invalidation")
+
+#Cache-miss stampede protection
+CACHE_LOCK_TIMEOUT = int(os.getenv("CACHE_LOCK_TIMEOUT","10")) # seconds a fill lock is held before it expires
+CACHE_LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT","5")) # seconds a miss waits for another process's fill
+CACHE_EARLY_REFRESH_BETA = float(os.getenv("CACHE_EARLY_REFRESH_BETA","1.0")) # 0 disables probabilistic early refresh
+ANALYTICS_DEDUPE_TTL = int(os.getenv("ANALYTICS_DEDUPE_TTL","300")) # seconds a requested compute blocks duplicates
+
+#Analytics cache payloads
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES","65536")) # gzip cached payloads at least this large; 0 disables
+CACHE_COMPRESS_LEVEL = int(os.getenv("CACHE_COMPRESS_LEVEL","5"))
+
+#Paginated summary and NDJSON export
+SUMMARY_PAGE_DEFAULT_LIMIT = int(os.getenv("SUMMARY_PAGE_DEFAULT_LIMIT","100"))
+SUMMARY_PAGE_MAX_LIMIT = int(os.getenv("SUMMARY_PAGE_MAX_LIMIT","1000"))
+SUMMARY_EXPORT_BATCH_SIZE = int(os.getenv("SUMMARY_EXPORT_BATCH_SIZE","1000")) # rows fetched per round trip while exporting
+
+#Columnar export of job_analytics and raw_logs (needs pyarrow)
+EXPORT_DIR = os.getenv("EXPORT_DIR",None) # scheduled exports are enabled when set
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT","parquet") # parquet | arrow
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE","10000")) # rows per server-side cursor fetch and row group
+EXPORT_SAFETY_LAG = int(os.getenv("EXPORT_SAFETY_LAG","300")) # seconds the export window trails now()
+EXPORT_INTERVAL = 86400 # 1 day
+
+#Per-job task duration statistics
+STRAGGLER_FACTOR = float(os.getenv("STRAGGLER_FACTOR","1.5")) # tasks slower than this x the median are stragglers
+STRAGGLER_MAX_TASKS = int(os.getenv("STRAGGLER_MAX_TASKS","20")) # longest tasks tracked per job
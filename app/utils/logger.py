@@ -1,22 +1,108 @@
 # logger_config.py
-from loguru import logger
+import logging
 import sys
+import threading
+import time
+from loguru import logger
+from app.utils.config import (
+    LOG_DIAGNOSE,
+    LOG_ENQUEUE,
+    LOG_INTERCEPT_STDLIB,
+    LOG_JSON,
+    LOG_LEVEL,
+    LOG_RATE_LIMIT_SECONDS,
+)
+
+PRETTY_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+    "<level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+
+
+class RateLimitFilter:
+    """
+    Lets one message per `rate_limit` key through every `interval` seconds
+    and drops the rest, so per-request messages cannot flood the sink.
+    Bind the key at the call site:
+
+        logger.bind(rate_limit="duplicate_log").info(...)
+
+    The next message let through for a key reports how many were dropped.
+    Messages without a key always pass.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def __call__(self, record) -> bool:
+        key = record["extra"].get("rate_limit")
+        if key is None or self.interval <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and now - window[0] < self.interval:
+                window[1] += 1
+                return False
+            suppressed = window[1] if window is not None else 0
+            self._windows[key] = [now, 0]
+        if suppressed:
+            record["message"] += f" ({suppressed} similar messages suppressed)"
+            record["extra"]["suppressed"] = suppressed
+        return True
+
+
+class InterceptHandler(logging.Handler):
+    """Forward stdlib logging records (uvicorn, celery) to loguru."""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        frame, depth = logging.currentframe(), 2
+        while frame is not None and frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+        logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+def intercept_stdlib_logging():
+    """
+    Send stdlib logging through the loguru sink. Called at import, and
+    again by the Celery worker, whose own setup would replace it.
+    """
+    logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "celery"):
+        stdlib_logger = logging.getLogger(name)
+        stdlib_logger.handlers = []
+        stdlib_logger.propagate = True
+
 
 # Remove default handler
 logger.remove()
 
-# Add stdout handler with pretty formatting
+# Development: pretty, colorized and synchronous. Production (LOG_PROFILE):
+# JSON lines written by a background thread, without variable values in
+# tracebacks. Shared by the API, the Celery workers and the stream worker.
 logger.add(
     sys.stdout,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
-           "<level>{level: <8}</level> | "
-           "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
-           "<level>{message}</level>",
-    level="DEBUG",
-    colorize=True,
-    backtrace=True,
-    diagnose=True
+    format="{message}" if LOG_JSON else PRETTY_FORMAT,
+    serialize=LOG_JSON,
+    level=LOG_LEVEL,
+    colorize=not LOG_JSON,
+    enqueue=LOG_ENQUEUE,
+    backtrace=LOG_DIAGNOSE,
+    diagnose=LOG_DIAGNOSE,
+    filter=RateLimitFilter(LOG_RATE_LIMIT_SECONDS),
 )
 
+if LOG_INTERCEPT_STDLIB:
+    intercept_stdlib_logging()
+
 # Expose the logger directly
-__all__ = ["logger"]
+__all__ = ["logger", "intercept_stdlib_logging"]
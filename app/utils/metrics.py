@@ -0,0 +1,178 @@
+import os
+import random
+import time
+from typing import Callable, Dict, Optional
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app.utils.config import METRICS_ENABLED, METRICS_SAMPLE_RATE
+from app.utils.logger import logger
+
+# Sub-millisecond buckets for per-stage timings, seconds-scale ones for tasks
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+INGEST_STAGES = ("validate", "normalize", "insert", "job_state", "commit", "enqueue")
+INGEST_PATHS = ("single", "batch", "stream")
+
+ingest_stage_seconds = Histogram(
+    "ingest_stage_seconds",
+    "Time spent in each stage of an ingest request (sampled at METRICS_SAMPLE_RATE)",
+    ["path", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+ingest_events = Counter(
+    "ingest_events_total",
+    "Events handled by the ingest paths",
+    ["path", "outcome"],
+)
+db_pool_checkout_seconds = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the pool",
+    ["engine"],
+    buckets=STAGE_BUCKETS,
+)
+celery_task_seconds = Histogram(
+    "celery_task_seconds",
+    "Celery task run time",
+    ["task", "state"],
+    buckets=TASK_BUCKETS,
+)
+celery_task_queue_lag_seconds = Histogram(
+    "celery_task_queue_lag_seconds",
+    "Time between a task being published and a worker starting it",
+    ["task"],
+    buckets=TASK_BUCKETS,
+)
+analytics_jobs_computed = Counter(
+    "analytics_jobs_computed_total",
+    "Jobs whose analytics were computed and committed",
+    ["task"],
+)
+scheduler_jobs_claimed = Counter(
+    "scheduler_jobs_claimed_total",
+    "Jobs claimed from pending_jobs and enqueued by schedule_pending_analytics",
+)
+scheduler_jobs_exhausted = Gauge(
+    "scheduler_jobs_exhausted",
+    "pending_jobs rows claimed SCHEDULER_MAX_ATTEMPTS times without finishing, as of the last drain",
+    multiprocess_mode="mostrecent",
+)
+
+# Children resolved once, so a sampled request only pays for observe()
+_stage_children = {
+    (path, stage): ingest_stage_seconds.labels(path, stage)
+    for path in INGEST_PATHS for stage in INGEST_STAGES
+}
+
+
+class StageClock:
+    """Observes the time since the previous mark as the named stage."""
+
+    __slots__ = ("path", "_last")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        _stage_children[self.path, stage].observe(now - self._last)
+        self._last = now
+
+
+class _NullClock:
+    __slots__ = ()
+
+    def mark(self, stage: str):
+        pass
+
+
+NULL_CLOCK = _NullClock()
+
+
+def ingest_clock(path: str):
+    """
+    A StageClock for METRICS_SAMPLE_RATE of requests and a no-op clock for
+    the rest, so an unsampled request costs one random() call.
+    """
+    if METRICS_ENABLED and (METRICS_SAMPLE_RATE >= 1 or random.random() < METRICS_SAMPLE_RATE):
+        return StageClock(path)
+    return NULL_CLOCK
+
+
+class CacheCollector:
+    """Exposes the analytics cache tier counters (see app.utils.cache.cache_stats) at scrape time."""
+
+    def __init__(self, stats: Callable[[], Dict[str, Dict[str, int]]]):
+        self.stats = stats
+
+    def collect(self):
+        events = CounterMetricFamily(
+            "analytics_cache_events", "Analytics cache events by tier", labels=["tier", "event"]
+        )
+        entries = GaugeMetricFamily("analytics_cache_local_entries", "Entries in the in-process cache")
+        for tier, counters in self.stats().items():
+            for event, value in counters.items():
+                if event == "entries":
+                    entries.add_metric([], value)
+                else:
+                    events.add_metric([tier, event], value)
+        yield events
+        yield entries
+
+
+class PoolCollector:
+    """Exposes connection pool occupancy at scrape time."""
+
+    def __init__(self, pools: Callable[[], Dict[str, object]]):
+        self.pools = pools
+
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["engine"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Connections open beyond pool_size", labels=["engine"])
+        for name, pool in self.pools().items():
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(pool.overflow(), 0))
+        yield checked_out
+        yield overflow
+
+
+_registry = None
+
+
+def metrics_registry():
+    """
+    The registry to expose: with PROMETHEUS_MULTIPROC_DIR set (prefork
+    Celery workers, several uvicorn workers) the metrics of every process
+    are merged from that directory.
+    """
+    global _registry
+    if _registry is None:
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            from prometheus_client import multiprocess
+            _registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(_registry)
+        else:
+            _registry = REGISTRY
+    return _registry
+
+
+def render_metrics(registry=None) -> bytes:
+    return generate_latest(registry or metrics_registry())
+
+
+def start_metrics_server(port: Optional[int]):
+    """Serve /metrics on its own port, for processes without an HTTP API."""
+    if not METRICS_ENABLED or not port:
+        return
+    start_http_server(port, registry=metrics_registry())
+    logger.info(f"Metrics served on port {port}")
+
@@ -1,8 +1,16 @@
 import redis
+import redis.asyncio
 from app.utils.config import REDIS_HOST,REDIS_DB,REDIS_PORT
 
 redis_client = redis.Redis(
     host=REDIS_HOST,
     port=REDIS_PORT,
     db=REDIS_DB,
-)
\ No newline at end of file
+)
+
+# Used by the async routers; connections are only opened on first use
+async_redis_client = redis.asyncio.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+)
@@ -0,0 +1,54 @@
+import gzip
+from typing import List, Sequence, Type
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+from app.utils.config import CACHE_COMPRESS_MIN_BYTES, CACHE_COMPRESS_LEVEL
+
+try:
+    import orjson
+except ImportError:  # optional; pydantic's serializer produces the same JSON
+    orjson = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+_list_adapters = {}
+
+
+def encode_model(model: BaseModel) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(model.model_dump(), option=orjson.OPT_UTC_Z)
+    return model.model_dump_json().encode()
+
+
+def encode_models(models: Sequence[BaseModel], model_type: Type[BaseModel]) -> bytes:
+    """Serialize a list of models straight to JSON array bytes."""
+    if orjson is not None:
+        return orjson.dumps([m.model_dump() for m in models], option=orjson.OPT_UTC_Z)
+    adapter = _list_adapters.get(model_type)
+    if adapter is None:
+        adapter = _list_adapters[model_type] = TypeAdapter(List[model_type])
+    return adapter.dump_json(list(models))
+
+
+def compress(body: bytes) -> bytes:
+    """Gzip payloads of at least CACHE_COMPRESS_MIN_BYTES; smaller ones are stored as-is."""
+    if CACHE_COMPRESS_MIN_BYTES <= 0 or len(body) < CACHE_COMPRESS_MIN_BYTES:
+        return body
+    return gzip.compress(body, compresslevel=CACHE_COMPRESS_LEVEL)
+
+
+def json_response(payload: bytes, request: Request) -> Response:
+    """
+    Return a cached payload as-is. Compressed payloads are passed through
+    with Content-Encoding: gzip when the client accepts it and inflated
+    otherwise, so nothing is parsed or re-validated on a cache hit.
+    """
+    if payload[:2] != GZIP_MAGIC:
+        return Response(content=payload, media_type="application/json")
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(
+            content=payload,
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return Response(content=gzip.decompress(payload), media_type="application/json")
@@ -0,0 +1,219 @@
+import json
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.database import SessionLocal
+from app.ingestion import enqueue_job_analytics, write_rows
+from app.utils.config import (
+    WRITE_BUFFER_MAX_BATCH,
+    WRITE_BUFFER_MAX_LATENCY_MS,
+    WRITE_BUFFER_MAX_SIZE,
+    WRITE_BUFFER_DURABLE,
+    WRITE_BUFFER_STREAM,
+)
+from app.utils.logger import logger
+from app.utils.redis_client import redis_client
+
+FLUSH_RETRY_SECONDS = 1
+
+
+class BufferFullError(Exception):
+    """Raised when the write-behind buffer is at capacity."""
+
+
+def _encode_row(row: Dict[str, Any]) -> str:
+    return json.dumps(row, default=str)
+
+
+def _decode_row(data: bytes) -> Dict[str, Any]:
+    row = json.loads(data)
+    row["id"] = uuid.UUID(row["id"])
+    row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+    return row
+
+
+class WriteBehindBuffer:
+    """
+    Coalesce single-event ingests into micro-batches.
+
+    submit() puts a normalized raw_logs row on a bounded in-process queue
+    (and, when durable, appends it to a Redis stream first). A background
+    thread drains the queue every `max_latency_ms` or `max_batch` rows,
+    whichever comes first, and writes each batch with one bulk insert.
+    Entries still in the stream at startup are replayed; client-side row
+    ids make the replay idempotent.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = WRITE_BUFFER_MAX_BATCH,
+        max_latency_ms: int = WRITE_BUFFER_MAX_LATENCY_MS,
+        max_size: int = WRITE_BUFFER_MAX_SIZE,
+        stream: Optional[str] = WRITE_BUFFER_STREAM if WRITE_BUFFER_DURABLE else None,
+    ):
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self.max_size = max_size
+        self.stream = stream
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._flushes = 0
+        self._rows_flushed = 0
+        self._rows_duplicate = 0
+        self._rows_invalid = 0
+        self._rejected = 0
+        self._flush_errors = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.stream:
+            self._replay_stream()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+        self._thread.start()
+        logger.info(f"Write-behind buffer started (batch={self.max_batch}, latency={self.max_latency}s)")
+
+    def stop(self):
+        """Stop accepting rows and flush everything still queued."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        logger.info("Write-behind buffer stopped")
+
+    def submit(self, row: Dict[str, Any]):
+        """
+        Enqueue a normalized raw_logs row. Raises BufferFullError when the
+        queue is at capacity so callers can apply backpressure.
+        """
+        if self._stopping.is_set() or self._queue.full():
+            self._count_rejected()
+            raise BufferFullError("Write-behind buffer is full")
+
+        stream_id = None
+        if self.stream:
+            stream_id = redis_client.xadd(self.stream, {"row": _encode_row(row)})
+        try:
+            self._queue.put_nowait((row, stream_id))
+        except queue.Full:
+            if stream_id is not None:
+                redis_client.xdel(self.stream, stream_id)
+            self._count_rejected()
+            raise BufferFullError("Write-behind buffer is full")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "enabled": self._thread is not None,
+                "durable": bool(self.stream),
+                "queue_depth": self._queue.qsize(),
+                "capacity": self.max_size,
+                "flushes": self._flushes,
+                "rows_flushed": self._rows_flushed,
+                "rows_duplicate": self._rows_duplicate,
+                "rows_invalid": self._rows_invalid,
+                "rejected": self._rejected,
+                "flush_errors": self._flush_errors,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+                "max_flush_ms": round(self._max_flush_ms, 3),
+                "avg_flush_ms": round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0.0,
+            }
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush_with_retry(batch)
+
+    def _flush_with_retry(self, batch: List[Tuple[Dict[str, Any], Optional[bytes]]]):
+        while True:
+            try:
+                self._flush(batch)
+                return
+            except Exception as e:
+                with self._stats_lock:
+                    self._flush_errors += 1
+                if self._stopping.is_set():
+                    logger.error(f"Dropping {len(batch)} buffered logs on shutdown after flush error: {e}")
+                    return
+                logger.error(f"Write-behind flush of {len(batch)} logs failed, retrying: {e}")
+                time.sleep(FLUSH_RETRY_SECONDS)
+
+    def _flush(self, batch: List[Tuple[Dict[str, Any], Optional[bytes]]]):
+        rows = [row for row, _ in batch]
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            # A row the database rejects would fail every retry; drop just that row
+            inserted, ready_jobs, rejected = write_rows(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for position, error in rejected.items():
+            logger.error(f"Dropping buffered log {rows[position]['id']} the database rejected: {error}")
+        enqueue_job_analytics(ready_jobs)
+        stream_ids = [stream_id for _, stream_id in batch if stream_id is not None]
+        if stream_ids:
+            redis_client.xdel(self.stream, *stream_ids)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._flushes += 1
+            self._rows_flushed += len(inserted)
+            self._rows_duplicate += len(rows) - len(rejected) - len(inserted)
+            self._rows_invalid += len(rejected)
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    def _replay_stream(self):
+        """Flush rows left in the Redis stream by a previous (crashed) process."""
+        newest = redis_client.xrevrange(self.stream, count=1)
+        if not newest:
+            return
+        end_id = newest[0][0]
+        replayed = 0
+        while True:
+            # Flushed entries are deleted, so each read starts from the head again
+            entries = redis_client.xrange(self.stream, min="-", max=end_id, count=self.max_batch)
+            if not entries:
+                break
+            self._flush_with_retry([(_decode_row(fields[b"row"]), entry_id) for entry_id, fields in entries])
+            replayed += len(entries)
+        if replayed:
+            logger.info(f"Replayed {replayed} buffered logs from stream {self.stream}")
+
+    def _count_rejected(self):
+        with self._stats_lock:
+            self._rejected += 1
+
+
+write_buffer = WriteBehindBuffer()
@@ -0,0 +1,131 @@
+"""
+Microbenchmark the analytics summary cache paths before and after caching
+the final response bytes.
+
+"before" is the old format: a JSON list of per-row JSON strings, decoded
+twice and re-validated on every hit, then serialized again for the
+response_model. "after" stores the encoded response (gzipped when large)
+and returns it as-is. Both the hit path (what a cached request costs) and
+the miss path (encoding after the database query) are timed in-process on
+--jobs synthetic rows, with no Redis or Postgres needed.
+
+    python -m benchmarks.analytics_cache --jobs 10000 --output cache_bench.json
+
+With --url the same comparison can be made end to end against a running
+API, e.g. before and after deploying:
+
+    python -m benchmarks.analytics_cache --url "http://localhost:8000/analytics/summary?date=2024-03-30"
+"""
+import argparse
+import json
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from typing import List
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from app.schemas import JobAnalyticsResponse
+from app.utils.serialization import compress, encode_models, json_response
+
+summary_adapter = TypeAdapter(List[JobAnalyticsResponse])
+
+
+def make_summary(jobs: int) -> List[JobAnalyticsResponse]:
+    start = datetime(2024, 3, 30, tzinfo=timezone.utc)
+    return [
+        JobAnalyticsResponse(
+            job_id=job_id,
+            user=f"data_engineer_{job_id % 50}",
+            start_time=start + timedelta(seconds=job_id),
+            end_time=start + timedelta(seconds=job_id + 300),
+            duration_seconds=300,
+            task_count=100,
+            failed_tasks=job_id % 7,
+            success_rate=round(100 - (job_id % 7), 2),
+        )
+        for job_id in range(jobs)
+    ]
+
+
+def make_request(accept_encoding: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/analytics/summary",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    })
+
+
+def old_encode(models) -> bytes:
+    return json.dumps([m.model_dump_json() for m in models]).encode()
+
+
+def old_hit(cached: bytes) -> bytes:
+    models = [JobAnalyticsResponse.model_validate(json.loads(s)) for s in json.loads(cached)]
+    # What response_model did with the returned list
+    validated = summary_adapter.validate_python(models)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def rate(fn, *args, seconds: float) -> dict:
+    calls = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < seconds:
+        fn(*args)
+        calls += 1
+        elapsed = time.perf_counter() - started
+    return {"per_sec": round(calls / elapsed, 2), "ms_per_call": round(elapsed / calls * 1000, 3)}
+
+
+def run_local(jobs: int, seconds: float) -> dict:
+    models = make_summary(jobs)
+    old_cached = old_encode(models)
+    new_cached = compress(encode_models(models, JobAnalyticsResponse))
+    gzip_client = make_request("gzip, deflate")
+    identity_client = make_request("identity")
+
+    return {
+        "jobs": jobs,
+        "payload_bytes": {"before": len(old_cached), "after": len(new_cached)},
+        "hit": {
+            "before": rate(old_hit, old_cached, seconds=seconds),
+            "after_gzip_client": rate(json_response, new_cached, gzip_client, seconds=seconds),
+            "after_identity_client": rate(json_response, new_cached, identity_client, seconds=seconds),
+        },
+        "miss_encode": {
+            "before": rate(old_encode, models, seconds=seconds),
+            "after": rate(lambda: compress(encode_models(models, JobAnalyticsResponse)), seconds=seconds),
+        },
+    }
+
+
+def run_http(url: str, requests: int, gzip_client: bool) -> dict:
+    headers = {"Accept-Encoding": "gzip"} if gzip_client else {}
+    started = time.perf_counter()
+    for _ in range(requests):
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+            response.read()
+    elapsed = time.perf_counter() - started
+    return {"url": url, "requests": requests, "requests_per_sec": round(requests / elapsed, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10_000)
+    parser.add_argument("--seconds", type=float, default=3.0, help="Time spent on each measured path")
+    parser.add_argument("--url", help="Measure a running API instead of the in-process paths")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--gzip", action="store_true", help="Send Accept-Encoding: gzip with --url")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    if args.url:
+        report = run_http(args.url, args.requests, args.gzip)
+    else:
+        report = run_local(args.jobs, args.seconds)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,199 @@
+"""
+Profile the single-event ingest path stage by stage, before and after the
+lean hot path.
+
+Runs --events synthetic events through each path in one process (one core)
+against the configured database, exactly as POST /logs/ingest handles
+them minus HTTP, and reports events/sec plus the mean time and share of
+each stage:
+
+  legacy: validate -> jsonable_encoder + isoparse -> RawLog ORM add/flush
+          -> job_state -> commit -> refresh
+  lean:   validate -> model_dump(mode="json") -> core INSERT ... RETURNING id
+          -> job_state -> commit
+
+Rows are written under job_ids from --job-base upwards and deleted
+afterwards unless --keep is given.
+
+    python -m benchmarks.ingest_profile --events 5000 --output ingest_profile.json
+    python -m benchmarks.ingest_profile --paths lean --cprofile lean.pstats
+"""
+import argparse
+import cProfile
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from dateutil.parser import isoparse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete
+from app.database import SessionLocal
+from app.ingestion import insert_raw_logs, normalize_event, track_job_events
+from app.models import JobState, LogStatusEnum, RawLog, RawLogEventKey
+from app.schemas import BaseEventLog
+
+
+class StageTimer:
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] += time.perf_counter() - started
+
+    def report(self, events: int, elapsed: float) -> dict:
+        staged = sum(self.totals.values())
+        return {
+            "events": events,
+            "events_per_sec": round(events / elapsed, 1),
+            "stages": {
+                name: {
+                    "mean_us": round(total / events * 1e6, 1),
+                    "share_pct": round(total / staged * 100, 1),
+                }
+                for name, total in self.totals.items()
+            },
+        }
+
+
+def make_events(count: int, job_base: int, tasks_per_job: int = 50):
+    start = datetime.now(timezone.utc)
+    for i in range(count):
+        job_id = job_base + i // (tasks_per_job + 2)
+        position = i % (tasks_per_job + 2)
+        timestamp = (start + timedelta(milliseconds=i)).isoformat()
+        if position == 0:
+            yield {"event": "SparkListenerJobStart", "job_id": job_id, "timestamp": timestamp,
+                   "user": f"user_{job_id % 20}"}
+        elif position == tasks_per_job + 1:
+            yield {"event": "SparkListenerJobEnd", "job_id": job_id, "timestamp": timestamp,
+                   "completion_time": timestamp, "job_result": "JobSucceeded"}
+        else:
+            yield {"event": "SparkListenerTaskEnd", "job_id": job_id, "timestamp": timestamp,
+                   "task_id": f"task_{position}", "duration_ms": random.randint(100, 10000),
+                   "successful": random.random() > 0.05}
+
+
+def legacy_normalize(log: BaseEventLog) -> dict:
+    """normalize_event as it was before the lean path, for comparison."""
+    ts = log.timestamp
+    ts = ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+    full_log = jsonable_encoder(log)
+    full_log["timestamp"] = ts.isoformat()
+    if "completion_time" in full_log:
+        full_log["completion_time"] = isoparse(full_log["completion_time"]).astimezone(timezone.utc).isoformat()
+    return {
+        "id": uuid.uuid4(),
+        "job_id": log.job_id,
+        "event": log.event,
+        "user": log.user,
+        "timestamp": ts,
+        "task_id": log.task_id,
+        "log": full_log,
+        "status": LogStatusEnum.PENDING,
+    }
+
+
+def ingest_legacy(db, payload: dict, timer: StageTimer):
+    with timer.stage("validate"):
+        log = BaseEventLog.model_validate(payload)
+    with timer.stage("normalize"):
+        row = legacy_normalize(log)
+    with timer.stage("insert"):
+        raw_log = RawLog(**row)
+        db.add(raw_log)
+        db.flush()
+    with timer.stage("job_state"):
+        track_job_events(db, [row], {row["id"]})
+    with timer.stage("commit"):
+        db.commit()
+    with timer.stage("refresh"):
+        db.refresh(raw_log)
+    return str(raw_log.id)
+
+
+def ingest_lean(db, payload: dict, timer: StageTimer):
+    with timer.stage("validate"):
+        log = BaseEventLog.model_validate(payload)
+    with timer.stage("normalize"):
+        row = normalize_event(log)
+    with timer.stage("insert"):
+        inserted = insert_raw_logs(db, [row])
+    with timer.stage("job_state"):
+        track_job_events(db, [row], inserted)
+    with timer.stage("commit"):
+        db.commit()
+    return str(row["id"])
+
+
+PATHS = {"legacy": ingest_legacy, "lean": ingest_lean}
+
+
+def run_path(name: str, events: list, profile_path: str = None) -> dict:
+    ingest = PATHS[name]
+    timer = StageTimer()
+    db = SessionLocal()
+    profiler = cProfile.Profile() if profile_path else None
+    try:
+        if profiler:
+            profiler.enable()
+        started = time.perf_counter()
+        for payload in events:
+            ingest(db, payload, timer)
+        elapsed = time.perf_counter() - started
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+    finally:
+        db.close()
+    return timer.report(len(events), elapsed)
+
+
+def cleanup(job_ids):
+    db = SessionLocal()
+    try:
+        db.execute(delete(RawLog).where(RawLog.job_id.in_(job_ids)))
+        db.execute(delete(RawLogEventKey).where(RawLogEventKey.job_id.in_(job_ids)))
+        db.execute(delete(JobState).where(JobState.job_id.in_(job_ids)))
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000, help="Events per path")
+    parser.add_argument("--paths", nargs="+", choices=list(PATHS), default=list(PATHS))
+    parser.add_argument("--job-base", type=int, default=900_000_000, help="First job_id used for synthetic jobs")
+    parser.add_argument("--cprofile", help="Also write cProfile stats of the last path to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic rows afterwards")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    report = {}
+    job_ids = set()
+    try:
+        for index, name in enumerate(args.paths):
+            # Each path gets its own jobs so neither sees the other's duplicates
+            base = args.job_base + index * args.events
+            events = list(make_events(args.events, base))
+            job_ids.update(event["job_id"] for event in events)
+            profile_path = args.cprofile if index == len(args.paths) - 1 else None
+            report[name] = run_path(name, events, profile_path)
+    finally:
+        if not args.keep and job_ids:
+            cleanup(sorted(job_ids))
+
+    if "legacy" in report and "lean" in report:
+        report["speedup"] = round(report["lean"]["events_per_sec"] / report["legacy"]["events_per_sec"], 2)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,313 @@
+"""
+End-to-end load test of the ingest API, the analytics workers and the
+analytics API, against a running stack on local Postgres and Redis (API,
+Celery worker and beat, plus app.stream_worker for --mode queue).
+
+Synthetic jobs (see benchmarks.synthetic) are delivered over HTTP with
+--concurrency client threads, optionally out of order and with duplicate
+deliveries. The run reports:
+
+  ingest              events/sec and p50/p90/p99 request latency
+  time_to_analytics   from a job's start and end both being acked to its
+                      job_analytics row being visible (polled in Postgres)
+  analytics_api       QPS and latency of GET /analytics/jobs/{id} and
+                      GET /analytics/summary over the generated jobs
+
+Results are printed as JSON together with the git commit they were
+measured on; --output saves them and --compare prints the change in the
+headline figures against an earlier result file. Use a scratch database:
+the synthetic jobs are not removed and count towards the day's rollups.
+
+    python -m benchmarks.load_test --jobs 500 --tasks-per-job 50 --output base.json
+    python -m benchmarks.load_test --jobs 500 --tasks-per-job 50 --compare base.json
+    python -m benchmarks.load_test --mode batch --batch-size 500 --out-of-order 0.2 --duplicates 0.05
+"""
+import argparse
+import http.client
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models import JobAnalytics
+from benchmarks.synthetic import deliver, generate_events
+
+INGEST_PATHS = {"single": "/logs/ingest", "batch": "/logs/ingest/batch", "queue": "/logs/ingest/queue"}
+BOUNDARY_EVENTS = {"SparkListenerJobStart", "SparkListenerJobEnd"}
+# Status codes that mean the event is stored or durably queued
+ACKED = {200, 202, 409}
+
+# (path in the report, label) of the figures --compare looks at
+HEADLINE = [
+    (("ingest", "events_per_sec"), "ingest events/sec"),
+    (("ingest", "latency_ms", "p50"), "ingest p50 ms"),
+    (("ingest", "latency_ms", "p99"), "ingest p99 ms"),
+    (("time_to_analytics_ms", "p50"), "time to analytics p50 ms"),
+    (("time_to_analytics_ms", "p99"), "time to analytics p99 ms"),
+    (("analytics_api", "job", "qps"), "GET /analytics/jobs QPS"),
+    (("analytics_api", "summary", "qps"), "GET /analytics/summary QPS"),
+]
+
+
+class Client:
+    """Minimal keep-alive HTTP client, one connection per thread."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.prefix = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: bytes = None,
+                content_type: str = "application/json") -> Tuple[int, float]:
+        """Returns (status, seconds); status 0 is a connection error."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {"Content-Type": content_type} if body is not None else {}
+        started = time.perf_counter()
+        try:
+            conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            status = 0
+        return status, time.perf_counter() - started
+
+
+def percentiles_ms(seconds: List[float]) -> Dict[str, Optional[float]]:
+    if not seconds:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(seconds)
+
+    def at(q: float) -> float:
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 2)
+
+    return {"p50": at(0.50), "p90": at(0.90), "p99": at(0.99), "max": round(ordered[-1] * 1000, 2)}
+
+
+class CompletionTracker:
+    """Records when each job first has both its start and end event acked."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._acked: Dict[int, set] = {}
+        self.complete_at: Dict[int, float] = {}
+
+    def acked(self, events: List[Dict], at: float):
+        with self._lock:
+            for event in events:
+                if event["event"] not in BOUNDARY_EVENTS or event["job_id"] in self.complete_at:
+                    continue
+                seen = self._acked.setdefault(event["job_id"], set())
+                seen.add(event["event"])
+                if len(seen) == 2:
+                    self.complete_at[event["job_id"]] = at
+
+
+def run_ingest(client: Client, mode: str, deliveries: List[Dict], batch_size: int, concurrency: int,
+               tracker: CompletionTracker) -> Dict:
+    path = INGEST_PATHS[mode]
+    if mode == "batch":
+        requests = [deliveries[i:i + batch_size] for i in range(0, len(deliveries), batch_size)]
+    else:
+        requests = [[event] for event in deliveries]
+
+    def send(events: List[Dict]) -> Tuple[int, float]:
+        body = json.dumps(events if mode == "batch" else events[0]).encode()
+        status, seconds = client.request("POST", path, body)
+        if status in ACKED:
+            tracker.acked(events, time.perf_counter())
+        return status, seconds
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(send, requests))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "events": len(deliveries),
+        "requests": len(requests),
+        "seconds": round(elapsed, 3),
+        "events_per_sec": round(len(deliveries) / elapsed, 1),
+        "latency_ms": percentiles_ms([seconds for _, seconds in results]),
+        "status": dict(Counter(str(status) for status, _ in results)),
+    }
+
+
+class AnalyticsPoller(threading.Thread):
+    """Polls job_analytics for the synthetic jobs and records when each row appears."""
+
+    def __init__(self, job_ids: List[int], interval: float):
+        super().__init__(name="analytics-poller", daemon=True)
+        self.job_ids = job_ids
+        self.interval = interval
+        self.visible_at: Dict[int, float] = {}
+        self.deadline = None
+
+    def finish_by(self, deadline: float):
+        self.deadline = deadline
+
+    def run(self):
+        db = SessionLocal()
+        try:
+            while True:
+                outstanding = [job_id for job_id in self.job_ids if job_id not in self.visible_at]
+                if not outstanding or (self.deadline and time.perf_counter() > self.deadline):
+                    return
+                found = db.execute(
+                    select(JobAnalytics.job_id).where(JobAnalytics.job_id.in_(outstanding))
+                ).scalars().all()
+                now = time.perf_counter()
+                for job_id in found:
+                    self.visible_at[job_id] = now
+                # End the snapshot so the next poll sees new commits
+                db.rollback()
+                time.sleep(self.interval)
+        finally:
+            db.close()
+
+
+def time_to_analytics(tracker: CompletionTracker, poller: AnalyticsPoller, jobs: int) -> Dict:
+    durations = [
+        poller.visible_at[job_id] - complete_at
+        for job_id, complete_at in tracker.complete_at.items()
+        if job_id in poller.visible_at
+    ]
+    return {
+        "jobs": jobs,
+        "complete": len(tracker.complete_at),
+        "computed": len(poller.visible_at),
+        # A row can appear before the last ack is seen when the poll races it
+        **percentiles_ms([max(d, 0.0) for d in durations]),
+    }
+
+
+def run_read_load(client: Client, paths: List[str], seconds: float, concurrency: int) -> Dict:
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed: int) -> List[Tuple[int, float]]:
+        rng = random.Random(seed)
+        results = []
+        while time.perf_counter() < deadline:
+            results.append(client.request("GET", rng.choice(paths)))
+        return results
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = [r for batch in pool.map(worker, range(concurrency)) for r in batch]
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(results),
+        "qps": round(len(results) / elapsed, 1),
+        "latency_ms": percentiles_ms([seconds for _, seconds in results]),
+        "status": dict(Counter(str(status) for status, _ in results)),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _lookup(report: Dict, path: Tuple[str, ...]):
+    for key in path:
+        if not isinstance(report, dict) or key not in report:
+            return None
+        report = report[key]
+    return report
+
+
+def compare(before: Dict, after: Dict) -> Dict:
+    changes = {}
+    for path, label in HEADLINE:
+        old, new = _lookup(before, path), _lookup(after, path)
+        if old is None or new is None:
+            continue
+        changes[label] = {
+            "before": old,
+            "after": new,
+            "change_pct": round((new - old) / old * 100, 1) if old else None,
+        }
+    return {"against": before.get("meta", {}).get("commit"), "headline": changes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the API")
+    parser.add_argument("--mode", choices=list(INGEST_PATHS), default="single", help="Ingest endpoint to drive")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--tasks-per-job", type=int, default=50)
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Share of failed tasks and jobs")
+    parser.add_argument("--out-of-order", type=float, default=0.0, help="Share of events delivered late")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Share of events delivered twice")
+    parser.add_argument("--batch-size", type=int, default=500, help="Events per request with --mode batch")
+    parser.add_argument("--concurrency", type=int, default=16, help="Client threads")
+    parser.add_argument("--job-base", type=int, help="First job_id (default: derived from the clock)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--analytics-timeout", type=float, default=120.0,
+                        help="Seconds after ingest to wait for analytics")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--read-seconds", type=float, default=10.0, help="Duration of each analytics API load")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--compare", help="Earlier results file to compare the headline figures with")
+    args = parser.parse_args()
+
+    # Fresh job ids per run, so reruns are not answered as duplicates
+    job_base = args.job_base or 1_000_000_000 + (int(time.time()) % 1_000_000) * 1000
+    rng = random.Random(args.seed)
+    events = list(generate_events(args.jobs, args.tasks_per_job, args.failure_rate, job_base, rng=rng))
+    deliveries = deliver(events, args.out_of_order, args.duplicates, rng=rng)
+    job_ids = list(range(job_base, job_base + args.jobs))
+
+    client = Client(args.url)
+    tracker = CompletionTracker()
+    poller = AnalyticsPoller(job_ids, args.poll_interval)
+    poller.start()
+
+    ingest = run_ingest(client, args.mode, deliveries, args.batch_size, args.concurrency, tracker)
+    poller.finish_by(time.perf_counter() + args.analytics_timeout)
+    poller.join()
+
+    day = datetime.now(timezone.utc).date().isoformat()
+    computed = sorted(poller.visible_at) or job_ids
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "run_at": datetime.now(timezone.utc).isoformat(),
+            "job_base": job_base,
+            "params": vars(args),
+        },
+        "ingest": ingest,
+        "time_to_analytics_ms": time_to_analytics(tracker, poller, args.jobs),
+        "analytics_api": {
+            "job": run_read_load(client, [f"/analytics/jobs/{job_id}" for job_id in computed],
+                                 args.read_seconds, args.concurrency),
+            "summary": run_read_load(client, [f"/analytics/summary?date={day}"], args.read_seconds, args.concurrency),
+        },
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(json.load(f), report)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,136 @@
+"""
+Benchmark the compute queries against raw_logs before and after the
+PENDING partial indexes and the BRIN index on timestamp. The scheduler
+drains pending_jobs instead of scanning raw_logs, so it has no query here.
+
+Seeds a scratch copy of raw_logs (bench_raw_logs) with --rows rows, mostly
+PROCESSED with a recent PENDING tail, times each query with EXPLAIN ANALYZE
+using only the original single-column indexes, adds the new indexes and
+times them again. Results are printed (and optionally written) as JSON.
+
+    python -m benchmarks.scheduler_queries --rows 10000000 --output before_after.json
+"""
+import argparse
+import json
+import statistics
+from sqlalchemy import text
+from app.database import engine
+
+SEED_SQL = """
+    INSERT INTO bench_raw_logs (id, event, job_id, "user", timestamp, task_id, log, status)
+    SELECT gen_random_uuid(),
+           CASE g % :tasks_per_job
+               WHEN 0 THEN 'SPARK_LISTENER_JOB_START'::eventtypeenum
+               WHEN 1 THEN 'SPARK_LISTENER_JOB_END'::eventtypeenum
+               ELSE 'SPARK_LISTENER_TASK_END'::eventtypeenum
+           END,
+           g / :tasks_per_job,
+           NULL,
+           now() - make_interval(secs => (:rows - g)::float8 * :spread_seconds / :rows),
+           CASE WHEN g % :tasks_per_job > 1 THEN 'task_' || g END,
+           jsonb_build_object('successful', random() > 0.1, 'duration_ms', (random() * 10000)::int),
+           CASE WHEN g > :rows - :pending_rows THEN 'PENDING'::logstatusenum
+                ELSE 'PROCESSED'::logstatusenum END
+    FROM generate_series(1, :rows) AS g
+"""
+
+BASELINE_INDEXES = [
+    "CREATE INDEX ON bench_raw_logs (job_id)",
+    'CREATE INDEX ON bench_raw_logs ("user")',
+    "CREATE INDEX ON bench_raw_logs (task_id)",
+]
+
+NEW_INDEXES = [
+    "CREATE INDEX ON bench_raw_logs (job_id) WHERE status = 'PENDING'",
+    "CREATE INDEX ON bench_raw_logs (timestamp, job_id) WHERE status = 'PENDING'",
+    "CREATE INDEX ON bench_raw_logs USING brin (timestamp)",
+]
+
+QUERIES = {
+    # Shape of the pending-log lookups in compute_job_analytics
+    "compute_pending_logs": """
+        SELECT count(*) FROM bench_raw_logs
+        WHERE job_id = (SELECT max(job_id) FROM bench_job_state) AND status = 'PENDING'
+    """,
+    # Time-range scan served by the BRIN index
+    "recent_hour_scan": """
+        SELECT count(*) FROM bench_raw_logs WHERE timestamp >= now() - interval '1 hour'
+    """,
+}
+
+
+def time_queries(conn, repeats: int):
+    results = {}
+    for name, sql in QUERIES.items():
+        timings = []
+        for _ in range(repeats):
+            plan = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")).scalar()
+            timings.append(plan[0]["Execution Time"])
+        results[name] = {
+            "median_ms": round(statistics.median(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "max_ms": round(max(timings), 3),
+        }
+    return results
+
+
+def run(rows: int, tasks_per_job: int, pending_rows: int, spread_days: int, repeats: int, keep: bool):
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text("DROP TABLE IF EXISTS bench_raw_logs, bench_job_state"))
+        conn.execute(text("CREATE TABLE bench_raw_logs (LIKE raw_logs INCLUDING DEFAULTS)"))
+        conn.execute(text(SEED_SQL), {
+            "rows": rows,
+            "tasks_per_job": tasks_per_job,
+            "pending_rows": pending_rows,
+            "spread_seconds": spread_days * 86400,
+        })
+        conn.execute(text("""
+            CREATE TABLE bench_job_state AS
+            SELECT job_id,
+                   bool_or(event = 'SPARK_LISTENER_JOB_START') AS has_start,
+                   bool_or(event = 'SPARK_LISTENER_JOB_END') AS has_end
+            FROM bench_raw_logs GROUP BY job_id
+        """))
+        conn.execute(text("ALTER TABLE bench_job_state ADD PRIMARY KEY (job_id)"))
+
+        for ddl in BASELINE_INDEXES:
+            conn.execute(text(ddl))
+        conn.execute(text("VACUUM ANALYZE bench_raw_logs"))
+        before = time_queries(conn, repeats)
+
+        for ddl in NEW_INDEXES:
+            conn.execute(text(ddl))
+        conn.execute(text("ANALYZE bench_raw_logs"))
+        after = time_queries(conn, repeats)
+
+        if not keep:
+            conn.execute(text("DROP TABLE bench_raw_logs, bench_job_state"))
+
+    return {
+        "rows": rows,
+        "pending_rows": pending_rows,
+        "tasks_per_job": tasks_per_job,
+        "spread_days": spread_days,
+        "repeats": repeats,
+        "before": before,
+        "after": after,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--tasks-per-job", type=int, default=100)
+    parser.add_argument("--pending-rows", type=int, default=20_000)
+    parser.add_argument("--spread-days", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the bench tables afterwards")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    report = run(args.rows, args.tasks_per_job, args.pending_rows, args.spread_days, args.repeats, args.keep)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
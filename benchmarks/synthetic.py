@@ -0,0 +1,79 @@
+"""
+Synthetic Spark listener events for load tests and sample data.
+
+generate_events() yields each job's JobStart, TaskEnd and JobEnd events in
+order; deliver() turns them into a delivery sequence with some events
+displaced (out-of-order arrival) and some sent twice (listener retries).
+Both take a random.Random so runs are reproducible from a seed.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+
+def _iso(ts: datetime) -> str:
+    return ts.isoformat().replace("+00:00", "Z")
+
+
+def job_events(job_id: int, start_time: datetime, tasks: int, failure_rate: float,
+               rng: random.Random) -> List[Dict]:
+    """One job: a JobStart, `tasks` TaskEnds and a JobEnd, in event-time order."""
+    events = [{
+        "event": "SparkListenerJobStart",
+        "job_id": job_id,
+        "timestamp": _iso(start_time),
+        "user": f"user_{job_id % 50}",
+    }]
+    elapsed_ms = 0
+    for i in range(1, tasks + 1):
+        duration_ms = int(rng.lognormvariate(7.5, 0.8))  # median ~1.8s, long right tail
+        elapsed_ms += duration_ms // 4  # tasks overlap across executors
+        events.append({
+            "event": "SparkListenerTaskEnd",
+            "job_id": job_id,
+            "timestamp": _iso(start_time + timedelta(milliseconds=elapsed_ms)),
+            "task_id": f"task_{i:05}",
+            "duration_ms": duration_ms,
+            "successful": rng.random() >= failure_rate,
+        })
+    end_time = _iso(start_time + timedelta(milliseconds=elapsed_ms + 1000))
+    events.append({
+        "event": "SparkListenerJobEnd",
+        "job_id": job_id,
+        "timestamp": end_time,
+        "completion_time": end_time,
+        "job_result": "JobSucceeded" if rng.random() >= failure_rate else "JobFailed",
+    })
+    return events
+
+
+def generate_events(jobs: int, tasks_per_job: int, failure_rate: float = 0.05, job_base: int = 1,
+                    start_time: Optional[datetime] = None, rng: Optional[random.Random] = None) -> Iterator[Dict]:
+    """
+    Events for `jobs` jobs with ids from `job_base` up. Task counts vary
+    around `tasks_per_job` (half to one and a half times it), and jobs
+    start a second apart from `start_time` (default: now, UTC).
+    """
+    rng = rng or random.Random()
+    start_time = start_time or datetime.now(timezone.utc)
+    for offset in range(jobs):
+        tasks = rng.randint(max(1, tasks_per_job // 2), max(1, tasks_per_job * 3 // 2))
+        yield from job_events(job_base + offset, start_time + timedelta(seconds=offset), tasks, failure_rate, rng)
+
+
+def deliver(events: List[Dict], out_of_order: float = 0.0, duplicates: float = 0.0, window: int = 100,
+            rng: Optional[random.Random] = None) -> List[Dict]:
+    """
+    Delivery order for `events`: an `out_of_order` fraction is moved up to
+    `window` positions later, and a `duplicates` fraction is delivered a
+    second time up to `window` positions after the original.
+    """
+    rng = rng or random.Random()
+    keyed = []
+    for index, event in enumerate(events):
+        position = index + (rng.uniform(0, window) if rng.random() < out_of_order else 0)
+        keyed.append((position, index, event))
+        if rng.random() < duplicates:
+            keyed.append((position + rng.uniform(0, window), index, dict(event)))
+    keyed.sort(key=lambda item: (item[0], item[1]))
+    return [event for _, _, event in keyed]
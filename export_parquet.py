@@ -0,0 +1,26 @@
+import argparse
+from app.database import SessionLocal
+from app.export import EXPORT_TABLES, export_all
+from app.utils.config import EXPORT_BATCH_SIZE, EXPORT_DIR, EXPORT_FORMAT
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export job_analytics and raw_logs rows inserted since the last run to "
+                    "day-partitioned Parquet or Arrow files.")
+    parser.add_argument("--dir", default=EXPORT_DIR, required=EXPORT_DIR is None,
+                        help="Output directory; also holds the insertion_time watermarks")
+    parser.add_argument("--tables", nargs="+", choices=list(EXPORT_TABLES), default=list(EXPORT_TABLES))
+    parser.add_argument("--format", choices=["parquet", "arrow"], default=EXPORT_FORMAT)
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE,
+                        help="Rows fetched per server-side cursor round trip")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        results = export_all(session, args.dir, args.tables, args.format, args.batch_size)
+    finally:
+        session.close()
+
+    for table, summary in results.items():
+        print(f"{table}: {summary['rows']} rows, {summary['files']} files, watermark {summary['watermark']}")
@@ -0,0 +1,35 @@
+import argparse
+from app.database import SessionLocal
+from app.ingestion import StreamIngestor, iter_chunks, iter_ndjson_lines
+from app.utils.config import INGEST_STREAM_CHUNK_SIZE
+
+
+def ingest_file(path: str, chunk_size: int = INGEST_STREAM_CHUNK_SIZE):
+    """
+    Stream an NDJSON Spark event-log file (plain or gzipped) into raw_logs,
+    committing every `chunk_size` lines.
+    """
+    session = SessionLocal()
+    ingestor = StreamIngestor(session)
+    try:
+        with open(path, "rb") as f:
+            for lines in iter_chunks(iter_ndjson_lines(f), chunk_size):
+                ingestor.ingest_lines(lines)
+    finally:
+        session.close()
+    return ingestor.summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest NDJSON Spark event-log files into raw_logs.")
+    parser.add_argument("paths", nargs="+", help="NDJSON files, optionally gzipped")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_STREAM_CHUNK_SIZE,
+                        help="Number of lines validated and committed per transaction")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        summary = ingest_file(path, args.chunk_size)
+        print(f"{path}: {summary['accepted']} accepted, {summary['duplicate']} duplicate, "
+              f"{summary['invalid']} invalid ({summary['lines']} lines)")
+        for error in summary["errors"]:
+            print(f"  line {error['line']}: {error['error']}")
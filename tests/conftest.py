@@ -0,0 +1,45 @@
+"""
+Fixtures for tests that need the real services. They run against the
+Postgres and Redis configured in the environment (DB_* and REDIS_*, as for
+the app), with the schema migrated by `alembic upgrade head`, and are
+skipped when either is unreachable.
+"""
+import pytest
+import redis
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.database import engine
+from app.utils.redis_client import redis_client
+
+
+@pytest.fixture
+def db():
+    """A session whose writes are rolled back when the test ends."""
+    try:
+        connection = engine.connect()
+    except OperationalError as e:
+        pytest.skip(f"Postgres is not available: {e}")
+    transaction = connection.begin()
+    # Commits inside the code under test only release a savepoint
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def redis_keys():
+    """The Redis client, and a list of keys to delete when the test ends."""
+    try:
+        redis_client.ping()
+    except redis.ConnectionError as e:
+        pytest.skip(f"Redis is not available: {e}")
+    keys = []
+    try:
+        yield redis_client, keys
+    finally:
+        if keys:
+            redis_client.delete(*keys)
@@ -0,0 +1,55 @@
+import json
+import pytest
+from pydantic import ValidationError
+import app.ingestion as ingestion
+from app.ingestion import StreamIngestor, normalize_event, write_rows
+from app.schemas import BaseEventLog
+
+JOB_ID = 2_000_000_301
+
+
+def _event(n, **fields):
+    return {"event": "SparkListenerTaskEnd", "job_id": JOB_ID, "timestamp": f"2026-01-01T00:00:{n:02}Z",
+            "task_id": f"task_{n}", "duration_ms": 100, **fields}
+
+
+@pytest.mark.parametrize("fields", [
+    {"job_id": 2**31},
+    {"task_id": "task\u0000"},
+    {"stage": {"name\u0000": 1}},
+    {"completion_time": "yesterday"},
+    {"completion_time": 1700000000},
+])
+def test_values_the_database_would_reject_fail_validation(fields):
+    with pytest.raises(ValidationError):
+        BaseEventLog.model_validate(_event(1, **fields))
+
+
+def test_rows_the_database_rejects_are_isolated_from_the_batch(db):
+    rows = [normalize_event(BaseEventLog.model_validate(_event(n))) for n in range(5)]
+    # Past validation, e.g. a bound the schema does not know about
+    rows[1]["job_id"] = 2**31
+    rows[3]["log"] = {**rows[3]["log"], "note": "\u0000"}
+
+    inserted, ready_jobs, rejected = write_rows(db, rows)
+
+    assert sorted(rejected) == [1, 3]
+    assert inserted == {rows[n]["id"] for n in (0, 2, 4)}
+    assert ready_jobs == []
+
+
+def test_file_ingest_reports_the_line_the_database_rejects(db, monkeypatch):
+    def normalize_with_poison(log):
+        # A line that passed validation but that the database refuses
+        row = normalize_event(log)
+        if row["task_id"] == "task_2":
+            row["job_id"] = 2**31
+        return row
+
+    monkeypatch.setattr(ingestion, "normalize_event", normalize_with_poison)
+    ingestor = StreamIngestor(db)
+    ingestor.ingest_lines([json.dumps(_event(n)).encode() for n in range(4)])
+
+    summary = ingestor.summary()
+    assert (summary["accepted"], summary["duplicate"], summary["invalid"]) == (3, 0, 1)
+    assert summary["errors"][0]["line"] == 3
@@ -0,0 +1,19 @@
+from app.utils.cache import job_cache_key, summary_cache_key, summary_generation, summary_generation_key, write_through
+
+JOB_ID = 2_000_000_801
+DAY = "2000-01-01"
+
+
+def test_summary_generation_does_not_repeat_after_it_expires(redis_keys):
+    client, keys = redis_keys
+    keys += [job_cache_key(JOB_ID), summary_cache_key(DAY), summary_generation_key(DAY)]
+    client.delete(*keys)
+
+    write_through({JOB_ID: (DAY, b"{}")})
+    first = summary_generation(DAY)
+    # Pages cached under `first` can outlive the generation key
+    client.delete(summary_generation_key(DAY))
+    assert summary_generation(DAY) == 0
+
+    write_through({JOB_ID: (DAY, b"{}")})
+    assert summary_generation(DAY) not in (0, first)
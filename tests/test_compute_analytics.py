@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import celery_worker, pending_jobs
+from app.ingestion import insert_raw_logs, normalize_event, track_job_events
+from app.models import JobAnalytics, PendingJob, RawLog
+from app.schemas import BaseEventLog, LogStatusEnum
+
+JOB_IDS = [2_000_000_701, 2_000_000_702, 2_000_000_703]
+POISON = 2_000_000_702
+
+
+def _job_rows(job_id, user):
+    events = [
+        {"event": "SparkListenerJobStart", "job_id": job_id, "timestamp": "2026-01-01T00:00:00Z", "user": user},
+        {"event": "SparkListenerTaskEnd", "job_id": job_id, "timestamp": "2026-01-01T00:00:30Z",
+         "task_id": "task_1", "duration_ms": 1000, "successful": True},
+        {"event": "SparkListenerJobEnd", "job_id": job_id, "timestamp": "2026-01-01T00:01:00Z",
+         "completion_time": "2026-01-01T00:01:00Z", "job_result": "JobSucceeded"},
+    ]
+    return [normalize_event(BaseEventLog.model_validate(event)) for event in events]
+
+
+@pytest.mark.parametrize("mode", ["incremental", "sql", "python"])
+def test_a_rejected_job_does_not_fail_its_chunk(db, monkeypatch, mode):
+    for job_id in JOB_IDS:
+        # The poison job's JobStart has no user, which job_analytics requires
+        rows = _job_rows(job_id, None if job_id == POISON else "compute_test_user")
+        track_job_events(db, rows, insert_raw_logs(db, rows))
+
+    session = lambda: Session(bind=db.connection(), join_transaction_mode="create_savepoint")
+    monkeypatch.setattr(celery_worker, "SessionLocal", session)
+    monkeypatch.setattr(pending_jobs, "SessionLocal", session)
+    monkeypatch.setattr(celery_worker, "ANALYTICS_COMPUTE_MODE", mode)
+    monkeypatch.setattr(celery_worker, "write_through", lambda entries: None)
+    monkeypatch.setattr(celery_worker, "release_compute", lambda job_ids: None)
+
+    records = celery_worker._compute_analytics(JOB_IDS)
+
+    assert sorted(record["job_id"] for record in records) == [JOB_IDS[0], JOB_IDS[2]]
+    written = db.execute(select(JobAnalytics.job_id).where(JobAnalytics.job_id.in_(JOB_IDS))).scalars()
+    assert sorted(written) == [JOB_IDS[0], JOB_IDS[2]]
+    # The rejected job's logs stay pending and it is queued for another attempt
+    statuses = db.execute(select(RawLog.job_id, RawLog.status).where(RawLog.job_id.in_(JOB_IDS))).all()
+    assert {job_id for job_id, status in statuses if status == LogStatusEnum.PENDING} == {POISON}
+    assert db.get(PendingJob, POISON) is not None
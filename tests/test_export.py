@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select, update
+from app.celery_worker import build_job_analytics, upsert_job_analytics
+from app.export import _raw_logs_query
+from app.ingestion import insert_raw_logs, normalize_event
+from app.models import JobAnalytics, RawLog
+from app.schemas import BaseEventLog
+
+JOB_ID = 2_000_000_201
+
+
+def _task(task_id, **fields):
+    return normalize_event(BaseEventLog.model_validate({
+        "event": "SparkListenerTaskEnd", "job_id": JOB_ID, "timestamp": "2026-01-01T00:00:00Z",
+        "task_id": task_id, **fields,
+    }))
+
+
+def test_raw_logs_export_tolerates_any_json_values(db):
+    insert_raw_logs(db, [
+        _task("fractional", duration_ms=12.5, successful=True),
+        _task("text", duration_ms="slow", successful="yes"),
+        _task("huge", duration_ms=1e30, successful=None),
+        _task("missing"),
+    ])
+    rows = db.execute(_raw_logs_query().where(RawLog.job_id == JOB_ID)).all()
+
+    exported = {row.task_id: (row.duration_ms, row.successful) for row in rows}
+    assert exported == {
+        "fractional": (12, True),
+        "text": (None, None),
+        "huge": (None, None),
+        "missing": (None, None),
+    }
+
+
+def test_recomputed_analytics_move_past_the_export_watermark(db):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    record = build_job_analytics(JOB_ID, "user_1", start, start + timedelta(seconds=30), 1, 0)
+    upsert_job_analytics(db, [record])
+    db.execute(
+        update(JobAnalytics).where(JobAnalytics.job_id == JOB_ID).values(insertion_time=start)
+    )
+
+    upsert_job_analytics(db, [{**record, "task_count": 2}])
+    insertion_time, now = db.execute(
+        select(JobAnalytics.insertion_time, func.now()).where(JobAnalytics.job_id == JOB_ID)
+    ).one()
+    assert insertion_time == now
@@ -0,0 +1,62 @@
+from sqlalchemy import select
+from app.ingestion import insert_raw_logs, normalize_event, track_job_events
+from app.models import JobState, PendingJob, RawLog
+from app.schemas import BaseEventLog
+
+JOB_ID = 2_000_000_101
+
+
+def _rows(*events):
+    return [normalize_event(BaseEventLog.model_validate(event)) for event in events]
+
+
+def _ingest(db, rows):
+    return track_job_events(db, rows, insert_raw_logs(db, rows))
+
+
+START = {"event": "SparkListenerJobStart", "job_id": JOB_ID, "timestamp": "2026-01-01T00:00:00Z", "user": "u1"}
+END = {"event": "SparkListenerJobEnd", "job_id": JOB_ID, "timestamp": "2026-01-01T00:01:00Z",
+       "completion_time": "2026-01-01T00:01:00Z", "job_result": "JobSucceeded"}
+
+
+def _task(n, duration_ms):
+    return {"event": "SparkListenerTaskEnd", "job_id": JOB_ID, "timestamp": f"2026-01-01T00:00:{n:02}Z",
+            "task_id": f"task_{n}", "duration_ms": duration_ms, "successful": n != 2}
+
+
+def test_job_is_claimed_once_when_complete_and_late_events_are_marked(db):
+    assert _ingest(db, _rows(START, _task(1, 100))) == []
+    assert _ingest(db, _rows(_task(2, 300), END)) == [JOB_ID]
+    # A redelivered end event is a duplicate and claims nothing
+    assert _ingest(db, _rows(END)) == []
+    assert db.get(PendingJob, JOB_ID) is None
+
+    assert _ingest(db, _rows(_task(3, 200))) == []
+    assert db.get(PendingJob, JOB_ID) is not None
+
+    state = db.execute(select(JobState).where(JobState.job_id == JOB_ID)).scalar_one()
+    assert (state.task_count, state.failed_tasks, state.task_duration_ms_sum) == (3, 1, 600)
+    assert state.analytics_enqueued
+    assert state.top_tasks[0] == ["task_2", 300]
+
+
+def _restamped(event, second):
+    return {**event, "timestamp": f"2026-01-01T00:02:{second:02}Z"}
+
+
+def test_retries_with_a_new_timestamp_are_duplicates(db):
+    assert _ingest(db, _rows(START, _task(1, 100), _restamped(_task(1, 100), 1))) == []
+    assert _ingest(db, _rows(_restamped(START, 2), _restamped(_task(1, 100), 3), END)) == [JOB_ID]
+    rows = _rows(_restamped(END, 4))
+    assert insert_raw_logs(db, rows) == set()
+
+    state = db.execute(select(JobState).where(JobState.job_id == JOB_ID)).scalar_one()
+    assert state.task_count == 1
+    stored = db.execute(select(RawLog.event).where(RawLog.job_id == JOB_ID)).scalars().all()
+    assert len(stored) == 3
+
+
+def test_task_ends_without_a_task_id_are_deduplicated_by_timestamp_only(db):
+    untracked = {**_task(1, 100), "task_id": None}
+    assert len(insert_raw_logs(db, _rows(untracked, _restamped(untracked, 1)))) == 2
+    assert insert_raw_logs(db, _rows(untracked)) == set()
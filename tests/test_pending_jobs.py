@@ -0,0 +1,47 @@
+from datetime import timedelta
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app import pending_jobs
+from app.models import PendingJob
+from app.pending_jobs import (
+    MARK_LATE_JOBS,
+    claim_pending_jobs,
+    complete_pending_jobs,
+    exhausted_pending_jobs,
+    requeue_jobs,
+)
+from app.utils.config import SCHEDULER_MAX_ATTEMPTS
+
+JOB_ID = 2_000_000_901
+
+
+def _claim(db):
+    claimed = JOB_ID in claim_pending_jobs(db, limit=1_000_000)
+    # Due again at once instead of after SCHEDULER_RETRY_DELAY
+    db.execute(
+        update(PendingJob).where(PendingJob.job_id == JOB_ID).values(ready_at=func.now() - timedelta(seconds=1))
+    )
+    return claimed
+
+
+def test_job_is_claimed_until_it_runs_out_of_attempts(db, monkeypatch):
+    monkeypatch.setattr(
+        pending_jobs, "SessionLocal",
+        lambda: Session(bind=db.connection(), join_transaction_mode="create_savepoint"),
+    )
+    requeue_jobs([JOB_ID])
+    for _ in range(SCHEDULER_MAX_ATTEMPTS):
+        assert _claim(db)
+        # A failed compute requeues the job without resetting its attempts
+        requeue_jobs([JOB_ID])
+
+    assert not _claim(db)
+    assert db.get(PendingJob, JOB_ID).attempts == SCHEDULER_MAX_ATTEMPTS
+    count, oldest = exhausted_pending_jobs(db, limit=1_000_000)
+    assert count >= 1 and JOB_ID in oldest
+
+    # A new event makes the job due again
+    db.execute(MARK_LATE_JOBS, [{"job_id": JOB_ID}])
+    assert _claim(db)
+    complete_pending_jobs(db, [JOB_ID])
+    assert db.get(PendingJob, JOB_ID) is None
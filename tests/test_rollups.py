@@ -0,0 +1,41 @@
+from datetime import date, datetime, timedelta, timezone
+from app.celery_worker import build_job_analytics, upsert_job_analytics
+from app.rollups import rollup_query, summarize_rollups, update_job_rollups
+
+JOB_ID = 2_000_000_601
+DAY = date(2020, 1, 1)
+USER = "rollup_test_user"
+
+
+def _record(job_id, duration_seconds):
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    return build_job_analytics(job_id, USER, start, start + timedelta(seconds=duration_seconds), 1, 0)
+
+
+def _write(db, records):
+    update_job_rollups(db, records)
+    upsert_job_analytics(db, records)
+
+
+def _summary(db):
+    (summary,) = summarize_rollups(db.execute(rollup_query(DAY, DAY, USER)).scalars().all(), "user")
+    return summary
+
+
+def test_percentiles_are_narrowed_to_the_observed_durations(db):
+    _write(db, [_record(JOB_ID, 4200)])
+    summary = _summary(db)
+    assert (summary["p50_duration_seconds"], summary["p95_duration_seconds"]) == (4200, 4200)
+
+    _write(db, [_record(JOB_ID + 1, 100)])
+    summary = _summary(db)
+    assert 3600 <= summary["p95_duration_seconds"] <= 4200
+    assert summary["p50_duration_seconds"] >= 100
+
+
+def test_recomputed_job_keeps_the_range_a_bound(db):
+    _write(db, [_record(JOB_ID, 4200)])
+    _write(db, [_record(JOB_ID, 5000)])
+    summary = _summary(db)
+    assert summary["job_count"] == 1
+    assert 4200 <= summary["p50_duration_seconds"] <= 5000
@@ -0,0 +1,52 @@
+import json
+import uuid
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import app.stream_worker as stream_worker
+from app.models import RawLog
+from app.stream_worker import StreamConsumer
+
+JOB_ID = 2_000_000_401
+
+
+def _fields(n, poison=False):
+    event = {"event": "SparkListenerTaskEnd", "job_id": JOB_ID, "timestamp": f"2026-01-01T00:00:{n:02}Z",
+             "task_id": f"task_{n}", "duration_ms": 100}
+    return {"id": str(uuid.uuid4()), "event": json.dumps(event), **({"poison": "1"} if poison else {})}
+
+
+def test_only_the_entry_the_database_rejects_is_dead_lettered(db, redis_keys, monkeypatch):
+    client, keys = redis_keys
+    stream = f"test:ingest:{uuid.uuid4()}"
+    consumer = StreamConsumer(name="test", stream=stream, group="test", dead_letter=f"{stream}:dead")
+    keys += [consumer.stream, consumer.dead_letter]
+
+    decode_entry = stream_worker.decode_entry
+
+    def decode_with_poison(fields):
+        # An entry that passed validation but that the database refuses
+        row, error = decode_entry(fields)
+        if b"poison" in fields:
+            row["job_id"] = 2**31
+        return row, error
+
+    monkeypatch.setattr(stream_worker, "decode_entry", decode_with_poison)
+    monkeypatch.setattr(
+        stream_worker, "SessionLocal",
+        lambda: Session(bind=db.connection(), join_transaction_mode="create_savepoint"),
+    )
+
+    consumer.ensure_group()
+    fields = [_fields(0), _fields(1), _fields(2, poison=True), _fields(3)]
+    for entry in fields:
+        client.xadd(stream, entry)
+    consumer._process(consumer._read_new())
+
+    assert client.xlen(stream) == 0
+    assert client.xpending(stream, "test")["pending"] == 0
+    (_, dead), = client.xrange(consumer.dead_letter)
+    assert dead[b"id"].decode() == fields[2]["id"]
+    assert b"out of range" in dead[b"error"]
+
+    stored = db.execute(select(RawLog.id).where(RawLog.job_id == JOB_ID)).scalars().all()
+    assert {str(log_id) for log_id in stored} == {fields[n]["id"] for n in (0, 1, 3)}
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from app.celery_worker import build_job_analytics, upsert_job_analytics
+from app.models import JobAnalytics
+from app.task_stats import empty_histogram, histogram_bucket, stats_from_durations, stats_from_sketch
+
+JOB_ID = 2_000_000_001
+
+
+def _sketch(durations):
+    histogram = empty_histogram()
+    for duration in durations:
+        histogram[histogram_bucket(duration)] += 1
+    top_tasks = sorted(([f"task_{i}", d] for i, d in enumerate(durations)), key=lambda t: t[1], reverse=True)
+    return histogram, top_tasks, sum(durations)
+
+
+def test_stats_are_plain_python_numbers():
+    durations = [100, 120, 130, 150, 900]
+    for stats in (stats_from_durations([f"task_{i}" for i in range(5)], durations),
+                  stats_from_sketch(*_sketch(durations))):
+        for field, value in stats.items():
+            if field != "straggler_task_ids":
+                assert type(value) in (int, float), (field, type(value))
+        assert stats["task_duration_max_ms"] == 900
+        assert stats["straggler_task_ids"] == ["task_4"]
+
+
+def test_stats_record_is_written_to_job_analytics(db):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    durations = [1000, 1100, 1200, 1300, 3333]
+    stats = stats_from_durations([f"task_{i}" for i in range(5)], durations)
+    record = build_job_analytics(JOB_ID, "user_1", start, start + timedelta(seconds=30), 5, 0, task_stats=stats)
+
+    upsert_job_analytics(db, [record])
+    upsert_job_analytics(db, [record])  # the ON CONFLICT update path
+    row = db.execute(select(JobAnalytics).where(JobAnalytics.job_id == JOB_ID)).scalar_one()
+
+    assert row.task_duration_p50_ms == 1200.0
+    assert row.task_duration_max_ms == 3333
+    assert row.task_duration_skew == round(3333 / 1200, 2)
+    assert row.straggler_task_ids == ["task_4"]
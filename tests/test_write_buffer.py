@@ -0,0 +1,29 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import app.write_buffer as write_buffer
+from app.ingestion import normalize_event
+from app.models import RawLog
+from app.schemas import BaseEventLog
+from app.write_buffer import WriteBehindBuffer
+
+JOB_ID = 2_000_000_501
+
+
+def test_a_rejected_row_is_dropped_instead_of_retried_forever(db, monkeypatch):
+    monkeypatch.setattr(
+        write_buffer, "SessionLocal",
+        lambda: Session(bind=db.connection(), join_transaction_mode="create_savepoint"),
+    )
+    rows = [normalize_event(BaseEventLog.model_validate({
+        "event": "SparkListenerTaskEnd", "job_id": JOB_ID, "timestamp": f"2026-01-01T00:00:{n:02}Z",
+        "task_id": f"task_{n}", "duration_ms": 100,
+    })) for n in range(3)]
+    rows[1]["job_id"] = 2**31
+    buffer = WriteBehindBuffer(stream=None)
+
+    buffer._flush_with_retry([(row, None) for row in rows])
+
+    stats = buffer.stats()
+    assert (stats["rows_flushed"], stats["rows_invalid"], stats["flush_errors"]) == (2, 1, 0)
+    stored = db.execute(select(RawLog.id).where(RawLog.job_id == JOB_ID)).scalars().all()
+    assert set(stored) == {rows[0]["id"], rows[2]["id"]}